@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'apps.peekpauser',  # 注册用户管理应用
     'apps.company',  # 注册公司管理应用
     'apps.job',  # 注册职位管理应用
+    'apps.task',  # 注册后台任务应用
     # 'corsheaders',  # 添加 cors headers 应用
 ]
 
@@ -55,6 +56,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.api.replicas.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'PeekpaBackend.urls'
@@ -88,9 +90,17 @@ DATABASES = {
         'PASSWORD': '123456',  # PostgresSQL 数据库密码
         'HOST': 'localhost',  # PostgresSQL 数据库的主机地址
         'PORT': '5432',  # PostgresSQL 数据库的端口号
-    }
+    },
+    # 只读从库（流复制副本），配置后在 REPLICA_DATABASES 中启用。本地调试时可以把别名指向主库作为替身：
+    # 'replica': {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
 }
 
+# 读写分离配置：公开的只读接口（视图类声明 use_read_replica = True）读取从库，其他读写使用主库
+DATABASE_ROUTERS = ['apps.api.replicas.ReplicaRouter']
+REPLICA_DATABASES = []  # 从库别名列表，为空时所有请求都使用主库；启用时 CACHES['default'] 必须是共享缓存
+REPLICA_PIN_SECONDS = 5  # 客户端写入后继续读取主库的时间（秒），应大于从库的复制延迟
+REPLICA_RETRY_INTERVAL = 30  # 从库连接失败后改为读取主库的时间（秒），之后重新尝试
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -169,10 +179,70 @@ SWAGGER_SETTINGS = {
     }
 }
 
+# 缓存配置，默认使用进程内缓存；多进程部署时建议换成 Redis 等共享缓存，
+# 使首页等缓存数据在所有进程间共享，并且每个缓存 key 全局只有一个刷新任务
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        # 'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        # 'LOCATION': 'redis://127.0.0.1:6379',
+    }
+}
+
+# 首页数据缓存配置
+INDEX_CACHE_TTL = 60  # 首页各区块数据的新鲜时间（秒），过期后由后台线程刷新
+INDEX_CACHE_STALE_TTL = 600  # 首页各区块数据过期后仍可继续返回的最长时间（秒）
+
+# 公司看板统计数据的缓存时间（秒），相关数据变更时会立即失效
+DASHBOARD_CACHE_TTL = 300
+
+# 职位列表结果的缓存时间（秒），职位或公司写入时会立即失效
+JOB_LIST_CACHE_TTL = 60
+
+# JWT 认证用户缓存配置，用户保存或删除时会立即失效
+USER_CACHE_LOCAL_SIZE = 10000  # 每个进程内 LRU 缓存的最大用户数
+USER_CACHE_LOCAL_TTL = 30  # 进程内缓存的有效期（秒），也是其他进程感知用户变更的最长延迟
+USER_CACHE_SHARED = True  # 是否同时使用共享缓存（CACHES['default']）
+USER_CACHE_TTL = 300  # 共享缓存的有效期（秒）
+JWT_STATELESS_AUTH = False  # 是否完全信任 Token 中的声明，认证时不读取用户
+# 内存中已注销 Token 集合由后台线程全量重建的间隔（秒）。只有默认缓存在进程间共享时才使用内存中的集合，
+# Token 注销时各进程通过缓存中的版本号感知并在请求中增量同步；使用进程内缓存时每次校验都查询黑名单表
+TOKEN_BLACKLIST_RESYNC_INTERVAL = 300
+
+# 上传文件处理器使用默认配置：小文件保存在内存中，大文件按块写入临时文件；
+# 简历、头像上传视图通过 apps.api.uploads.UploadSizeLimitMixin 额外检查文件大小
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2 * 1024 * 1024  # 超过该大小（字节）的上传文件写入临时文件
+UPLOAD_MAX_SIZE = 20 * 1024 * 1024  # 上传文件的默认大小限制（字节）
+# 各上传字段的大小限制（字节），在接收上传数据时检查
+UPLOAD_MAX_SIZES = {
+    'resume': 20 * 1024 * 1024,  # 简历
+    'avatar': 2 * 1024 * 1024,  # 用户头像
+    'avatar_file': 2 * 1024 * 1024,  # 公司头像
+}
+
+# 后台任务队列配置，任务保存在数据库中，由 `python manage.py run_tasks` 启动的工作进程执行
+TASK_ALWAYS_EAGER = False  # 为 True 时不写入队列，在事务提交后直接在当前进程中执行任务
+TASK_MAX_ATTEMPTS = 5  # 任务最多执行次数，超过后标记为执行失败
+TASK_RETRY_DELAY = 30  # 第一次重试的等待时间（秒），之后每次翻倍
+TASK_POLL_INTERVAL = 1  # 队列为空时工作进程的轮询间隔（秒）
+TASK_RETENTION_DAYS = 7  # 已完成任务的保留天数，用于 `run_tasks --purge`
+
 # 配置上传文件的存储路径
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # 配置上传文件的 URL
 MEDIA_URL = '/media/'
+# 上传文件由 apps.api.view_media.MediaView 检查权限后发送。配置以下任意一项时 Django 只检查权限，
+# 文件由前端代理发送：MEDIA_X_ACCEL_REDIRECT 为 Nginx internal location 的前缀（例如 '/protected-media/'，
+# 指向 MEDIA_ROOT），MEDIA_X_SENDFILE = True 时使用 Apache mod_xsendfile
+MEDIA_X_ACCEL_REDIRECT = None
+MEDIA_X_SENDFILE = False
+MEDIA_CACHE_MAX_AGE = 365 * 24 * 3600  # 按内容保存的文件（blobs/、thumbs/ 目录）内容不会变化，浏览器缓存时间（秒）
+MEDIA_SIGNED_URL_MAX_AGE = 300  # 简历下载签名 URL 的有效期（秒），见 apps.api.view_media.MediaSignView
+
+# 头像和公司 Logo 缩略图配置，缩略图由后台任务生成（需要安装 Pillow）
+THUMBNAIL_SIZES = (64, 128, 256)  # 缩略图尺寸（像素），按比例缩放到不超过 尺寸 x 尺寸
+THUMBNAIL_CARD_SIZE = 128  # 职位卡片、公司卡片使用的缩略图尺寸
+THUMBNAIL_QUALITY = 80  # WebP、JPEG 压缩质量
 
 # # 添加 CORS 配置
 # CORS_ALLOWED_ORIGINS = [
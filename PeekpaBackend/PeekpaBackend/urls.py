@@ -15,13 +15,13 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
+from apps.api.view_media import MediaView
 from .views import BothHttpAndHttpsSchemaGenerator, home
 
 schema_view = get_schema_view(
@@ -45,7 +45,6 @@ urlpatterns = [
     path("api/api.json", schema_view.without_ui(cache_timeout=0), name="schema-json"),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
     path("api/", include("apps.api.urls")),  # 注册 API 路由
+    # 上传文件访问路由，检查访问权限后发送文件
+    path("{}<path:path>".format(settings.MEDIA_URL.lstrip("/")), MediaView.as_view(), name="media"),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
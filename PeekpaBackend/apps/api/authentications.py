@@ -1,12 +1,147 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
 from rest_framework_simplejwt.tokens import BlacklistMixin, AccessToken
 
+from apps.api.caches import get_version, bump_version, is_shared_cache
+
+logger = logging.getLogger(__name__)
+
+REVOKED_TOKENS_VERSION_KEY = "auth:blacklist:version"  # 黑名单版本号，有 Token 加入黑名单时递增
+SYNC_ID_OVERLAP = 1000  # 增量同步时回看的主键数量，覆盖主键分配顺序和事务提交顺序不一致的情况
+
+
+class RevokedTokens:
+    """
+    进程内的已注销 Token 集合，保存所有尚未过期的黑名单 Token 的 jti 及其过期时间。
+
+    默认缓存在进程间共享时（Redis 等），校验 Token 只查内存中的集合，不再查询 BlacklistedToken 表：
+    - 有 Token 加入黑名单时在事务提交后递增共享缓存中的版本号，各进程发现版本号变化后按主键增量同步，
+      同时淘汰已过期的条目（过期的 Token 本身就无法通过校验）；
+    - 全量重建不在请求中执行：每个进程首次校验 Token 时调用 start() 加载一次，之后由后台线程每隔
+      TOKEN_BLACKLIST_RESYNC_INTERVAL 秒重建，补上增量同步可能漏掉的行。
+    默认缓存为进程内缓存时，其他进程无法感知版本号变化，每次校验都按 jti 查询黑名单表。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.jtis = {}  # jti -> 过期时间戳
+        self.version = None
+        self.last_id = 0
+        self.thread = None
+
+    def contains(self, jti):
+        if not is_shared_cache():
+            return BlacklistedToken.objects.filter(token__jti=jti).exists()
+        if self.thread is None:
+            self.start()
+        self.sync()
+        return jti in self.jtis
+
+    def add(self, jti, expires):
+        """当前进程注销 Token 后立即生效，其他进程在事务提交后通过版本号感知"""
+        with self.lock:
+            self.jtis[jti] = expires
+        transaction.on_commit(lambda: bump_version(REVOKED_TOKENS_VERSION_KEY))
+
+    def sync(self):
+        """版本号变化时增量同步，首次同步时加载所有未过期的条目"""
+        version = get_version(REVOKED_TOKENS_VERSION_KEY)
+        if version == self.version:
+            return
+        with self.lock:
+            if version != self.version:
+                self.incremental_sync()
+                self.version = version
+
+    def incremental_sync(self):
+        rows = BlacklistedToken.objects.filter(
+            id__gt=self.last_id - SYNC_ID_OVERLAP, token__expires_at__gt=timezone.now()).values_list(
+            "id", "token__jti", "token__expires_at")
+        for row_id, jti, expires in rows:
+            self.jtis[jti] = expires.timestamp()
+            self.last_id = max(self.last_id, row_id)
+        self.evict_expired()
+
+    def evict_expired(self):
+        now = time.time()
+        self.jtis = {jti: expires for jti, expires in self.jtis.items() if expires > now}
+
+    def rebuild(self):
+        """全量重建：在锁外查询，再与内存中的集合合并，期间增量同步和注销加入的条目不会丢失"""
+        version = get_version(REVOKED_TOKENS_VERSION_KEY)
+        last_id = BlacklistedToken.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+        jtis = {jti: expires.timestamp() for jti, expires in BlacklistedToken.objects.filter(
+            id__lte=last_id, token__expires_at__gt=timezone.now()).values_list("token__jti", "token__expires_at")}
+        with self.lock:
+            self.jtis = {**self.jtis, **jtis}
+            self.evict_expired()
+            self.last_id = max(self.last_id, last_id)
+            if self.version is None:
+                # 读取版本号之后注销的 Token 会再次递增版本号，由增量同步补上
+                self.version = version
+
+    def start(self):
+        """加载黑名单，并启动定期全量重建的后台线程，重复调用无效"""
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, name="revoked-tokens", daemon=True)
+        try:
+            self.rebuild()
+        except Exception:
+            # 数据库暂不可用时不影响进程启动，首次校验 Token 时由增量同步加载
+            logger.exception("加载已注销 Token 集合失败")
+        self.thread.start()
+
+    def reset(self):
+        """fork 出的子进程不会继承父进程的后台线程（父进程中的锁也可能正被持有），重置后由首次校验重新启动"""
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def run(self):
+        while True:
+            time.sleep(settings.TOKEN_BLACKLIST_RESYNC_INTERVAL)
+            try:
+                self.rebuild()
+            except Exception:
+                logger.exception("全量重建已注销 Token 集合失败，继续使用增量同步的数据")
+            finally:
+                connections.close_all()  # 只关闭当前线程打开的数据库连接
+
+
+revoked_tokens = RevokedTokens()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=revoked_tokens.reset)
+
 
 # 定义一个自定义的访问 Token 类
 class PeekpaAccessToken(BlacklistMixin, AccessToken):
     token_type = "access"  # 定义这个 Token 的类型是 access，即它生成的 Token 类型是访问 Token
 
+    def check_blacklist(self):
+        # 默认缓存在进程间共享时使用内存中的已注销 Token 集合，不再逐个请求查询 BlacklistedToken 表
+        if revoked_tokens.contains(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError("Token is blacklisted")
+
+    def blacklist(self):
+        result = super().blacklist()
+        revoked_tokens.add(self.payload[api_settings.JTI_CLAIM], self.payload["exp"])
+        return result
+
     @classmethod
     def for_user(cls, user):  # 重写了 BlacklistMixin 类里面的 for_user() 方法
         token = super().for_user(user)
@@ -14,14 +149,133 @@ class PeekpaAccessToken(BlacklistMixin, AccessToken):
         token["is_staff"] = user.is_staff
         token["email"] = user.email
         token["name"] = user.name
-        if "company_id" in user.details:
-            token["is_manager"] = user.details.get("is_manager", False)
+        if user.company_id is not None:
+            token["company_id"] = user.company_id
+            token["is_manager"] = user.is_manager
         if user.is_superuser:
             token["is_superuser"] = user.is_superuser
         return token
 
 
-class PassGetAuthentication(JWTAuthentication):
+class LRUCache:
+    """线程安全的进程内 LRU 缓存，条目在 ttl 秒后过期"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# 认证用户缓存的字段，即视图中通过 request.user 读取的字段；其余字段按需从数据库延迟加载
+USER_CACHE_FIELDS = ("uid", "email", "first_name", "last_name", "details", "company_id", "is_manager", "is_active",
+                     "is_staff", "is_superuser")
+local_user_cache = LRUCache(settings.USER_CACHE_LOCAL_SIZE, settings.USER_CACHE_LOCAL_TTL)
+
+
+def user_cache_key(uid):
+    return "auth:user:{}".format(uid)
+
+
+def get_user_values(uid):
+    """按 uid 读取认证用户的字段：依次查找进程内 LRU 缓存、共享缓存和数据库，用户不存在时返回 None"""
+    values = local_user_cache.get(uid)
+    if values is not None:
+        return values
+    if settings.USER_CACHE_SHARED:
+        values = cache.get(user_cache_key(uid))
+    if values is None:
+        values = get_user_model().objects.filter(uid=uid).values(*USER_CACHE_FIELDS).first()
+        if values is None:
+            return None
+        if settings.USER_CACHE_SHARED:
+            cache.set(user_cache_key(uid), values, settings.USER_CACHE_TTL)
+    local_user_cache.set(uid, values)
+    return values
+
+
+def invalidate_user(uid):
+    """用户信息变更或停用后，在事务提交时清除用户缓存；其他进程的 LRU 缓存在 USER_CACHE_LOCAL_TTL 秒内过期"""
+    def delete():
+        local_user_cache.delete(uid)
+        if settings.USER_CACHE_SHARED:
+            cache.delete(user_cache_key(uid))
+
+    transaction.on_commit(delete)
+
+
+def build_user(values):
+    """
+    用缓存的字段构造用户实例，未缓存的字段为延迟加载字段，访问时才查询数据库。
+    save() 只会写回已加载的字段，因此需要修改并保存用户的视图应该重新从数据库读取用户。
+    """
+    return get_user_model().from_db("default", list(values), list(values.values()))
+
+
+def user_from_claims(token):
+    """无状态模式：直接使用 PeekpaAccessToken.for_user() 写入 Token 的声明构造用户，不访问数据库"""
+    return build_user({
+        "uid": token[api_settings.USER_ID_CLAIM],
+        "email": token.get("email", ""),
+        "company_id": token.get("company_id"),
+        "is_manager": token.get("is_manager", False),
+        "is_active": True,
+        "is_staff": token.get("is_staff", False),
+        "is_superuser": token.get("is_superuser", False),
+    })
+
+
+class PeekpaJWTAuthentication(JWTAuthentication):
+    """
+    带用户缓存的 JWT 认证类。
+
+    默认按 uid 从进程内 LRU 缓存和共享缓存读取用户，缓存未命中时才查询数据库，用户保存或删除时清除缓存；
+    配置 JWT_STATELESS_AUTH = True 时完全信任 Token 中的声明，认证过程不访问数据库，
+    此时用户停用或权限变更要等到 Token 过期（或加入黑名单）后才生效。
+    """
+
+    def get_user(self, validated_token):
+        try:
+            uid = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+        if settings.JWT_STATELESS_AUTH:
+            return user_from_claims(validated_token)
+        values = get_user_values(uid)
+        if values is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if not values["is_active"]:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return build_user(values)
+
+
+class PassGetAuthentication(PeekpaJWTAuthentication):
     def authenticate(self, request):
         header = self.get_header(request)
         if header is None:
@@ -53,3 +307,24 @@ class PassGetAuthentication(JWTAuthentication):
             return None, None
         # 对于其他请求方法，返回 None，表示身份验证失败
         return None
+
+
+class MediaAuthentication(PeekpaJWTAuthentication):
+    """
+    上传文件访问的认证类。
+
+    只读取 Authorization 请求头，Token 无效时按匿名用户处理，公开的文件仍然可以访问。
+    下载链接等无法设置请求头的场景使用 apps.api.view_media.MediaSignView 签发的短期签名 URL，
+    不在 URL 中传递 Token，避免 Token 出现在访问日志、代理日志和 Referer 中。
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return None
+        try:
+            validated_token = self.get_validated_token(raw_token)
+            return self.get_user(validated_token), validated_token
+        except (InvalidToken, AuthenticationFailed):
+            return None
@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = 30  # 刷新锁的超时时间（秒），防止构建函数异常退出后锁无法释放
+WAIT_INTERVAL = 0.05  # 等待其他请求构建缓存时的轮询间隔（秒）
+
+
+def _lock_key(key):
+    return "{}:lock".format(key)
+
+
+def _store(key, value, ttl, stale_ttl):
+    """写入缓存条目，条目在 ttl 秒后过期，过期后还可以继续使用 stale_ttl 秒"""
+    cache.set(key, {"value": value, "expires": time.time() + ttl}, ttl + stale_ttl)
+
+
+def _build(key, builder, ttl, stale_ttl):
+    value = builder()
+    _store(key, value, ttl, stale_ttl)
+    return value
+
+
+def _refresh_in_background(key, builder, ttl, stale_ttl):
+    """在后台线程中刷新缓存，同一时间每个 key 只有一个线程在刷新"""
+    if not cache.add(_lock_key(key), 1, LOCK_TIMEOUT):
+        return
+
+    def run():
+        try:
+            _build(key, builder, ttl, stale_ttl)
+        except Exception:
+            logger.exception("刷新缓存 %s 失败，继续使用旧数据", key)
+        finally:
+            cache.delete(_lock_key(key))
+            connections.close_all()  # 只关闭当前线程打开的数据库连接
+
+    threading.Thread(target=run, name="refresh-{}".format(key), daemon=True).start()
+
+
+def single_flight(key, builder, ttl, stale_ttl=0, wait_timeout=5):
+    """
+    单飞构建缓存：缓存缺失时只有一个请求执行 builder，其他请求等待它写入缓存后直接读取。
+    等待超过 wait_timeout 秒（例如持锁的进程已经退出）时自行构建。
+    """
+    if cache.add(_lock_key(key), 1, LOCK_TIMEOUT):
+        try:
+            return _build(key, builder, ttl, stale_ttl)
+        finally:
+            cache.delete(_lock_key(key))
+    deadline = time.monotonic() + wait_timeout
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry["value"]
+    return _build(key, builder, ttl, stale_ttl)
+
+
+def get_or_refresh(key, builder, ttl, stale_ttl):
+    """
+    stale-while-revalidate 缓存读取。
+
+    - 缓存新鲜：直接返回缓存数据；
+    - 缓存过期但仍在 stale_ttl 内：立即返回旧数据，同时由一个后台线程刷新缓存；
+    - 缓存缺失：通过 single_flight() 同步构建，并发请求只触发一次构建。
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return single_flight(key, builder, ttl, stale_ttl)
+    if entry["expires"] <= time.time():
+        _refresh_in_background(key, builder, ttl, stale_ttl)
+    return entry["value"]
+
+
+def refresh(key, builder, ttl, stale_ttl):
+    """立即重新构建缓存，用于定时任务或部署后预热"""
+    return _build(key, builder, ttl, stale_ttl)
+
+
+def is_shared_cache():
+    """默认缓存是否在进程间共享；进程内缓存（LocMemCache、DummyCache）中的版本号无法通知其他进程"""
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def get_version(name):
+    """读取缓存版本号，版本号不存在时以当前毫秒时间戳初始化，避免与被淘汰前的旧版本号重复"""
+    version = cache.get(name)
+    if version is None:
+        cache.add(name, int(time.time() * 1000), None)
+        version = cache.get(name)
+    return version
+
+
+def bump_version(name):
+    """递增缓存版本号，使基于旧版本号的缓存全部失效"""
+    try:
+        cache.incr(name)
+    except ValueError:
+        cache.add(name, int(time.time() * 1000), None)
+
+
+def dashboard_version_key(company_id):
+    return "dashboard:{}:version".format(company_id)
+
+
+def invalidate_dashboard(company_id):
+    """在当前事务提交后使公司的看板统计缓存失效"""
+    if company_id is not None:
+        transaction.on_commit(lambda: bump_version(dashboard_version_key(company_id)))
+
+
+CATALOG_VERSION_KEY = "catalog:version"
+
+
+def invalidate_catalog():
+    """在当前事务提交后使职位目录缓存（职位列表、筛选项计数）全部失效，职位或公司写入时调用"""
+    transaction.on_commit(lambda: bump_version(CATALOG_VERSION_KEY))
+
+
+def get_or_build(key, builder, ttl):
+    """读取缓存，缓存缺失时通过 single_flight() 构建，适用于 key 中带有版本号、写入后整体失效的缓存"""
+    entry = cache.get(key)
+    if entry is not None:
+        return entry["value"]
+    return single_flight(key, builder, ttl)
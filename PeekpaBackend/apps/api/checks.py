@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.checks import Error, register, Tags
+
+from apps.api.caches import is_shared_cache
+
+
+@register(Tags.caches)
+def check_replica_cache(app_configs, **kwargs):
+    """
+    读写分离依赖共享缓存：客户端写入后读取主库的固定标记保存在 CACHES['default'] 中，
+    使用进程内缓存时其他进程看不到该标记，客户端的下一个请求可能从复制延迟的从库读到旧数据。
+    """
+    if settings.REPLICA_DATABASES and not is_shared_cache():
+        return [Error(
+            "启用 REPLICA_DATABASES 时 CACHES['default'] 必须是进程间共享的缓存。",
+            hint="配置 Redis 等共享缓存，或者清空 REPLICA_DATABASES。",
+            id="api.E001",
+        )]
+    return []
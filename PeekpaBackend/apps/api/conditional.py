@@ -0,0 +1,36 @@
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+
+def conditional_get(stamp_func, vary_on_auth=False):
+    """
+    为视图类的 get() 添加条件请求（If-None-Match / If-Modified-Since）支持。
+
+    stamp_func(request, **kwargs) 只查询对象的版本号，返回 (etag, last_modified)，对象不存在时返回 None。
+    版本号与请求中的值一致时直接返回 304，不加载对象、不执行序列化；同一请求内 stamp_func 只调用一次。
+    响应带有 `Cache-Control: no-cache`，客户端每次使用缓存前都需要重新验证。
+    返回结果中包含当前用户的个性化字段时设置 vary_on_auth，响应按 Authorization 请求头区分缓存。
+    """
+
+    def stamp(request, *args, **kwargs):
+        if not hasattr(request, "_conditional_stamp"):
+            request._conditional_stamp = stamp_func(request, **kwargs) or (None, None)
+        return request._conditional_stamp
+
+    conditional = condition(etag_func=lambda request, *args, **kwargs: stamp(request, *args, **kwargs)[0],
+                            last_modified_func=lambda request, *args, **kwargs: stamp(request, *args, **kwargs)[1])
+
+    def decorator(get):
+        get = conditional(get)
+
+        def wrapper(request, *args, **kwargs):
+            response = get(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            if vary_on_auth:
+                patch_vary_headers(response, ["Authorization"])
+            return response
+
+        return wrapper
+
+    return method_decorator(decorator, name="get")
@@ -0,0 +1,145 @@
+import base64
+import datetime
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """
+    可选游标（keyset）分页类，继承自 LimitOffsetPagination。
+
+    请求中不带 `cursor` 参数时，行为与 LimitOffsetPagination 完全一致，现有前端的 limit/offset 协议不受影响；
+    带上 `cursor` 参数（首页传空值 `?cursor=`）时切换为游标分页：游标中编码了上一页边界行的排序字段值和 id，
+    下一页通过 `WHERE (排序字段, id) > (边界值)` 直接定位，配合 (排序字段, id) 复合索引，
+    第 5000 页和第 1 页的代价相同，并且不再执行 COUNT(*)。
+
+    排序字段取自查询集的 order_by()，查询集无序时使用视图的 `cursor_ordering` 属性（默认按 id 排序），
+    最后自动追加 id 作为唯一的决胜字段。排序字段必须是非空的模型字段或注解。
+    """
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "无效的分页游标。"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = self.cursor_query_param in request.query_params
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.ordering = self.get_ordering(queryset, view)
+        values, reverse = self.decode_cursor(request, queryset)
+
+        ordering = [(field, not descending) for field, descending in self.ordering] if reverse else self.ordering
+        queryset = queryset.order_by(*[("-" if descending else "") + field for field, descending in ordering])
+        if values is not None:
+            queryset = queryset.filter(self.build_keyset_filter(ordering, values))
+        # 多取一行，用来判断当前方向上是否还有数据
+        results = list(queryset[:self.limit + 1])
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = values is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.build_cursor_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.use_cursor:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self.build_cursor_link(self.page[0], reverse=True)
+
+    def get_ordering(self, queryset, view):
+        """解析排序字段，返回 [(字段名, 是否降序), ...]，并以 id 作为最后的决胜字段"""
+        ordering = list(queryset.query.order_by) or list(getattr(view, "cursor_ordering", ("id",)))
+        parsed = []
+        for item in ordering:
+            if not isinstance(item, str) or item == "?" or "__" in item:
+                raise NotFound("当前排序方式不支持游标分页。")
+            parsed.append((item.lstrip("-"), item.startswith("-")))
+        if parsed[-1][0] not in ("id", "pk"):
+            parsed.append(("id", parsed[0][1]))
+        return parsed
+
+    def build_keyset_filter(self, ordering, values):
+        """构造 (f1, f2, ..., id) 大于（或小于）边界值的行比较条件"""
+        keyset = Q()
+        for index, (field, descending) in enumerate(ordering):
+            condition = Q(**{"{}__{}".format(field, "lt" if descending else "gt"): values[index]})
+            for prev_index, (prev_field, _) in enumerate(ordering[:index]):
+                condition &= Q(**{prev_field: values[prev_index]})
+            keyset |= condition
+        # 首个排序字段的范围条件，便于数据库直接在复合索引上做范围扫描
+        first_field, first_descending = ordering[0]
+        return Q(**{"{}__{}".format(first_field, "lte" if first_descending else "gte"): values[0]}) & keyset
+
+    def build_cursor_link(self, instance, reverse):
+        values = []
+        for field, _ in self.ordering:
+            value = getattr(instance, field)
+            if isinstance(value, (datetime.datetime, datetime.date)):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value)
+            values.append(value)
+        payload = json.dumps({"v": values, "r": reverse}, separators=(",", ":"))
+        cursor = base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_ordering_field(self, queryset, name):
+        """返回排序字段对应的模型字段，注解返回其 output_field"""
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        if name == "pk":
+            return queryset.model._meta.pk
+        return queryset.model._meta.get_field(name)
+
+    def decode_cursor(self, request, queryset):
+        """解码游标，返回 (边界值列表, 是否向前翻页)，首页返回 (None, False)；边界值按排序字段的类型转换"""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+            values, reverse = payload["v"], bool(payload.get("r", False))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            values = [self.get_ordering_field(queryset, field).to_python(value)
+                      for (field, _), value in zip(self.ordering, values)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        # 排序字段都是非空的，边界值为 None 的游标不是本类生成的
+        if any(value is None for value in values):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
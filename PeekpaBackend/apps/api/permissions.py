@@ -3,7 +3,7 @@ from rest_framework import permissions
 
 class IsCompanyAdminUser(permissions.BasePermission):
     def has_permission(self, request, view):
-        return bool(request.user and request.user.is_staff and request.user.details.get('is_manager', False))
+        return bool(request.user and request.user.is_staff and request.user.is_manager)
 
 
 class IsSuperUser(permissions.BasePermission):
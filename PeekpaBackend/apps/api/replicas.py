@@ -0,0 +1,111 @@
+import hashlib
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# 当前请求读取使用的数据库别名，None 表示使用主库；使用 ContextVar 保证多线程、ASGI 下各请求互不影响
+_read_alias = ContextVar("read_alias", default=None)
+# 进程内记录的不可用从库：{别名: 恢复检查的时间}
+_unhealthy = {}
+
+
+def _pin_key(request):
+    """按 Authorization 请求头（匿名请求按客户端 IP）区分客户端，请求头只保存哈希"""
+    identity = request.META.get("HTTP_AUTHORIZATION") or request.META.get("REMOTE_ADDR", "")
+    return "replica:pin:{}".format(hashlib.sha1(identity.encode()).hexdigest())
+
+
+def _healthy(alias):
+    """检查从库是否可以连接，连接失败的从库在 REPLICA_RETRY_INTERVAL 秒内不再使用"""
+    retry_at = _unhealthy.get(alias)
+    if retry_at is not None and retry_at > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        logger.warning("从库 %s 不可用，%s 秒内改为读取主库", alias, settings.REPLICA_RETRY_INTERVAL, exc_info=True)
+        _unhealthy[alias] = time.monotonic() + settings.REPLICA_RETRY_INTERVAL
+        return False
+    _unhealthy.pop(alias, None)
+    return True
+
+
+def choose_replica():
+    """随机选择一个可用的从库，没有可用的从库时返回 None"""
+    aliases = list(settings.REPLICA_DATABASES)
+    random.shuffle(aliases)
+    for alias in aliases:
+        if _healthy(alias):
+            return alias
+    return None
+
+
+@contextmanager
+def read_from_primary():
+    """块内的读取使用主库，用于构建按版本号失效的缓存：写入后的第一次构建不能读到复制延迟的旧数据"""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """
+    读写分离数据库路由：写入始终使用主库；ReplicaMiddleware 为只读请求选择从库后，该请求内的读取使用从库。
+    后台任务、管理命令等不经过中间件的代码始终使用主库。
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 从库是主库的副本，两边读出的对象可以互相关联
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 从库的表结构通过复制同步，不单独执行迁移
+        return db not in settings.REPLICA_DATABASES
+
+
+class ReplicaMiddleware:
+    """
+    为视图类声明了 `use_read_replica = True` 的 GET / HEAD 请求选择从库。
+
+    客户端发起写请求（POST、PATCH 等）后，在 REPLICA_PIN_SECONDS 秒内它的所有请求都读取主库，
+    保证能读到自己刚写入的数据（投递、上传简历、修改资料后立即刷新职位详情等）。
+    固定标记保存在 CACHES['default'] 中，启用从库时必须使用 Redis 等共享缓存（见 apps.api.checks）。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.set(None)
+        if request.method not in SAFE_METHODS and settings.REPLICA_DATABASES:
+            cache.set(_pin_key(request), 1, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "view_class", None)
+        if (settings.REPLICA_DATABASES and request.method in SAFE_METHODS
+                and getattr(view_class, "use_read_replica", False) and not cache.get(_pin_key(request))):
+            _read_alias.set(choose_replica())
+        return None
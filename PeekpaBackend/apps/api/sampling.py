@@ -0,0 +1,53 @@
+import random
+
+from django.db.models import Max, Min
+
+MAX_ROUNDS = 5  # 随机探测的最大轮数
+MIN_PROBES = 32  # 每轮最少探测的 id 数量
+
+
+def random_sample(queryset, n, rng=random):
+    """
+    从查询集中随机选取 n 行，替代 `order_by("?")[:n]`。
+
+    `ORDER BY RANDOM()` 需要扫描并排序所有符合条件的行，这里改为在主键取值范围内随机探测 id：
+    每轮生成一批随机 id，用 `pk__in` 走主键索引取回其中满足查询集过滤条件的行，按命中率动态调整下一轮的探测数量。
+    查询集上的过滤条件（如 `status=Job.STATUS_PUBLISH`）和 select_related 等设置都会保留。
+    探测若干轮后仍然不足 n 行（数据非常稀疏），则从一个随机主键开始顺序补齐，同样只走主键索引范围扫描。
+    返回随机顺序的模型实例列表。
+    """
+    model = queryset.model
+    bounds = model._default_manager.aggregate(min_pk=Min("pk"), max_pk=Max("pk"))
+    low, high = bounds["min_pk"], bounds["max_pk"]
+    if low is None:
+        return []
+    # id 范围很小时，直接随机排序的代价也很低
+    if high - low + 1 <= MIN_PROBES * 4:
+        return list(queryset.order_by("?")[:n])
+
+    found = {}
+    hit_rate = 1.0
+    for _ in range(MAX_ROUNDS):
+        remaining = n - len(found)
+        if remaining <= 0:
+            break
+        size = min(high - low + 1, max(MIN_PROBES, int(remaining / max(hit_rate, 0.05) * 2)))
+        probes = {rng.randint(low, high) for _ in range(size)} - found.keys()
+        rows = list(queryset.filter(pk__in=probes).order_by()[:remaining])
+        for row in rows:
+            found[row.pk] = row
+        hit_rate = len(rows) / max(len(probes), 1)
+
+    remaining = n - len(found)
+    if remaining > 0:
+        start = rng.randint(low, high)
+        rows = list(queryset.filter(pk__gte=start).exclude(pk__in=found.keys()).order_by("pk")[:remaining])
+        if len(rows) < remaining:
+            rows += list(queryset.filter(pk__lt=start).exclude(pk__in=found.keys()).order_by("pk")[
+                         :remaining - len(rows)])
+        for row in rows:
+            found[row.pk] = row
+
+    result = list(found.values())[:n]
+    rng.shuffle(result)
+    return result
@@ -1,8 +1,11 @@
 from django.contrib.auth.models import AnonymousUser
+from django.db.models import prefetch_related_objects
+from django.utils.functional import cached_property
 from rest_framework import serializers
 from apps.company.models import Company
 from apps.job.models import Resume, Job, Interview, Invitation
 from apps.peekpauser.models import User, Avatar
+from apps.api.thumbnails import thumbnail_url
 from rest_framework.generics import get_object_or_404
 
 
@@ -45,6 +48,12 @@ class ResumeSerializer(serializers.ModelSerializer):
 
 
 class AvatarSerializer(serializers.ModelSerializer):
+    thumbnails = serializers.SerializerMethodField()
+
+    def get_thumbnails(self, obj):
+        # 缩略图由后台任务生成，生成前为空
+        return obj.blob.variants if obj.blob_id else {}
+
     class Meta:
         model = Avatar
         fields = "__all__"
@@ -64,9 +73,12 @@ class AdminCompanyListSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
     def get_user(self, obj):
-        user = User.objects.filter(details__contains={"company_id": obj.id, "is_manager": True})
-        if user.count():
-            return AdminCompanyUserSerializer(user.all().first()).data
+        # 视图中通过 Prefetch 预加载了公司经理（managers），否则单独查询
+        managers = getattr(obj, "managers", None)
+        if managers is None:
+            managers = list(obj.staff.filter(is_manager=True).order_by("uid")[:1])
+        if managers:
+            return AdminCompanyUserSerializer(managers[0]).data
         return None
 
     class Meta:
@@ -74,19 +86,36 @@ class AdminCompanyListSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "website", "user", "email", "first_name", "last_name", "password"]
 
 
+class JobListPrefetchSerializer(serializers.ListSerializer):
+    """职位列表的批量序列化类，序列化前用一次查询预加载所有职位的关联公司"""
+
+    def to_representation(self, data):
+        jobs = list(data.all() if hasattr(data, "all") else data)
+        prefetch_related_objects(jobs, "company")
+        return super().to_representation(jobs)
+
+
 class JobListSerializer(serializers.ModelSerializer):
     resumes = serializers.SerializerMethodField(read_only=True)
     pass_number = serializers.SerializerMethodField()
     company_name = serializers.CharField(source="company.name", read_only=True)
     company_tags = serializers.CharField(source="company.tags", read_only=True)
-    company_avatar = serializers.CharField(source="company.avatar", read_only=True)
+    company_avatar = serializers.SerializerMethodField()
+    company_avatar_webp = serializers.SerializerMethodField()
     company_id = serializers.CharField(source="company.id", read_only=True)
 
     def get_resumes(self, obj):
-        return Interview.objects.filter(job__id=obj.id).count()
+        return obj.application_count
+
+    def get_company_avatar(self, obj):
+        # 职位卡片使用缩略图，缩略图尚未生成时返回原图
+        return thumbnail_url(obj.company.avatar_variants, obj.company.avatar)
+
+    def get_company_avatar_webp(self, obj):
+        return thumbnail_url(obj.company.avatar_variants, obj.company.avatar, kind="webp")
 
     def get_pass_number(self, obj):
-        return Interview.objects.filter(job__id=obj.id, status=4).count()
+        return obj.pass_count
 
     def to_representation(self, instance):
         ret = super(JobListSerializer, self).to_representation(instance)
@@ -103,9 +132,10 @@ class JobListSerializer(serializers.ModelSerializer):
         fields = ["id", "title", "status", "city", "location", "salary_min", "salary_max", "salary_count", "education",
                   "experience", "benefit", "publish_time", "pass_number", "hire_number", "resumes",
                   "company_name", "description",
-                  "company_tags", "company_avatar", "company_id"]
+                  "company_tags", "company_avatar", "company_avatar_webp", "company_id"]
         read_only_fields = ["id", "publish_time", "pass_number", "resumes", "company_name", "company_tags",
-                            "company_avatar", "company_id"]
+                            "company_avatar", "company_avatar_webp", "company_id"]
+        list_serializer_class = JobListPrefetchSerializer
 
 
 class JobSerializer(serializers.ModelSerializer):
@@ -142,7 +172,7 @@ class JobSerializer(serializers.ModelSerializer):
         return obj.resumes.count()
 
     def get_pass_number(self, obj):
-        return Interview.objects.filter(job__id=obj.id, status=4).count()
+        return obj.pass_count
 
     class Meta:
         model = Job
@@ -163,7 +193,7 @@ class InterviewJobSerializer(serializers.ModelSerializer):
     pass_number = serializers.SerializerMethodField()
 
     def get_pass_number(self, obj):
-        return Interview.objects.filter(job__id=obj.id, status=4).count()
+        return obj.pass_count
 
     class Meta:
         model = Job
@@ -190,13 +220,19 @@ class InterviewSerializer(serializers.ModelSerializer):
     invitation = serializers.SerializerMethodField()
 
     def get_invitation(self, obj):
-        invitations = obj.invitations.all()
-        if invitations.count():
-            invitation = invitations.filter(status=obj.status)
-            if invitation.count():
-                return InterviewInvitationSerializer(invitation.all().first()).data
+        # 列表视图通过 Prefetch 预加载了与面试状态一致的面试邀请（matched_invitations），否则单独查询
+        invitations = getattr(obj, "matched_invitations", None)
+        if invitations is None:
+            invitations = list(obj.invitations.filter(status=obj.status).order_by("id")[:1])
+        if invitations:
+            return self.invitation_serializer.to_representation(invitations[0])
         return None
 
+    @cached_property
+    def invitation_serializer(self):
+        # 列表序列化时所有行共用同一个子序列化器，避免每行重新构建字段
+        return InterviewInvitationSerializer()
+
     class Meta:
         model = Interview
         fields = ["id", "job", "interviewer", "candidate", "resume", "status", "feedback", "invitation", "publish_time"]
@@ -248,17 +284,25 @@ class InvitationSerializer(serializers.ModelSerializer):
 class CompanyListSerializer(serializers.ModelSerializer):
     jobs = serializers.SerializerMethodField()
     interviews = serializers.SerializerMethodField()
+    avatar = serializers.SerializerMethodField()
+    avatar_webp = serializers.SerializerMethodField()
 
     def get_interviews(self, obj):
-        job_ids = obj.jobs.values_list("id", flat=True)
-        return Interview.objects.filter(status__in=[0, 1, 2, 3], job__id__in=job_ids).count()
+        return obj.interview_count
 
     def get_jobs(self, obj):
-        return obj.jobs.count()
+        return obj.job_count
+
+    def get_avatar(self, obj):
+        # 公司卡片使用缩略图，缩略图尚未生成时返回原图
+        return thumbnail_url(obj.avatar_variants, obj.avatar)
+
+    def get_avatar_webp(self, obj):
+        return thumbnail_url(obj.avatar_variants, obj.avatar, kind="webp")
 
     class Meta:
         model = Company
-        fields = ["id", "name", "slogan", "avatar", "tags", "size", "jobs", "interviews"]
+        fields = ["id", "name", "slogan", "avatar", "avatar_webp", "tags", "size", "jobs", "interviews"]
 
 
 class CompanySerializer(serializers.ModelSerializer):
@@ -273,37 +317,36 @@ class CompanySerializer(serializers.ModelSerializer):
         fields = ["id", "name", "slogan", "avatar", "tags", "size", "jobs", "website", "description"]
 
 
-class JobApplicationSerializer(serializers.ModelSerializer):
-    timestamp = serializers.SerializerMethodField()
+class ApplicationSerializer(serializers.ModelSerializer):
+    """
+    求职者的投递记录，输出格式与职位信息 + 面试状态、投递时间和当前面试邀请的组合一致。
+
+    查询集需要 select_related("job__company")，并通过 Prefetch 把与面试状态一致的面试邀请预加载到
+    matched_invitations，见 ApplicationListView.get_queryset()。
+    """
+    id = serializers.ReadOnlyField(source="job.id")
+    title = serializers.ReadOnlyField(source="job.title")
+    salary_min = serializers.ReadOnlyField(source="job.salary_min")
+    salary_max = serializers.ReadOnlyField(source="job.salary_max")
+    salary_count = serializers.ReadOnlyField(source="job.salary_count")
+    timestamp = serializers.ReadOnlyField(source="publish_time")
     invitation = serializers.SerializerMethodField()
-    status = serializers.SerializerMethodField()
-    company_name = serializers.CharField(source="company.name")
+    company_name = serializers.ReadOnlyField(source="job.company.name")
 
     def get_invitation(self, obj):
-        interview = Interview.objects.get(candidate=self.context.get("request").user, job=obj)
-        invitations = Invitation.objects.filter(interview=interview,
-                                                candidate=self.context.get("request").user,
-                                                status=interview.status)
-        if invitations.count():
-            return InterviewInvitationSerializer(invitations.all().first()).data
-        return None
-
-    def get_status(self, obj):
-        interview = Interview.objects.get(candidate=self.context.get("request").user, job=obj)
-        if interview:
-            return interview.status
+        invitations = obj.matched_invitations
+        if invitations:
+            return self.invitation_serializer.to_representation(invitations[0])
         return None
 
-    def get_timestamp(self, obj):
-        interview = Interview.objects.get(candidate=self.context.get("request").user, job=obj)
-        if interview:
-            return interview.publish_time
-        return None
+    @cached_property
+    def invitation_serializer(self):
+        return InterviewInvitationSerializer()
 
     class Meta:
-        model = Job
+        model = Interview
         fields = ["id", "title", "status", "salary_min", "salary_max", "salary_count", "timestamp", "invitation",
-                  "status", "company_name"]
+                  "company_name", "update_time"]
 
 
 class UserResumeSerializer(serializers.ModelSerializer):
@@ -313,28 +356,19 @@ class UserResumeSerializer(serializers.ModelSerializer):
 
 
 class UserSerializer(serializers.ModelSerializer):
-    applications = serializers.SerializerMethodField()
     resume = serializers.SerializerMethodField()
     password = serializers.CharField(write_only=True, allow_blank=True)
 
     def get_resume(self, obj):
-        resume = Resume.objects.filter(user__uid=obj.uid, is_active=True)
-        if resume.count():
-            return UserResumeSerializer(resume[0]).data
+        resume = Resume.objects.filter(user_id=obj.uid, is_active=True).first()
+        if resume is not None:
+            return UserResumeSerializer(resume).data
         return None
 
-    def get_applications(self, obj):
-        applications = Interview.objects.filter(candidate__uid=obj.uid)
-        jobs = []
-        for apply in applications:
-            jobs.append(apply.job)
-        return JobApplicationSerializer(jobs, context=self.context, many=True).data
-
     class Meta:
         model = User
-        fields = ["uid", "email", "first_name", "last_name", "gender", "details", "resume",
-                  "applications", "password"]
-        read_only_fields = ["uid", "email", "applications"]
+        fields = ["uid", "email", "first_name", "last_name", "gender", "details", "resume", "password"]
+        read_only_fields = ["uid", "email"]
 
 
 class CompanyUserSerializer(serializers.ModelSerializer):
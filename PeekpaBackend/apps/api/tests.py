@@ -1,3 +1,842 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopUpload
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from apps.api import caches, checks, replicas
+from apps.api.authentications import PeekpaAccessToken, RevokedTokens, REVOKED_TOKENS_VERSION_KEY, \
+    local_user_cache
+from apps.api.uploads import save_upload, SizeLimitUploadHandler
+from apps.api.view_job import JobListView, ApplyJobView, JOB_LIST_CACHE_STATS
+from apps.api.view_media import sign_media_path
+from apps.company.models import Company
+from apps.job.models import Job, PublishJob, Resume, Interview, Invitation
+from apps.peekpauser.models import User, Avatar
+
+PASSWORD = "peekpa123"
+
+
+# 测试数据构造函数
+def create_company(name="测试公司", **fields):
+    fields = {"avatar": "", "slogan": "", "tags": "", "size": "", "website": "https://peekpa.test",
+              "description": "", **fields}
+    return Company.objects.create(name=name, **fields)
+
+
+def create_staff(company, email, is_manager=False):
+    user = User.objects.create_admin_user(email, PASSWORD)
+    user.company = company
+    user.is_manager = is_manager
+    user.save()
+    return user
+
+
+def create_candidate(email, resume_url="media/resume/resume.pdf"):
+    user = User.objects.create_user(email, PASSWORD)
+    Resume.objects.create(name="简历", user=user, url=resume_url)
+    return user
+
+
+def create_job(company, publisher, title="Java 开发工程师", **fields):
+    fields = {"experience": "1-3年", "education": "本科", "benefit": "五险一金", "description": "职位描述",
+              "city": "北京", "salary_min": 10000, "salary_max": 20000, **fields}
+    job = Job.objects.create(title=title, company=company, **fields)
+    PublishJob.objects.create(user=publisher, job=job)
+    return job
+
+
+def create_interview(job, candidate, interviewer, **fields):
+    resume = Resume.objects.filter(user=candidate, is_active=True).first()
+    return Interview.objects.create(job=job, candidate=candidate, interviewer=interviewer, resume=resume, **fields)
+
+
+def create_invitation(interview, **fields):
+    # Invitation.due_time 的默认值是 F() 表达式，不能用于 INSERT，需要显式传入
+    fields = {"status": interview.status, "message": "面试邀请", "due_time": timezone.now() + timedelta(days=3),
+              **fields}
+    return Invitation.objects.create(interview=interview, interviewer=interview.interviewer,
+                                     candidate=interview.candidate, **fields)
+
+
+def use_temp_media_root(test):
+    """测试期间把上传文件保存到临时目录，测试结束后删除"""
+    media_root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, media_root)
+    media_settings = override_settings(MEDIA_ROOT=media_root)
+    media_settings.enable()
+    test.addCleanup(media_settings.disable)
+
+
+def auth(user):
+    return {"HTTP_AUTHORIZATION": "Bearer {}".format(PeekpaAccessToken.for_user(user))}
+
+
+class APITestCase(TestCase):
+    """清空共享缓存和进程内用户缓存，避免测试之间互相影响"""
+
+    def setUp(self):
+        cache.clear()
+        local_user_cache.clear()
+
+
+class MediaAccessTests(APITestCase):
+    """上传文件访问权限：头像公开，简历只对本人、收到简历的公司人员、超级管理员和签名 URL 开放"""
+
+    def setUp(self):
+        super().setUp()
+        use_temp_media_root(self)
+
+        self.company = create_company()
+        self.staff = create_staff(self.company, "staff@peekpa.test")
+        self.other_staff = create_staff(create_company("其他公司"), "other-staff@peekpa.test")
+        self.candidate = User.objects.create_user("candidate@peekpa.test", PASSWORD)
+        self.other_candidate = User.objects.create_user("other@peekpa.test", PASSWORD)
+        self.superuser = User.objects.create_superuser("admin@peekpa.test", PASSWORD)
+
+        blob = save_upload(SimpleUploadedFile("resume.pdf", b"%PDF-1.4 resume " + os.urandom(8)))
+        self.resume = Resume.objects.create(name="简历", user=self.candidate, url=blob.url, blob=blob)
+        create_interview(create_job(self.company, self.staff), self.candidate, self.staff)
+        self.resume_url = "/" + blob.url
+
+        avatar_blob = save_upload(SimpleUploadedFile("avatar.png", b"\x89PNG avatar " + os.urandom(8)))
+        Avatar.objects.create(name="头像", user=self.candidate, url=avatar_blob.url, blob=avatar_blob)
+        self.avatar_url = "/" + avatar_blob.url
+
+    def test_avatar_is_public(self):
+        response = self.client.get(self.avatar_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("public", response["Cache-Control"])
+
+    def test_resume_access_rules(self):
+        self.assertEqual(self.client.get(self.resume_url).status_code, 401)
+        self.assertEqual(self.client.get(self.resume_url, **auth(self.other_candidate)).status_code, 404)
+        self.assertEqual(self.client.get(self.resume_url, **auth(self.other_staff)).status_code, 404)
+        for user in (self.candidate, self.staff, self.superuser):
+            response = self.client.get(self.resume_url, **auth(user))
+            self.assertEqual(response.status_code, 200, user.email)
+            self.assertIn("private", response["Cache-Control"])
+
+    def test_trailing_slash_is_normalized(self):
+        self.assertEqual(self.client.get(self.resume_url + "/", **auth(self.staff)).status_code, 200)
+        self.assertEqual(self.client.get(self.avatar_url + "/").status_code, 200)
+
+    def test_parent_directory_is_rejected(self):
+        self.assertEqual(self.client.get("/media/avatar/../" + self.resume.blob.path).status_code, 404)
+        self.assertEqual(self.client.get("/media/avatar/%2E%2E/" + self.resume.blob.path).status_code, 404)
+
+    def test_token_query_parameter_is_not_accepted(self):
+        token = str(PeekpaAccessToken.for_user(self.candidate))
+        self.assertEqual(self.client.get(self.resume_url, {"token": token}).status_code, 401)
+
+    def test_signed_url(self):
+        response = self.client.get("/api/media/sign/", {"url": self.resume.url}, **auth(self.staff))
+        self.assertEqual(response.status_code, 200)
+        signed_url = response.json()["url"]
+        self.assertNotIn("token", signed_url)
+
+        response = self.client.get(signed_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Disposition"].startswith("attachment"))
+
+    def test_sign_requires_access(self):
+        self.assertEqual(self.client.get("/api/media/sign/", {"url": self.resume.url}).status_code, 401)
+        response = self.client.get("/api/media/sign/", {"url": self.resume.url}, **auth(self.other_staff))
+        self.assertEqual(response.status_code, 404)
+
+    def test_signature_is_scoped_to_one_file(self):
+        other = save_upload(SimpleUploadedFile("other.pdf", b"%PDF-1.4 other " + os.urandom(8)))
+        Resume.objects.create(name="简历", user=self.other_candidate, url=other.url, blob=other)
+        response = self.client.get("/" + other.url, {"signature": sign_media_path(self.resume.blob.path)})
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(MEDIA_SIGNED_URL_MAX_AGE=-1)
+    def test_expired_signature_is_rejected(self):
+        response = self.client.get(self.resume_url, {"signature": sign_media_path(self.resume.blob.path)})
+        self.assertEqual(response.status_code, 401)
+
+
+class ListQueryCountTests(APITestCase):
+    """列表接口的查询次数与返回的行数无关（公司信息和计数批量加载，没有 N+1 查询）"""
+
+    def setUp(self):
+        super().setUp()
+        self.company = create_company("公司0")
+        self.manager = create_staff(self.company, "manager@peekpa.test", is_manager=True)
+        self.candidate = create_candidate("candidate@peekpa.test")
+        self.rows = 0
+
+    def add_rows(self, count):
+        """每行新建一个公司和它的职位，职位带有一条投递记录"""
+        for _ in range(count):
+            self.rows += 1
+            company = create_company("公司{}".format(self.rows))
+            job = create_job(company, self.manager, title="职位{}".format(self.rows))
+            create_interview(job, self.candidate, self.manager)
+            create_job(self.company, self.manager, title="管理职位{}".format(self.rows))
+
+    def assert_constant_queries(self, url, headers=None):
+        headers = headers or {}
+        self.add_rows(2)
+        # 预热：首个请求会加载令牌黑名单和用户缓存，不计入比较
+        self.client.get(url, **headers)
+        cache.clear()
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.get(url, **headers).status_code, 200)
+
+        self.add_rows(10)
+        cache.clear()
+        with self.assertNumQueries(len(small)):
+            response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_job_list(self):
+        response = self.assert_constant_queries("/api/job/")
+        self.assertEqual(response.json()["count"], 24)
+
+    def test_job_list_for_staff(self):
+        # 职位列表使用 DRF 默认的认证方式，公司人员通过 Session 登录，返回结果中包含计数字段
+        self.client.force_login(self.manager)
+        response = self.assert_constant_queries("/api/job/")
+        self.assertIn("resumes", response.json()["results"][0])
+
+    def test_manage_job_list(self):
+        response = self.assert_constant_queries("/api/manage/job/", auth(self.manager))
+        self.assertEqual(response.json()["count"], 12)
+
+    def test_index(self):
+        response = self.assert_constant_queries("/api/index/")
+        self.assertEqual(len(response.json()["recommend_jobs"][2]["data_list"]), 12)
+
+
+class DashboardCacheTests(APITestCase):
+    """公司看板统计缓存"""
+
+    def setUp(self):
+        super().setUp()
+        self.company = create_company()
+        self.manager = create_staff(self.company, "manager@peekpa.test", is_manager=True)
+        create_interview(create_job(self.company, self.manager), create_candidate("candidate@peekpa.test"),
+                         self.manager)
+        self.version_key = caches.dashboard_version_key(self.company.id)
+
+    def get_dashboard(self):
+        response = self.client.get("/api/manage/dashboard/", **auth(self.manager))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cache_key_contains_date(self):
+        today = timezone.localdate()
+        with mock.patch("apps.api.view_manage.timezone.localdate", return_value=today):
+            self.assertEqual(self.get_dashboard()["resumes_new"], 1)
+        with mock.patch("apps.api.view_manage.timezone.localdate", return_value=today + timedelta(days=1)):
+            self.assertEqual(self.get_dashboard()["resumes_new"], 0)
+
+    def test_login_does_not_invalidate(self):
+        version = caches.get_version(self.version_key)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/auth/login/", {"email": "manager@peekpa.test", "password": PASSWORD})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(caches.get_version(self.version_key), version)
+
+    def test_membership_changes_invalidate(self):
+        other_company = create_company("其他公司")
+        other_version_key = caches.dashboard_version_key(other_company.id)
+        for field, value in (("is_manager", False), ("is_active", False), ("company", other_company)):
+            versions = caches.get_version(self.version_key), caches.get_version(other_version_key)
+            setattr(self.manager, field, value)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.manager.save()
+            self.assertNotEqual(caches.get_version(self.version_key), versions[0], field)
+        self.assertNotEqual(caches.get_version(other_version_key), versions[1])
+
+
+class MembershipPermissionTests(APITestCase):
+    """公司管理接口按 company / is_manager 字段校验权限，只能访问本公司的数据"""
+
+    def setUp(self):
+        super().setUp()
+        self.company = create_company()
+        self.manager = create_staff(self.company, "manager@peekpa.test", is_manager=True)
+        self.staff = create_staff(self.company, "staff@peekpa.test")
+        self.other_manager = create_staff(create_company("其他公司"), "other-manager@peekpa.test", is_manager=True)
+        self.job = create_job(self.company, self.manager)
+
+    def test_only_managers_manage_users(self):
+        response = self.client.get("/api/manage/user/", **auth(self.manager))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["email"] for item in response.json()["results"]], ["staff@peekpa.test"])
+        self.assertEqual(self.client.get("/api/manage/user/", **auth(self.staff)).status_code, 403)
+        response = self.client.get("/api/manage/user/", **auth(self.other_manager))
+        self.assertEqual(response.json()["results"], [])
+
+    def test_manager_cannot_update_other_company_users(self):
+        url = "/api/manage/user/{}/".format(self.staff.uid)
+        response = self.client.patch(url, {"is_active": False}, content_type="application/json",
+                                     **auth(self.other_manager))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.patch(url, {"is_active": False}, content_type="application/json",
+                                     **auth(self.manager))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(User.objects.get(pk=self.staff.pk).is_active)
+
+    def test_jobs_are_scoped_to_company(self):
+        url = "/api/manage/job/{}/".format(self.job.id)
+        self.assertEqual(self.client.get(url, **auth(self.staff)).status_code, 200)
+        self.assertEqual(self.client.get(url, **auth(self.other_manager)).status_code, 404)
+        # 普通员工只能在职位列表中看到自己发布的职位，管理员能看到公司所有职位
+        self.assertEqual(self.client.get("/api/manage/job/", **auth(self.staff)).json()["count"], 0)
+        self.assertEqual(self.client.get("/api/manage/job/", **auth(self.manager)).json()["count"], 1)
+
+
+class RevokedTokensTests(APITestCase):
+    """已注销 Token 集合：请求中只做增量同步，全量重建在请求之外进行；默认缓存不共享时直接查询黑名单表"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_candidate("candidate@peekpa.test")
+        self.revoked = RevokedTokens()
+        # 模拟部署时配置的共享缓存（Redis 等）；后台线程不进入定期重建的循环
+        for patcher in (mock.patch("apps.api.authentications.is_shared_cache", return_value=True),
+                        mock.patch.object(RevokedTokens, "run")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def revoke(self, token):
+        """模拟其他进程注销 Token：写入黑名单表并递增版本号"""
+        outstanding = OutstandingToken.objects.get(jti=token[api_settings.JTI_CLAIM])
+        BlacklistedToken.objects.create(token=outstanding)
+        caches.bump_version(REVOKED_TOKENS_VERSION_KEY)
+        return token[api_settings.JTI_CLAIM]
+
+    def test_logout_rejects_token(self):
+        for shared in (True, False):
+            with self.subTest(shared=shared), \
+                    mock.patch("apps.api.authentications.is_shared_cache", return_value=shared):
+                headers = auth(self.user)
+                self.assertEqual(self.client.get("/api/profile/", **headers).status_code, 200)
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.assertEqual(self.client.post("/api/auth/logout/", **headers).status_code, 204)
+                self.assertEqual(self.client.get("/api/profile/", **headers).status_code, 401)
+
+    def test_local_cache_queries_blacklist(self):
+        # 进程内缓存的版本号无法通知其他进程：不依赖版本号，每次校验都查询黑名单表，也不启动后台线程
+        jti = PeekpaAccessToken.for_user(self.user)[api_settings.JTI_CLAIM]
+        with mock.patch("apps.api.authentications.is_shared_cache", return_value=False):
+            self.assertFalse(self.revoked.contains(jti))
+            BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=jti))
+            with self.assertNumQueries(1):
+                self.assertTrue(self.revoked.contains(jti))
+        self.assertIsNone(self.revoked.thread)
+
+    def test_first_check_starts_once(self):
+        with mock.patch.object(self.revoked, "rebuild", wraps=self.revoked.rebuild) as rebuild:
+            self.assertFalse(self.revoked.contains("unknown"))
+            self.assertFalse(self.revoked.contains("unknown"))
+        self.assertEqual(rebuild.call_count, 1)
+        self.assertIsNotNone(self.revoked.thread)
+
+    def test_reset_after_fork(self):
+        self.revoked.start()
+        self.revoked.reset()
+        self.assertIsNone(self.revoked.thread)
+        with mock.patch.object(self.revoked, "rebuild") as rebuild:
+            self.revoked.contains("unknown")
+        self.assertEqual(rebuild.call_count, 1)
+
+    def test_incremental_sync_on_version_change(self):
+        self.revoked.start()
+        jti = self.revoke(PeekpaAccessToken.for_user(self.user))
+        with self.assertNumQueries(1):
+            self.assertTrue(self.revoked.contains(jti))
+        # 版本号不变时不查询数据库
+        with self.assertNumQueries(0):
+            self.assertTrue(self.revoked.contains(jti))
+
+    def test_incremental_sync_evicts_expired(self):
+        self.revoked.sync()
+        self.revoked.jtis["expired"] = time.time() - 1
+        self.revoke(PeekpaAccessToken.for_user(self.user))
+        self.revoked.sync()
+        self.assertNotIn("expired", self.revoked.jtis)
+
+    def test_rebuild_keeps_entries_added_meanwhile(self):
+        jti = self.revoke(PeekpaAccessToken.for_user(self.user))
+        self.revoked.jtis["revoked-meanwhile"] = time.time() + 60
+        self.revoked.start()
+        self.assertEqual(set(self.revoked.jtis), {jti, "revoked-meanwhile"})
+        with self.assertNumQueries(0):
+            self.assertTrue(self.revoked.contains(jti))
+
+    def test_start_runs_once(self):
+        with mock.patch.object(self.revoked, "rebuild", wraps=self.revoked.rebuild) as rebuild:
+            self.revoked.start()
+            self.revoked.thread.join()
+            self.revoked.start()
+        self.assertEqual(rebuild.call_count, 1)
+        self.assertEqual(RevokedTokens.run.call_count, 1)
+
+
+@override_settings(UPLOAD_MAX_SIZES={"resume": 1024})
+class UploadSizeLimitTests(APITestCase):
+    """上传视图在接收数据时检查文件大小，超过限制返回 413"""
+
+    def setUp(self):
+        super().setUp()
+        use_temp_media_root(self)
+        self.user = create_candidate("candidate@peekpa.test")
+
+    def upload(self, size, headers):
+        file = SimpleUploadedFile("resume.pdf", os.urandom(size), content_type="application/pdf")
+        return self.client.post("/api/resume/upload/", {"resume": file}, **headers)
+
+    def test_file_too_large(self):
+        response = self.upload(4096, auth(self.user))
+        self.assertEqual(response.status_code, 413)
+        # 旧简历保持不变
+        self.assertEqual(list(Resume.objects.filter(user=self.user).values_list("url", "is_active")),
+                         [("media/resume/resume.pdf", True)])
+
+    def test_file_within_limit(self):
+        self.assertEqual(self.upload(512, auth(self.user)).status_code, 201)
+
+    def test_anonymous_upload_is_rejected_before_parsing(self):
+        with mock.patch.object(SizeLimitUploadHandler, "receive_data_chunk") as receive_data_chunk:
+            self.assertEqual(self.upload(4096, {}).status_code, 401)
+        receive_data_chunk.assert_not_called()
+
+    def test_handler_stops_upload_at_django_level(self):
+        self.assertNotIn("apps.api.uploads.SizeLimitUploadHandler", settings.FILE_UPLOAD_HANDLERS)
+        handler = SizeLimitUploadHandler()
+        handler.new_file("resume", "resume.pdf", "application/pdf", 4096)
+        with self.assertRaises(StopUpload) as context:
+            handler.receive_data_chunk(b"x" * 4096, 0)
+        self.assertTrue(context.exception.connection_reset)
+        self.assertEqual(handler.exceeded_size, 1024)
+
+
+class ApplyJobTests(APITestCase):
+    """投递简历：重复投递按成功返回，只记录一次"""
+
+    def setUp(self):
+        super().setUp()
+        self.company = create_company()
+        self.staff = create_staff(self.company, "staff@peekpa.test")
+        self.candidate = create_candidate("candidate@peekpa.test")
+        self.job = create_job(self.company, self.staff)
+        self.url = "/api/job/{}/apply/".format(self.job.id)
+
+    def test_apply_twice(self):
+        for _ in range(2):
+            self.assertEqual(self.client.post(self.url, **auth(self.candidate)).status_code, 200)
+        self.assertEqual(Interview.objects.filter(job=self.job, candidate=self.candidate).count(), 1)
+        self.assertEqual(Job.objects.get(pk=self.job.pk).application_count, 1)
+
+    def test_other_integrity_errors_are_raised(self):
+        with mock.patch.object(Interview, "save", side_effect=IntegrityError("violates foreign key constraint")):
+            with self.assertRaises(IntegrityError):
+                self.client.post(self.url, **auth(self.candidate))
+
+    def test_rejected_applications(self):
+        self.assertEqual(self.client.post(self.url, **auth(self.staff)).status_code, 400)
+        no_resume = User.objects.create_user("no-resume@peekpa.test", PASSWORD)
+        self.assertEqual(self.client.post(self.url, **auth(no_resume)).status_code, 400)
+        Job.objects.filter(pk=self.job.pk).update(status=Job.STATUS_CLOSE)
+        self.assertEqual(self.client.post(self.url, **auth(self.candidate)).status_code, 404)
+        self.assertFalse(Interview.objects.exists())
+
+
+class ApplicationQueryCountTests(APITestCase):
+    """求职者投递记录的查询次数与投递数量无关，面试邀请通过 Prefetch 一次加载"""
+
+    def setUp(self):
+        super().setUp()
+        self.staff = create_staff(create_company(), "staff@peekpa.test")
+
+    def create_applicant(self, email, count):
+        candidate = create_candidate(email)
+        for index in range(count):
+            company = create_company("公司{}".format(index))
+            interview = create_interview(create_job(company, self.staff), candidate, self.staff, status=1)
+            create_invitation(interview)
+        return candidate
+
+    def get_applications(self, user):
+        response = self.client.get("/api/profile/applications/", {"limit": 20}, **auth(user))
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_query_count_does_not_grow_with_applications(self):
+        few, many = self.create_applicant("few@peekpa.test", 3), self.create_applicant("many@peekpa.test", 10)
+        # 预热：首个请求会加载令牌黑名单和用户缓存，不计入比较
+        self.get_applications(few)
+        self.get_applications(many)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(self.get_applications(few)), 3)
+        with self.assertNumQueries(len(queries)):
+            results = self.get_applications(many)
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(item["invitation"] for item in results))
+
+
+class ApplicationFeedTests(APITestCase):
+    """投递记录增量同步：updated_since 只返回之后有变更（状态变化或收到面试邀请）的投递记录"""
+
+    def setUp(self):
+        super().setUp()
+        self.staff = create_staff(create_company(), "staff@peekpa.test")
+        self.candidate = create_candidate("candidate@peekpa.test")
+        self.interviews = [create_interview(create_job(self.staff.company, self.staff, title="职位{}".format(index)),
+                                            self.candidate, self.staff) for index in range(3)]
+        create_interview(self.interviews[0].job, create_candidate("other@peekpa.test"), self.staff)
+
+    def get_feed(self, **params):
+        response = self.client.get("/api/profile/applications/", params, **auth(self.candidate))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_full_then_delta(self):
+        results = self.get_feed()["results"]
+        self.assertEqual([item["title"] for item in results], ["职位0", "职位1", "职位2"])
+        since = max(item["update_time"] for item in results)
+        self.assertEqual(self.get_feed(updated_since=since)["results"], [])
+
+        interview = Interview.objects.get(pk=self.interviews[2].pk)
+        interview.status = 1
+        interview.save()
+        create_invitation(self.interviews[0])
+        results = self.get_feed(updated_since=since)["results"]
+        self.assertEqual([item["title"] for item in results], ["职位2", "职位0"])
+        self.assertEqual(results[0]["status"], 1)
+        self.assertIsNotNone(results[1]["invitation"])
+
+    def test_cursor_pages_through_feed(self):
+        page = self.get_feed(cursor="", limit=2)
+        self.assertEqual([item["title"] for item in page["results"]], ["职位0", "职位1"])
+        response = self.client.get(page["next"], **auth(self.candidate))
+        self.assertEqual([item["title"] for item in response.json()["results"]], ["职位2"])
+
+    def test_invalid_updated_since(self):
+        response = self.client.get("/api/profile/applications/", {"updated_since": "yesterday"},
+                                   **auth(self.candidate))
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(REPLICA_DATABASES=["replica"], REPLICA_PIN_SECONDS=5, REPLICA_RETRY_INTERVAL=30)
+class ReplicaRoutingTests(APITestCase):
+    """只读接口读取从库，客户端写入后在 REPLICA_PIN_SECONDS 秒内读取主库"""
+
+    def setUp(self):
+        super().setUp()
+        replicas._unhealthy.clear()
+        self.addCleanup(replicas._unhealthy.clear)
+        self.factory = RequestFactory()
+
+    def route(self, method, view_class=JobListView, token="client-a"):
+        """经过中间件处理一个请求，返回视图执行期间 Job 的读库别名"""
+        request = getattr(self.factory, method)("/api/job/", HTTP_AUTHORIZATION="Bearer " + token)
+        aliases = []
+
+        def get_response(request):
+            middleware.process_view(request, view_class.as_view(), (), {})
+            aliases.append(replicas.ReplicaRouter().db_for_read(Job))
+            return HttpResponse()
+
+        middleware = replicas.ReplicaMiddleware(get_response)
+        middleware(request)
+        # 请求结束后恢复为主库
+        self.assertIsNone(replicas.ReplicaRouter().db_for_read(Job))
+        return aliases[0]
+
+    @mock.patch("apps.api.replicas._healthy", return_value=True)
+    def test_read_only_views_use_replica(self, healthy):
+        self.assertEqual(self.route("get"), "replica")
+        self.assertEqual(self.route("head"), "replica")
+        self.assertIsNone(self.route("get", view_class=ApplyJobView))
+
+    @mock.patch("apps.api.replicas._healthy", return_value=True)
+    def test_writes_pin_client_to_primary(self, healthy):
+        self.assertIsNone(self.route("post", view_class=ApplyJobView))
+        self.assertIsNone(self.route("get"))
+        # 其他客户端不受影响
+        self.assertEqual(self.route("get", token="client-b"), "replica")
+        # 固定时间过后重新读取从库
+        cache.delete(replicas._pin_key(self.factory.get("/", HTTP_AUTHORIZATION="Bearer client-a")))
+        self.assertEqual(self.route("get"), "replica")
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        replica = mock.Mock(**{"ensure_connection.side_effect": OperationalError("connection refused")})
+        with mock.patch("apps.api.replicas.connections", {"replica": replica}), \
+                self.assertLogs("apps.api.replicas", "WARNING"):
+            self.assertIsNone(self.route("get"))
+            self.assertIsNone(self.route("get"))
+        # REPLICA_RETRY_INTERVAL 内不再尝试连接
+        self.assertEqual(replica.ensure_connection.call_count, 1)
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_no_replicas_configured(self):
+        self.assertIsNone(self.route("post", view_class=ApplyJobView))
+        self.assertIsNone(self.route("get"))
+        self.assertFalse(cache.get(replicas._pin_key(self.factory.get("/", HTTP_AUTHORIZATION="Bearer client-a"))))
+
+    def test_writes_and_migrations_use_primary(self):
+        router = replicas.ReplicaRouter()
+        self.assertEqual(router.db_for_write(Job), "default")
+        self.assertTrue(router.allow_migrate("default", "job"))
+        self.assertFalse(router.allow_migrate("replica", "job"))
+
+    @mock.patch("apps.api.replicas.choose_replica", return_value="replica")
+    def test_cached_entries_are_built_from_primary(self, choose_replica):
+        # 按版本号失效的缓存在写入后的第一次请求中重建，从复制延迟的从库读取会把旧数据缓存到新版本号下
+        staff = create_staff(create_company(), "staff@peekpa.test")
+        job = create_job(staff.company, staff)
+        aliases = []
+
+        def db_for_read(router, model, **hints):
+            aliases.append(replicas._read_alias.get())
+            return None
+
+        with mock.patch.object(replicas.ReplicaRouter, "db_for_read", db_for_read):
+            for url in ("/api/job/", "/api/job/facets/"):
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertTrue(aliases)
+            self.assertNotIn("replica", aliases)
+            # 不缓存的只读接口仍然读取从库
+            self.assertEqual(self.client.get("/api/job/{}/".format(job.id)).status_code, 200)
+        self.assertIn("replica", aliases)
+
+    def test_check_requires_shared_cache(self):
+        self.assertEqual([error.id for error in checks.check_replica_cache(None)], ["api.E001"])
+        with mock.patch("apps.api.checks.is_shared_cache", return_value=True):
+            self.assertEqual(checks.check_replica_cache(None), [])
+        with override_settings(REPLICA_DATABASES=[]):
+            self.assertEqual(checks.check_replica_cache(None), [])
+
+
+class ConditionalGetTests(APITestCase):
+    """职位、公司详情的条件请求：版本号未变化时返回 304，只执行查询版本号的一条查询"""
+
+    def setUp(self):
+        super().setUp()
+        self.company = create_company()
+        self.staff = create_staff(self.company, "staff@peekpa.test")
+        self.job = create_job(self.company, self.staff)
+        self.job_url = "/api/job/{}/".format(self.job.id)
+        self.company_url = "/api/company/{}/".format(self.company.id)
+
+    def test_job_detail_not_modified(self):
+        response = self.client.get(self.job_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("Authorization", response["Vary"])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.job_url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        response = self.client.get(self.job_url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_job_changes_update_etag(self):
+        etag = self.client.get(self.job_url)["ETag"]
+        job = Job.objects.get(pk=self.job.pk)
+        job.title = "高级 Java 开发工程师"
+        job.save()
+        response = self.client.get(self.job_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["title"], "高级 Java 开发工程师")
+
+        # 面试通过人数变化时也会更新职位的版本号
+        etag = response["ETag"]
+        interview = create_interview(self.job, create_candidate("candidate@peekpa.test"), self.staff)
+        self.assertEqual(self.client.get(self.job_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        interview.status = Interview.STATUS_PASS
+        interview.save()
+        self.assertEqual(self.client.get(self.job_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_job_etag_is_personalized(self):
+        candidate = create_candidate("candidate@peekpa.test")
+        anonymous_etag = self.client.get(self.job_url)["ETag"]
+        etag = self.client.get(self.job_url, **auth(candidate))["ETag"]
+        self.assertNotEqual(etag, anonymous_etag)
+        self.assertEqual(self.client.get(self.job_url, HTTP_IF_NONE_MATCH=etag, **auth(candidate)).status_code, 304)
+        self.client.post("/api/job/{}/apply/".format(self.job.id), **auth(candidate))
+        response = self.client.get(self.job_url, HTTP_IF_NONE_MATCH=etag, **auth(candidate))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["applied"])
+
+    def test_company_detail(self):
+        response = self.client.get(self.company_url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertEqual(self.client.get(self.company_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # 公司详情包含职位列表，职位变更时公司的版本号也会更新
+        create_job(self.company, self.staff, title="Python 开发工程师")
+        self.assertEqual(self.client.get(self.company_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_objects(self):
+        self.assertEqual(self.client.get("/api/job/0/").status_code, 404)
+        self.assertEqual(self.client.get("/api/company/abc/").status_code, 404)
+
+
+class JobListCacheTests(APITestCase):
+    """职位列表缓存：等价的查询共用缓存，职位或公司写入提交后整体失效"""
+
+    def setUp(self):
+        super().setUp()
+        JOB_LIST_CACHE_STATS.clear()
+        self.company = create_company()
+        self.staff = create_staff(self.company, "staff@peekpa.test")
+        self.job = create_job(self.company, self.staff)
+
+    def get_titles(self, params=None, **headers):
+        response = self.client.get("/api/job/", params or {}, **headers)
+        self.assertEqual(response.status_code, 200)
+        return [(item["title"], item["company_name"]) for item in response.json()["results"]]
+
+    def assert_stats(self, hit, miss):
+        self.assertEqual((JOB_LIST_CACHE_STATS["hit"], JOB_LIST_CACHE_STATS["miss"]), (hit, miss))
+
+    def test_hit_after_miss(self):
+        self.get_titles()
+        with self.assertNumQueries(0):
+            self.get_titles()
+        self.assert_stats(1, 1)
+        # 大小写、首尾空白和空参数不同的等价查询共用缓存
+        self.get_titles({"q": "Java"})
+        self.get_titles({"q": " java ", "city": ""})
+        self.assert_stats(2, 2)
+
+    def test_job_write_invalidates(self):
+        self.get_titles()
+        job = Job.objects.get(pk=self.job.pk)
+        job.title = "Go 开发工程师"
+        with self.captureOnCommitCallbacks(execute=True):
+            job.save()
+        self.assertEqual(self.get_titles(), [("Go 开发工程师", "测试公司")])
+        with self.captureOnCommitCallbacks(execute=True):
+            job.delete()
+        self.assertEqual(self.get_titles(), [])
+        self.assert_stats(0, 3)
+
+    def test_company_write_invalidates(self):
+        self.get_titles()
+        self.company.name = "新公司名"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.company.save()
+        self.assertEqual(self.get_titles(), [("Java 开发工程师", "新公司名")])
+
+    def test_rolled_back_write_keeps_cache(self):
+        self.get_titles()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    Job.objects.get(pk=self.job.pk).save()
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.get_titles()
+        self.assert_stats(1, 1)
+
+    def test_staff_bypasses_cache(self):
+        # 职位列表使用 DRF 默认的认证方式，公司人员通过 Session 登录
+        self.client.force_login(self.staff)
+        self.get_titles()
+        self.get_titles()
+        self.assert_stats(0, 0)
+
+
+class JobFacetTests(APITestCase):
+    """职位筛选项计数：一条分组查询，每个筛选项的计数不应用该筛选项自身的条件"""
+
+    def setUp(self):
+        super().setUp()
+        company = create_company()
+        staff = create_staff(company, "staff@peekpa.test")
+        create_job(company, staff, education="本科", experience="1-3年", city="北京", salary_min=10000, salary_max=20000)
+        create_job(company, staff, title="Python 开发工程师", education="本科", experience="3-5年", city="上海",
+                   salary_min=3000, salary_max=4000)
+        create_job(company, staff, education="硕士", experience="1-3年", city="北京", salary_min=0, salary_max=0)
+        create_job(company, staff, education="本科", experience="1-3年", city="北京", salary_min=25000,
+                   salary_max=35000, status=Job.STATUS_CLOSE)
+
+    def get_facets(self, **params):
+        response = self.client.get("/api/job/facets/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_counts_without_filters(self):
+        with self.assertNumQueries(1):
+            facets = self.get_facets()
+        self.assertEqual(facets["count"], 3)
+        self.assertEqual(facets["education"], [{"value": "本科", "count": 2}, {"value": "硕士", "count": 1}])
+        self.assertEqual(facets["city"], [{"value": "北京", "count": 2}, {"value": "上海", "count": 1}])
+        self.assertEqual({item["value"]: item["count"] for item in facets["salary"]},
+                         {"面议": 1, "0-5000": 1, "5000-10000": 0, "10000-20000": 1, "20000-30000": 0, "30000-": 0})
+
+    def test_facet_ignores_its_own_filter(self):
+        facets = self.get_facets(education="本科")
+        self.assertEqual(facets["count"], 2)
+        self.assertEqual(facets["education"], [{"value": "本科", "count": 2}, {"value": "硕士", "count": 1}])
+        self.assertEqual(facets["experience"], [{"value": "1-3年", "count": 1}, {"value": "3-5年", "count": 1}])
+        # 与职位列表的结果数量一致
+        self.assertEqual(self.client.get("/api/job/", {"education": "本科"}).json()["count"], 2)
+
+    def test_keyword_and_salary_apply_to_all_facets(self):
+        facets = self.get_facets(q="python")
+        self.assertEqual((facets["count"], facets["city"]), (1, [{"value": "上海", "count": 1}]))
+        facets = self.get_facets(salary_gte=8000)
+        self.assertEqual(facets["count"], 1)
+        self.assertEqual(facets["education"], [{"value": "本科", "count": 1}])
+
+    def test_city_and_salary_filter_job_list(self):
+        # 薪资范围有交集即命中，面议的职位不参与薪资筛选
+        response = self.client.get("/api/job/", {"city": "北京", "salary_gte": 15000, "salary_lte": 30000})
+        self.assertEqual(response.json()["count"], 1)
+        self.assertEqual(self.client.get("/api/job/", {"salary_lte": 3000}).json()["count"], 1)
+        self.assertEqual(self.client.get("/api/job/", {"city": "北京"}).json()["count"], 2)
+
+    def test_invalid_salary(self):
+        self.assertEqual(self.client.get("/api/job/facets/", {"salary_gte": "-1"}).status_code, 400)
+
+
+class KeysetPaginationTests(APITestCase):
+    """游标分页：格式正确但边界值类型不符的游标返回 404，而不是 500"""
+
+    def setUp(self):
+        super().setUp()
+        company = create_company()
+        staff = create_staff(company, "staff@peekpa.test")
+        for index in range(3):
+            create_job(company, staff, title="职位{}".format(index))
+
+    def get_jobs(self, values, **params):
+        cursor = base64.urlsafe_b64encode(json.dumps({"v": values}).encode("utf-8")).decode("ascii")
+        return self.client.get("/api/job/", {"cursor": cursor, **params})
+
+    def test_valid_cursor(self):
+        response = self.client.get("/api/job/", {"cursor": "", "limit": 2})
+        self.assertEqual([item["title"] for item in response.json()["results"]], ["职位0", "职位1"])
+        response = self.client.get(response.json()["next"])
+        self.assertEqual([item["title"] for item in response.json()["results"]], ["职位2"])
+
+    def test_cursor_values_with_wrong_types(self):
+        for values, params in ((["职位0", "x"], {}), (["职位0", {"id": 1}], {}), ([None, 1], {}),
+                               (["职位0", None], {}), (["not-a-date", 1], {"order": "newest"}),
+                               ([[2024], 1], {"order": "newest"}), ({"title": "职位0"}, {}), (None, {})):
+            with self.subTest(values=values, **params):
+                self.assertEqual(self.get_jobs(values, **params).status_code, 404)
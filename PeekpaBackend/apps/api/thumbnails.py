@@ -0,0 +1,64 @@
+import io
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+except ImportError:  # Pillow 是可选依赖，未安装时不生成缩略图，接口继续返回原图
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# 缩略图格式：WebP 体积最小，fallback 用于不支持 WebP 的浏览器，有透明通道时使用 PNG，否则使用 JPEG
+FALLBACK_FORMATS = {"PNG": "png", "JPEG": "jpg"}
+
+
+def thumbnail_path(file_hash, size, extension):
+    """缩略图在存储中的路径：thumbs/<哈希前两位>/<哈希>_<尺寸>.<扩展名>"""
+    return "thumbs/{}/{}_{}.{}".format(file_hash[:2], file_hash, size, extension)
+
+
+def thumbnail_url(variants, url, size=None, kind="fallback"):
+    """返回指定尺寸（默认 THUMBNAIL_CARD_SIZE）和格式的缩略图 URL，缩略图尚未生成时返回原图 URL"""
+    size = size or settings.THUMBNAIL_CARD_SIZE
+    return (variants or {}).get(str(size), {}).get(kind) or url
+
+
+def make_thumbnails(blob):
+    """
+    为图片生成 THUMBNAIL_SIZES 中各尺寸的缩略图并保存，返回 {尺寸: {"webp": URL, "fallback": URL}}。
+
+    缩略图按比例缩放到不超过 尺寸 x 尺寸，并重新压缩；未安装 Pillow 或文件不是图片时返回空字典。
+    """
+    if Image is None:
+        logger.warning("未安装 Pillow，跳过缩略图生成")
+        return {}
+    try:
+        with default_storage.open(blob.path, "rb") as file:
+            image = Image.open(file)
+            image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        logger.warning("文件 %s 不是可以处理的图片，跳过缩略图生成", blob.path, exc_info=True)
+        return {}
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    fallback_format = "PNG" if has_alpha else "JPEG"
+    variants = {}
+    for size in settings.THUMBNAIL_SIZES:
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size), Image.LANCZOS)
+        variant = {}
+        for kind, image_format, extension in (("webp", "WEBP", "webp"),
+                                              ("fallback", fallback_format, FALLBACK_FORMATS[fallback_format])):
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, image_format, quality=settings.THUMBNAIL_QUALITY, optimize=True)
+            path = thumbnail_path(blob.hash, size, extension)
+            # 任务重试时覆盖上次生成的文件，避免存储自动改名留下多余文件
+            default_storage.delete(path)
+            variant[kind] = "media/{}".format(default_storage.save(path, ContentFile(buffer.getvalue())))
+        variants[str(size)] = variant
+    return variants
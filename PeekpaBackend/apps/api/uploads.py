@@ -0,0 +1,114 @@
+import hashlib
+from functools import partial
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from apps.peekpauser.models import Blob
+
+
+class FileTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "上传的文件过大。"
+    default_code = "file_too_large"
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    """
+    上传文件大小限制处理器，由 UploadSizeLimitMixin 只安装在上传文件的视图上。
+
+    在 Django 逐块接收上传数据时累计文件大小，超过 UPLOAD_MAX_SIZES 中该表单字段（未配置时为 UPLOAD_MAX_SIZE）
+    的限制时抛出 StopUpload(connection_reset=True) 立即中止解析，不再读取剩余的请求体，
+    超大文件不会被完整接收、缓存或写入临时文件；视图随后返回 413。
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.exceeded_size = None  # 超过限制时记录该字段的大小限制
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.max_size = settings.UPLOAD_MAX_SIZES.get(field_name, settings.UPLOAD_MAX_SIZE)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.exceeded_size = self.max_size
+            raise StopUpload(connection_reset=True)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+class UploadSizeLimitMixin:
+    """
+    上传文件视图的 Mixin：在解析请求体之前安装 SizeLimitUploadHandler，认证和权限检查通过后再解析请求体，
+    文件超过大小限制时返回 413。其他视图（包括 Django admin）使用默认的上传处理器。
+    """
+
+    def initial(self, request, *args, **kwargs):
+        handler = SizeLimitUploadHandler(request._request)
+        request.upload_handlers.insert(0, handler)
+        super().initial(request, *args, **kwargs)
+        if request.content_type.startswith("multipart/form-data"):
+            request.data  # 解析请求体
+            if handler.exceeded_size is not None:
+                raise FileTooLarge("上传的文件不能超过 {} MB。".format(handler.exceeded_size // (1024 * 1024)))
+
+
+def save_upload(file):
+    """
+    按内容保存上传的文件，返回引用该内容的 Blob，调用方需要把 Blob 关联到简历或头像上。
+
+    文件按 SHA-256 哈希保存为 blobs/<哈希前两位>/<哈希>.<扩展名>：相同内容已经存在时只把引用数量加一，
+    不再写入文件；否则直接把 UploadedFile 交给存储（大文件已由 TemporaryFileUploadHandler 写入临时文件，
+    FileSystemStorage 会直接移动临时文件），不会把整个文件读入内存。
+    """
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file_hash = digest.hexdigest()
+    with transaction.atomic():
+        # 锁住已有的 Blob，避免并发的 release_blob() 在引用数量加一之前删除文件
+        blob = Blob.objects.select_for_update().filter(hash=file_hash).first()
+        if blob is not None:
+            Blob.objects.filter(id=blob.id).update(ref_count=F("ref_count") + 1)
+            return blob
+    extension = file.name.rpartition(".")[2].lower() if "." in file.name else ""
+    file_path = "blobs/{}/{}{}".format(file_hash[:2], file_hash, "." + extension if extension else "")
+    saved_path = default_storage.save(file_path, file)
+    try:
+        with transaction.atomic():
+            return Blob.objects.create(hash=file_hash, path=saved_path, size=file.size, ref_count=1)
+    except IntegrityError:
+        # 相同内容被并发上传并且先保存成功，丢弃本次写入的文件，引用已有的 Blob
+        default_storage.delete(saved_path)
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().get(hash=file_hash)
+            Blob.objects.filter(id=blob.id).update(ref_count=F("ref_count") + 1)
+            return blob
+
+
+def release_blob(blob_id):
+    """
+    释放对 Blob 的一次引用，引用数量降为 0 时删除 Blob，并在事务提交后删除文件及其缩略图。
+    """
+    with transaction.atomic():
+        blob = Blob.objects.select_for_update().filter(id=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            Blob.objects.filter(id=blob.id).update(ref_count=F("ref_count") - 1)
+            return
+        blob.delete()
+        paths = [blob.path] + [url[6:] for variant in blob.variants.values() for url in variant.values()]
+        for path in paths:
+            transaction.on_commit(partial(default_storage.delete, path))
+
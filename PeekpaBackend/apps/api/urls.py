@@ -1,12 +1,14 @@
 from django.urls import path
 from apps.api.view_auth import LoginView, LoginAdminView, RegisterUserView, UserAdminView, UserAdminDetailView, \
-    CompanyAdminView, CompanyProfileView, ProfileView, LogoutView
-from apps.api.view_job import ResumeView, AvatarView, JobListView, JobDetailView, InvitationDetailView, ApplyJobView
+    CompanyAdminView, CompanyProfileView, ProfileView, ApplicationListView, LogoutView
+from apps.api.view_job import ResumeView, AvatarView, JobListView, JobDetailView, InvitationDetailView, ApplyJobView, \
+    JobFacetView
 from apps.api.view_manage import ManageJobListView, ManageJobNameListView, ManageJobDetailView, ManageInterviewListView, \
     ManageInterviewDetailView, ManageInvitationView, ManageInvitationDetailView, DashboardView
 from apps.api.view_company import CompanyListView, CompanyDetailView
 
 from apps.api.view_index import IndexView
+from apps.api.view_media import MediaSignView
 
 app_name = "api"
 
@@ -48,6 +50,8 @@ urlpatterns = [
     path("manage/dashboard/", DashboardView.as_view(), name="dashboard_view"),
     # 招聘网站前端职位列表接口
     path("job/", JobListView.as_view(), name="job_list_view"),
+    # 职位筛选项计数接口，需要放在职位详情接口之前
+    path("job/facets/", JobFacetView.as_view(), name="job_facet_view"),
     # 招聘网站前端职位详情接口
     path("job/<str:id>/", JobDetailView.as_view(), name="job_detail_view"),
     # 回复面试邀请消息接口
@@ -62,8 +66,12 @@ urlpatterns = [
     path("index/", IndexView.as_view(), name="index_view"),
     # 求职者个人信息修改接口
     path("profile/", ProfileView.as_view(), name="profile_user_view"),
+    # 求职者投递记录接口
+    path("profile/applications/", ApplicationListView.as_view(), name="profile_application_list_view"),
     # 公司用户信息修改接口
     path("manage/setting/", CompanyProfileView.as_view(), name="company_profile_user_view"),
+    # 上传文件签名 URL 接口，用于下载简历
+    path("media/sign/", MediaSignView.as_view(), name="media_sign_view"),
     # 登出接口
     path("auth/logout/", LogoutView.as_view(), name="logout_view"),
 ]
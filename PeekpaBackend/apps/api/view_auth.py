@@ -1,8 +1,4 @@
-import uuid
-
-from django.core.files.base import ContentFile
-from django.core.files.storage import default_storage
-from django.db.models import Q
+from django.db.models import F, Q, Prefetch
 from django_filters import rest_framework as filters
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.generics import get_object_or_404
@@ -11,16 +7,19 @@ from django.contrib import auth
 from django.contrib.auth.models import update_last_login
 from rest_framework import generics, status, permissions
 from rest_framework.views import APIView
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from apps.api.serializers import LoginSerializer, RegisterUserSerializer, AdminUserListSerializer, \
-    AdminCompanyListSerializer, UserSerializer, CompanyProfileSerializer
+    AdminCompanyListSerializer, UserSerializer, CompanyProfileSerializer, ApplicationSerializer
 from apps.api.permissions import IsCompanyAdminUser, IsSuperUser
+from apps.api.paginations import KeysetPagination
 from apps.company.models import Company
+from apps.job.models import Interview, Invitation
 from apps.peekpauser.models import User, Avatar
 from rest_framework_simplejwt.exceptions import TokenError
 
-from apps.api.authentications import PeekpaAccessToken
+from apps.api.authentications import PeekpaAccessToken, PeekpaJWTAuthentication
+from apps.api.uploads import save_upload, UploadSizeLimitMixin
+from apps.peekpauser.tasks import enqueue_thumbnails
 
 
 class LoginBaseView(generics.GenericAPIView):
@@ -85,24 +84,20 @@ class UserAdminView(generics.ListCreateAPIView):
     serializer_class = AdminUserListSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = UserListFilter
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [PeekpaJWTAuthentication]
     permission_classes = [IsCompanyAdminUser]
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        company_id = self.request.user.details.get("company_id", -1)
-        queryset = queryset.filter(details__contains={"company_id": company_id}).exclude(uid=self.request.user.uid)
+        company_id = self.request.user.company_id or -1
+        queryset = queryset.filter(company_id=company_id).exclude(uid=self.request.user.uid)
         return queryset
 
     def perform_create(self, serializer):
         password = self.request.data.get("password")
         user = serializer.save()
-        company_id = self.request.user.details.get("company_id")
-        details = {
-            "company_id": company_id,
-            "is_manager": False
-        }
-        user.details = details
+        user.company_id = self.request.user.company_id
+        user.is_manager = False
         user.is_staff = True
         user.set_password(password)
         user.save()
@@ -111,15 +106,14 @@ class UserAdminView(generics.ListCreateAPIView):
 class UserAdminDetailView(generics.UpdateAPIView):
     queryset = User.objects.all()
     serializer_class = AdminUserListSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [PeekpaJWTAuthentication]
     permission_classes = [IsCompanyAdminUser]
     lookup_field = "uid"
 
     def get_object(self):
         queryset = super().get_queryset()
-        company_id = self.request.user.details.get("company_id", -1)
-        queryset = queryset.filter(
-            Q(details__contains={"company_id": company_id}))
+        company_id = self.request.user.company_id or -1
+        queryset = queryset.filter(company_id=company_id)
         uid = self.kwargs["uid"]
         obj = get_object_or_404(queryset, uid=uid)
         return obj
@@ -140,11 +134,12 @@ class CompanyListFilter(filters.FilterSet):
 
 
 class CompanyAdminView(generics.ListCreateAPIView):
-    queryset = Company.objects.all().order_by("-id")
+    queryset = Company.objects.all().order_by("-id").prefetch_related(
+        Prefetch("staff", queryset=User.objects.filter(is_manager=True).order_by("uid"), to_attr="managers"))
     serializer_class = AdminCompanyListSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = CompanyListFilter
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [PeekpaJWTAuthentication]
     permission_classes = [IsSuperUser]
 
     def create(self, request, *args, **kwargs):
@@ -162,9 +157,8 @@ class CompanyAdminView(generics.ListCreateAPIView):
         first_name = validata_data.get("first_name")
         last_name = validata_data.get("last_name")
         email = validata_data.get("email")
-        details = {"company_id": company.id, "is_manager": True}
-        user = User.objects.create(email=email, first_name=first_name, last_name=last_name, details=details,
-                                   is_staff=True)
+        user = User.objects.create(email=email, first_name=first_name, last_name=last_name, company=company,
+                                   is_manager=True, is_staff=True)
         user.set_password(password)
         user.save()
         return Response(status=status.HTTP_201_CREATED)
@@ -173,7 +167,7 @@ class CompanyAdminView(generics.ListCreateAPIView):
 class ProfileView(generics.RetrieveUpdateAPIView):
     queryset = User.objects.filter(is_staff=False)
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [PeekpaJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
@@ -195,14 +189,41 @@ class ProfileView(generics.RetrieveUpdateAPIView):
         return Response(serializer.data)
 
 
-class CompanyProfileView(generics.RetrieveUpdateAPIView):
+class ApplicationListFilter(filters.FilterSet):
+    # 只返回该时间（ISO 8601）之后有变更的投递记录，客户端传入上次拉取到的最大 update_time 即可增量同步
+    updated_since = filters.IsoDateTimeFilter(field_name="update_time", lookup_expr="gt")
+
+    class Meta:
+        model = Interview
+        fields = ["updated_since"]
+
+
+class ApplicationListView(generics.ListAPIView):
+    """求职者的投递记录列表，按更新时间从早到晚排序，支持 limit/offset 和游标分页"""
+    serializer_class = ApplicationSerializer
+    authentication_classes = [PeekpaJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ApplicationListFilter
+
+    def get_queryset(self):
+        # 一条 面试 -> 职位 -> 公司 的关联查询，加一条预加载与面试状态一致的面试邀请的查询
+        uid = self.request.user.uid
+        return Interview.objects.filter(candidate_id=uid).select_related("job__company").prefetch_related(
+            Prefetch("invitations", queryset=Invitation.objects.filter(
+                candidate_id=uid, status=F("interview__status")).order_by("id"), to_attr="matched_invitations")
+        ).order_by("update_time", "id")
+
+
+class CompanyProfileView(UploadSizeLimitMixin, generics.RetrieveUpdateAPIView):
     queryset = Company.objects.all()
     serializer_class = CompanyProfileSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [PeekpaJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        company_id = self.request.user.details.get("company_id", -1)
+        company_id = self.request.user.company_id or -1
         company = get_object_or_404(self.queryset, id=company_id)
         return company
 
@@ -213,25 +234,24 @@ class CompanyProfileView(generics.RetrieveUpdateAPIView):
         company = self.get_object()
         # 修改密码
         if "password" in request.data and request.data.get("password"):
-            request.user.set_password(request.data.get("password"))
-            request.user.save()
-        if request.user.details.get("is_manager", False):
+            # request.user 来自认证缓存，只包含部分字段，修改前重新从数据库读取
+            user = User.objects.get(uid=request.user.uid)
+            user.set_password(request.data.get("password"))
+            user.save()
+        if request.user.is_manager:
             # 更新公司头像
             if "avatar_file" in request.data:
                 file = request.data.get("avatar_file")
-                old_avatars = Avatar.objects.filter(user=self.request.user)
-                if old_avatars.count():
-                    if old_avatars.count():
-                        # 删除旧的 Avatar 对象及其关联的文件
-                        for old_avatar in old_avatars:
-                            default_storage.delete(old_avatar.url[6:])
-                        old_avatars.delete()
+                # 先保存新文件再删除旧头像，重复上传相同内容时直接复用已有文件
+                blob = save_upload(file)
+                # 删除旧的 Avatar 对象，关联的文件由 post_delete 信号加入后台任务队列释放
+                Avatar.objects.filter(user=self.request.user).delete()
                 file_name = file.name
-                file_path = f"avatar/{'.'.join(file_name.split('.')[:-1])}_{str(uuid.uuid4())[:8]}.{file_name.split('.')[-1]}"
-                saved_path = default_storage.save(file_path, ContentFile(file.read()))
-                avatar = Avatar.objects.create(name=file_name, user=self.request.user,
-                                               url="media/{}".format(saved_path))
+                avatar = Avatar.objects.create(name=file_name, user=self.request.user, url=blob.url, blob=blob)
                 company.avatar = avatar.url
+                company.avatar_variants = blob.variants
+                # 在后台生成缩略图，生成后同步到公司的 avatar_variants
+                enqueue_thumbnails(blob)
             company.slogan = request.data.get("slogan", company.slogan)
             company.size = request.data.get("size", company.size)
             company.description = request.data.get("description", company.description)
@@ -243,7 +263,7 @@ class CompanyProfileView(generics.RetrieveUpdateAPIView):
 
 class LogoutView(APIView):
     queryset = User.objects.filter(is_staff=False)
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [PeekpaJWTAuthentication]
     permission_classes = (permissions.IsAuthenticated,)
 
     def post(self, request):
@@ -1,11 +1,13 @@
 from django_filters import rest_framework as filters
 
 from apps.company.models import Company
-from django.db.models import Q, Count
+from django.db.models import Q
 from urllib.parse import unquote
 from rest_framework import generics
 from apps.api.serializers import CompanyListSerializer, CompanySerializer
 from django_filters.rest_framework import DjangoFilterBackend
+from apps.api.conditional import conditional_get
+from apps.api.paginations import KeysetPagination
 
 
 class CompanyListFilter(filters.FilterSet):
@@ -41,7 +43,7 @@ class CompanyListFilter(filters.FilterSet):
     # 按照职位发布数量排序
     def order_search(self, queryset, name, value):
         if value == "job":
-            return queryset.annotate(job_count=Count("jobs")).order_by("-job_count")
+            return queryset.order_by("-job_count")
         return queryset
 
 
@@ -50,9 +52,23 @@ class CompanyListView(generics.ListAPIView):
     serializer_class = CompanyListSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = CompanyListFilter
+    pagination_class = KeysetPagination
+    use_read_replica = True  # 只读接口，读取从库，见 apps.api.replicas
 
 
+def company_stamp(request, id):
+    """公司详情的版本号：公司的 update_time，公司信息或其职位变更时更新"""
+    if not id.isdigit():
+        return None
+    update_time = Company.objects.filter(id=id).values_list("update_time", flat=True).first()
+    if update_time is None:
+        return None
+    return "company-{}-{:x}".format(id, int(update_time.timestamp() * 1000000)), update_time
+
+
+@conditional_get(company_stamp)
 class CompanyDetailView(generics.RetrieveAPIView):
     queryset = Company.objects.all()
     serializer_class = CompanySerializer
     lookup_field = "id"
+    use_read_replica = True
@@ -1,264 +1,283 @@
-from django.db.models import Count
+from django.conf import settings
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.api import caches
+from apps.api.sampling import random_sample
 from apps.api.serializers import JobListSerializer, CompanyListSerializer
 from apps.company.models import Company
 from apps.job.models import Job
 
-
-class IndexView(APIView):
-
-    def get(self, request):
-        content = {}
-        # 标签分类区实现
-        category = [
-            {
-                "title": "技术",
-                "param": "q",
-                "filters": [
-                    {
-                        "name": "Java",
-                        "param": "java"
-                    },
-                    {
-                        "name": "PHP",
-                        "param": "php"
-                    },
-                    {
-                        "name": "C++",
-                        "param": "c++"
-                    },
-                    {
-                        "name": "区块链",
-                        "param": "区块链"
-                    },
-                    {
-                        "name": "Android",
-                        "param": "android"
-                    },
-                    {
-                        "name": "iOS",
-                        "param": "ios"
-                    }
-                ]
+# 标签分类区
+CATEGORY = [
+    {
+        "title": "技术",
+        "param": "q",
+        "filters": [
+            {
+                "name": "Java",
+                "param": "java"
             },
             {
-                "title": "产品",
-                "param": "q",
-                "filters": [
-                    {
-                        "name": "产品总监",
-                        "param": "产品总监"
-                    },
-                    {
-                        "name": "产品经理",
-                        "param": "产品经理"
-                    },
-                    {
-                        "name": "数据产品经理",
-                        "param": "数据产品经理"
-                    },
-                    {
-                        "name": "游戏策划",
-                        "param": "游戏策划"
-                    }
-                ]
+                "name": "PHP",
+                "param": "php"
             },
             {
-                "title": "设计",
-                "param": "q",
-                "filters": [
-                    {
-                        "name": "UI设计师",
-                        "param": "UI设计师"
-                    },
-                    {
-                        "name": "交互设计",
-                        "param": "交互设计"
-                    },
-                    {
-                        "name": "网页设计师",
-                        "param": "网页设计师"
-                    },
-                    {
-                        "name": "平面设计师",
-                        "param": "平面设计师"
-                    }
-                ]
+                "name": "C++",
+                "param": "c++"
             },
             {
-                "title": "运营",
-                "param": "q",
-                "filters": [
-                    {
-                        "name": "新媒体运营",
-                        "param": "新媒体运营"
-                    },
-                    {
-                        "name": "编辑",
-                        "param": "编辑"
-                    },
-                    {
-                        "name": "数据运营",
-                        "param": "数据运营"
-                    },
-                    {
-                        "name": "运营总监",
-                        "param": "运营总监"
-                    },
-                    {
-                        "name": "COO",
-                        "param": "COO"
-                    }
-                ]
+                "name": "区块链",
+                "param": "区块链"
             },
             {
-                "title": "市场",
-                "param": "q",
-                "filters": [
-                    {
-                        "name": "市场营销",
-                        "param": "市场营销"
-                    },
-                    {
-                        "name": "市场推广",
-                        "param": "市场推广"
-                    },
-                    {
-                        "name": "市场策划",
-                        "param": "市场策划"
-                    },
-                    {
-                        "name": "政府关系",
-                        "param": "政府关系"
-                    }
-                ]
+                "name": "Android",
+                "param": "android"
             },
             {
-                "title": "销售",
-                "param": "q",
-                "filters": [
-                    {
-                        "name": "销售专员",
-                        "param": "销售专员"
-                    },
-                    {
-                        "name": "销售经理",
-                        "param": "销售经理"
-                    },
-                    {
-                        "name": "销售总监",
-                        "param": "销售总监"
-                    },
-                    {
-                        "name": "大客户代表",
-                        "param": "大客户代表"
-                    }
-                ]
+                "name": "iOS",
+                "param": "ios"
+            }
+        ]
+    },
+    {
+        "title": "产品",
+        "param": "q",
+        "filters": [
+            {
+                "name": "产品总监",
+                "param": "产品总监"
             },
             {
-                "title": "职能",
-                "param": "q",
-                "filters": [
-                    {
-                        "name": "HR",
-                        "param": "HR"
-                    },
-                    {
-                        "name": "行政",
-                        "param": "行政"
-                    },
-                    {
-                        "name": "财务",
-                        "param": "财务"
-                    },
-                    {
-                        "name": "审计",
-                        "param": "审计"
-                    }
-                ]
+                "name": "产品经理",
+                "param": "产品经理"
             },
             {
-                "title": "游戏",
-                "param": "q",
-                "filters": [
-                    {
-                        "name": "小游戏开发",
-                        "param": "小游戏开发"
-                    },
-                    {
-                        "name": "U3D",
-                        "param": "U3D"
-                    },
-                    {
-                        "name": "游戏策划",
-                        "param": "游戏策划"
-                    },
-                    {
-                        "name": "游戏运营",
-                        "param": "游戏运营"
-                    }
-                ]
+                "name": "数据产品经理",
+                "param": "数据产品经理"
             },
+            {
+                "name": "游戏策划",
+                "param": "游戏策划"
+            }
         ]
-        # 轮播图区
-        banner = [
+    },
+    {
+        "title": "设计",
+        "param": "q",
+        "filters": [
             {
-                "img_url": "/banner1.png",
-                "link_url": "/#/jobs/?q=123"
+                "name": "UI设计师",
+                "param": "UI设计师"
             },
             {
-                "img_url": "/banner2.png",
-                "link_url": "/#/companies/?q=乐视"
+                "name": "交互设计",
+                "param": "交互设计"
+            },
+            {
+                "name": "网页设计师",
+                "param": "网页设计师"
+            },
+            {
+                "name": "平面设计师",
+                "param": "平面设计师"
+            }
+        ]
+    },
+    {
+        "title": "运营",
+        "param": "q",
+        "filters": [
+            {
+                "name": "新媒体运营",
+                "param": "新媒体运营"
             },
             {
-                "img_url": "/banner3.jpeg",
-                "link_url": "/#/jobs/?q=vue"
+                "name": "编辑",
+                "param": "编辑"
             },
             {
-                "img_url": "/banner4.png",
-                "link_url": "/#/companies/?q=乐视"
+                "name": "数据运营",
+                "param": "数据运营"
             },
+            {
+                "name": "运营总监",
+                "param": "运营总监"
+            },
+            {
+                "name": "COO",
+                "param": "COO"
+            }
         ]
-        # 职位推荐区
-        recommend_jobs = [
+    },
+    {
+        "title": "市场",
+        "param": "q",
+        "filters": [
             {
-                "name": "为你匹配",
-                "data_list": JobListSerializer(Job.objects.filter(status=Job.STATUS_PUBLISH).order_by("?")[:12],
-                                               many=True).data
+                "name": "市场营销",
+                "param": "市场营销"
             },
             {
-                "name": "24Hour热门",
-                "data_list": JobListSerializer(Job.objects.filter(status=Job.STATUS_PUBLISH).order_by("?")[:12],
-                                               many=True).data
+                "name": "市场推广",
+                "param": "市场推广"
             },
             {
-                "name": "最新职位",
-                "data_list": JobListSerializer(
-                    Job.objects.filter(status=Job.STATUS_PUBLISH).order_by("-publish_time")[:12], many=True).data
+                "name": "市场策划",
+                "param": "市场策划"
             },
+            {
+                "name": "政府关系",
+                "param": "政府关系"
+            }
         ]
-        # 公司推荐区
-        recommend_companies = [
+    },
+    {
+        "title": "销售",
+        "param": "q",
+        "filters": [
             {
-                "name": "互联网热门公司排行",
-                "data_list": CompanyListSerializer(
-                    Company.objects.annotate(interview_count=Count("jobs__interviews")).order_by("-interview_count")[
-                    :12], many=True).data
+                "name": "销售专员",
+                "param": "销售专员"
             },
             {
-                "name": "全球500强公司",
-                "data_list": CompanyListSerializer(Company.objects.all().order_by("?")[:12], many=True).data
+                "name": "销售经理",
+                "param": "销售经理"
             },
             {
-                "name": "新进独角兽",
-                "data_list": CompanyListSerializer(Company.objects.all().order_by("?")[:12], many=True).data
+                "name": "销售总监",
+                "param": "销售总监"
+            },
+            {
+                "name": "大客户代表",
+                "param": "大客户代表"
             }
         ]
-        content["category"] = category
-        content["banner"] = banner
+    },
+    {
+        "title": "职能",
+        "param": "q",
+        "filters": [
+            {
+                "name": "HR",
+                "param": "HR"
+            },
+            {
+                "name": "行政",
+                "param": "行政"
+            },
+            {
+                "name": "财务",
+                "param": "财务"
+            },
+            {
+                "name": "审计",
+                "param": "审计"
+            }
+        ]
+    },
+    {
+        "title": "游戏",
+        "param": "q",
+        "filters": [
+            {
+                "name": "小游戏开发",
+                "param": "小游戏开发"
+            },
+            {
+                "name": "U3D",
+                "param": "U3D"
+            },
+            {
+                "name": "游戏策划",
+                "param": "游戏策划"
+            },
+            {
+                "name": "游戏运营",
+                "param": "游戏运营"
+            }
+        ]
+    },
+]
+
+# 轮播图区
+BANNER = [
+    {
+        "img_url": "/banner1.png",
+        "link_url": "/#/jobs/?q=123"
+    },
+    {
+        "img_url": "/banner2.png",
+        "link_url": "/#/companies/?q=乐视"
+    },
+    {
+        "img_url": "/banner3.jpeg",
+        "link_url": "/#/jobs/?q=vue"
+    },
+    {
+        "img_url": "/banner4.png",
+        "link_url": "/#/companies/?q=乐视"
+    },
+]
+
+
+def random_jobs():
+    return JobListSerializer(random_sample(Job.objects.filter(status=Job.STATUS_PUBLISH), 12), many=True).data
+
+
+def newest_jobs():
+    return JobListSerializer(Job.objects.filter(status=Job.STATUS_PUBLISH).order_by("-publish_time")[:12],
+                             many=True).data
+
+
+def hot_companies():
+    return CompanyListSerializer(Company.objects.order_by("-application_count")[:12], many=True).data
+
+
+def random_companies():
+    return CompanyListSerializer(random_sample(Company.objects.all(), 12), many=True).data
+
+
+# 职位推荐区：(区块名称, 缓存 key, 构建函数)
+RECOMMEND_JOB_BLOCKS = [
+    ("为你匹配", "index:jobs:match", random_jobs),
+    ("24Hour热门", "index:jobs:hot", random_jobs),
+    ("最新职位", "index:jobs:newest", newest_jobs),
+]
+# 公司推荐区：(区块名称, 缓存 key, 构建函数)
+RECOMMEND_COMPANY_BLOCKS = [
+    ("互联网热门公司排行", "index:companies:hot", hot_companies),
+    ("全球500强公司", "index:companies:top500", random_companies),
+    ("新进独角兽", "index:companies:unicorn", random_companies),
+]
+
+
+def get_block(key, builder):
+    """读取首页区块缓存，过期后由后台线程刷新，请求始终拿到最近一次构建成功的数据"""
+    return caches.get_or_refresh(key, lambda: list(builder()), settings.INDEX_CACHE_TTL,
+                                 settings.INDEX_CACHE_STALE_TTL)
+
+
+def refresh_blocks():
+    """同步重建首页所有区块的缓存"""
+    for _, key, builder in RECOMMEND_JOB_BLOCKS + RECOMMEND_COMPANY_BLOCKS:
+        caches.refresh(key, lambda: list(builder()), settings.INDEX_CACHE_TTL, settings.INDEX_CACHE_STALE_TTL)
+
+
+class IndexView(APIView):
+    use_read_replica = True  # 只读接口，读取从库，见 apps.api.replicas
+
+    def get(self, request):
+        content = {}
+        # 职位推荐区
+        recommend_jobs = [{"name": name, "data_list": get_block(key, builder)}
+                          for name, key, builder in RECOMMEND_JOB_BLOCKS]
+        # 公司推荐区
+        recommend_companies = [{"name": name, "data_list": get_block(key, builder)}
+                               for name, key, builder in RECOMMEND_COMPANY_BLOCKS]
+        content["category"] = CATEGORY
+        content["banner"] = BANNER
         content["recommend_jobs"] = recommend_jobs
         content["recommend_companies"] = recommend_companies
         return Response(content, status=status.HTTP_200_OK)
@@ -1,72 +1,79 @@
-import uuid
+import hashlib
+import json
+from collections import Counter
 
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
-from django.core.files.base import ContentFile
-from django.core.files.storage import default_storage
+from django.contrib.postgres.search import TrigramSimilarity
 from django_filters import rest_framework as filters
-from django.db.models import Q
+from django.db import IntegrityError
+from django.db.models import Case, When, Value, FloatField, IntegerField, Subquery, OuterRef, Count
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, status, generics
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.views import APIView
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.response import Response
 from apps.api.serializers import ResumeSerializer, AvatarSerializer, JobListSerializer, JobSerializer, \
     InterviewInvitationSerializer
 
 from apps.job.models import Resume, Job, Invitation, Interview, PublishJob
 from apps.peekpauser.models import Avatar
-from urllib.parse import unquote
+from urllib.parse import unquote, urlsplit, urlunsplit
 
 from apps.api.permissions import IsGetForAll
 
-from apps.api.authentications import PassGetAuthentication
+from apps.api.authentications import PassGetAuthentication, PeekpaJWTAuthentication
 
+from apps.api import caches
+from apps.api.conditional import conditional_get
+from apps.api.paginations import KeysetPagination
+from apps.api.replicas import read_from_primary
+from apps.api.uploads import save_upload, UploadSizeLimitMixin
+from apps.job.tasks import delete_unused_resumes
+from apps.peekpauser.tasks import enqueue_thumbnails
+from apps.task.queue import enqueue
 
-class ResumeView(APIView):
+
+class ResumeView(UploadSizeLimitMixin, APIView):
     """简历上传视图"""
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [PeekpaJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, format=None):
-        unused_resumes = Resume.objects.filter(user=self.request.user, interviews=None)
-        # 删除旧的并且没有和 Interview 关联的 Resume 对象及其关联的文件
-        for resume in unused_resumes:
-            default_storage.delete(resume.url[6:])
-            resume.delete()
-        old_resumes = Resume.objects.filter(user=self.request.user)
-        # 将和 Interviews 绑定的 Resume 的 is_active 设置成 False
-        for resume in old_resumes:
-            if resume.is_active:
-                resume.is_active = False
-                resume.save()
-        # 获取上传文件名称
+        # 先解析上传文件，文件超过大小限制时不会删除旧的简历
         file = request.FILES.get("resume")
+        # 按内容保存到 `/media/blobs/` 目录下，相同内容的文件只保存一份；先保存新文件再删除旧简历，
+        # 重复上传相同内容时直接复用已有文件
+        blob = save_upload(file)
+        # 用一条 UPDATE 语句停用旧的简历
+        Resume.objects.filter(user=self.request.user, is_active=True).update(is_active=False)
+        # 获取上传文件名称
         file_name = file.name
-        # 拼凑存储文件名，并存储在 `/media/resume/` 目录下
-        file_path = f"resume/{'.'.join(file_name.split('.')[:-1])}_{str(uuid.uuid4())[:8]}.{file_name.split('.')[-1]}"
-        saved_path = default_storage.save(file_path, ContentFile(file.read()))
-        resume = Resume.objects.create(name=file_name, user=self.request.user, url="media/{}".format(saved_path))
+        resume = Resume.objects.create(name=file_name, user=self.request.user, url=blob.url, blob=blob)
+        # 没有和 Interview 关联的旧简历及其文件在后台删除，接口耗时与旧简历数量无关
+        enqueue(delete_unused_resumes, idempotency_key="delete_unused_resumes:{}".format(resume.id),
+                user_id=self.request.user.uid)
         return Response(data=ResumeSerializer(resume).data, status=status.HTTP_201_CREATED)
 
 
-class AvatarView(APIView):
-    authentication_classes = [JWTAuthentication]
+class AvatarView(UploadSizeLimitMixin, APIView):
+    authentication_classes = [PeekpaJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, format=None):
-        old_avatars = Avatar.objects.filter(user=self.request.user)
-        # 删除旧的 Avatar 对象及其关联的文件
-        for avatar in old_avatars:
-            default_storage.delete(avatar.url[6:])
-        old_avatars.delete()
-        # 获取上传文件名称
+        # 先解析上传文件，文件超过大小限制时不会删除旧的头像
         file = request.FILES.get("avatar")
+        # 按内容保存到 `/media/blobs/` 目录下，相同内容的文件只保存一份；先保存新文件再删除旧头像，
+        # 重复上传相同内容时直接复用已有文件
+        blob = save_upload(file)
+        # 删除旧的 Avatar 对象，关联的文件由 post_delete 信号加入后台任务队列释放
+        Avatar.objects.filter(user=self.request.user).delete()
+        # 获取上传文件名称
         file_name = file.name
-        # 拼凑存储文件名，并存储在 `/media/avatar/` 目录下
-        file_path = f"avatar/{'.'.join(file_name.split('.')[:-1])}_{str(uuid.uuid4())[:8]}.{file_name.split('.')[-1]}"
-        saved_path = default_storage.save(file_path, ContentFile(file.read()))
-        avatar = Avatar.objects.create(name=file_name, user=self.request.user, url="media/{}".format(saved_path))
+        avatar = Avatar.objects.create(name=file_name, user=self.request.user, url=blob.url, blob=blob)
+        # 在后台生成缩略图
+        enqueue_thumbnails(blob)
         return Response(data=AvatarSerializer(avatar).data, status=status.HTTP_201_CREATED)
 
 
@@ -75,16 +82,21 @@ class JobListFilter(filters.FilterSet):
     order = filters.CharFilter(method="order_search", label="Order")
     experience = filters.CharFilter(method="experience_search", label="Experience")
     education = filters.CharFilter(method="education_search", label="Education")
+    city = filters.CharFilter(method="city_search", label="City")
+    # 薪资范围筛选：返回月薪范围与 [salary_gte, salary_lte] 有交集的职位，面议（月薪为 0）的职位不参与薪资筛选
+    salary_gte = filters.NumberFilter(method="salary_gte_search", label="Salary gte", min_value=0)
+    salary_lte = filters.NumberFilter(method="salary_lte_search", label="Salary lte", min_value=0)
 
     class Meta:
         model = Job
-        fields = ["q", "order", "education", "experience"]
+        fields = ["q", "order", "education", "experience", "city", "salary_gte", "salary_lte"]
 
     def my_custom_filter(self, queryset, name, value):
-        return queryset.filter(
-            Q(title__contains=value) | Q(city__contains=value) | Q(location__contains=value) | Q(
-                company__name__contains=value)
-        )
+        keyword = value.strip().lower()
+        if not keyword:
+            return queryset
+        # 检索文本已统一转为小写，`LIKE '%关键词%'` 可以命中 pg_trgm GIN 索引
+        return queryset.filter(search_text__contains=keyword)
 
     def education_search(self, queryset, name, value):
         decoded_data = unquote(value)
@@ -98,31 +110,215 @@ class JobListFilter(filters.FilterSet):
             return queryset.filter(experience=decoded_data)
         return queryset
 
+    def city_search(self, queryset, name, value):
+        decoded_data = unquote(value)
+        if value:
+            return queryset.filter(city=decoded_data)
+        return queryset
+
+    def salary_gte_search(self, queryset, name, value):
+        # 职位的最高月薪不低于筛选下限
+        return queryset.filter(salary_max__gte=max(value, 1))
+
+    def salary_lte_search(self, queryset, name, value):
+        # 职位的最低月薪不高于筛选上限
+        return queryset.filter(salary_min__lte=value, salary_max__gt=0)
+
     def order_search(self, queryset, name, value):
         if value == "newest":
             return queryset.order_by("-publish_time")
+        keyword = self.data.get("q", "").strip()
+        if value == "relevance" and keyword:
+            # 按相关度排序：职位名称命中优先，其次按职位名称与关键词的三元组相似度排序
+            return queryset.annotate(
+                relevance=Case(When(title__icontains=keyword, then=Value(1.0)), default=Value(0.0),
+                               output_field=FloatField()) + TrigramSimilarity("title", keyword)
+            ).order_by("-relevance", "-publish_time")
         return queryset
 
 
+# 职位列表结果缓存的命中统计（进程内），压测命令据此计算命中率
+JOB_LIST_CACHE_STATS = Counter()
+
+
 class JobListView(generics.ListAPIView):
+    """
+    职位列表视图。
+
+    非公司人员看到的职位列表与身份无关，按规范化后的筛选参数和分页位置缓存序列化后的分页数据，
+    缓存 key 中包含职位目录版本号，职位或公司写入后版本号递增，旧缓存自动失效；
+    热门 key 缓存缺失时通过 single_flight() 只执行一次查询。公司人员看到额外字段，不使用缓存。
+    """
     queryset = Job.objects.filter(status=Job.STATUS_PUBLISH).order_by("title")
     serializer_class = JobListSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = JobListFilter
+    pagination_class = KeysetPagination
+    use_read_replica = True  # 只读接口，读取从库，见 apps.api.replicas
+
+    def list(self, request, *args, **kwargs):
+        if request.user and request.user.is_staff:
+            return super().list(request, *args, **kwargs)
+        built = []
+
+        def build():
+            built.append(True)
+            return self.build_page(request, *args, **kwargs)
+
+        data = caches.get_or_build(self.get_cache_key(request), build, settings.JOB_LIST_CACHE_TTL)
+        JOB_LIST_CACHE_STATS["miss" if built else "hit"] += 1
+        # 缓存中的翻页链接只保存路径和查询参数，按当前请求的域名补全
+        return Response({**data, **{name: request.build_absolute_uri(data[name])
+                                    for name in ("next", "previous") if data.get(name)}})
+
+    def build_page(self, request, *args, **kwargs):
+        """执行查询并序列化当前页，翻页链接去掉域名部分；缓存的数据从主库读取"""
+        with read_from_primary():
+            data = dict(super().list(request, *args, **kwargs).data)
+        for name in ("next", "previous"):
+            if data.get(name):
+                parts = urlsplit(data[name])
+                data[name] = urlunsplit(("", "", parts.path, parts.query, ""))
+        data["results"] = [dict(item) for item in data["results"]]
+        return data
+
+    def get_cache_key(self, request):
+        """按规范化后的筛选参数和分页位置生成缓存 key，等价的查询（大小写、空参数、参数顺序不同）共用缓存"""
+        params = request.query_params
+        normalized = normalize_job_filters(params)
+        order = params.get("order", "")
+        normalized["order"] = order if order == "newest" or (order == "relevance" and normalized["q"]) else ""
+        paginator = self.paginator
+        normalized["limit"] = paginator.get_limit(request)
+        if paginator.cursor_query_param in params:
+            normalized["cursor"] = params[paginator.cursor_query_param]
+        else:
+            normalized["offset"] = paginator.get_offset(request)
+        return job_catalog_cache_key("jobs:list", normalized)
+
+
+# 职位列表的精确筛选参数，筛选项计数接口为这些筛选项分别计数
+JOB_FILTER_PARAMS = ("education", "experience", "city")
+# 职位列表的薪资范围参数，筛选项计数接口对所有筛选项都应用薪资范围
+JOB_SALARY_PARAMS = ("salary_gte", "salary_lte")
+# 薪资区间，按职位月薪最小值划分，左闭右开，None 表示不设上限；月薪为 0 的职位归为“面议”
+SALARY_BUCKETS = ((0, 5000), (5000, 10000), (10000, 20000), (20000, 30000), (30000, None))
+SALARY_NEGOTIABLE = -1
+
+
+def normalize_job_filters(params):
+    """规范化职位筛选参数：关键词去掉首尾空白并转为小写，筛选值做 URL 解码，未传的参数为空字符串"""
+    normalized = {"q": params.get("q", "").strip().lower()}
+    for name in JOB_FILTER_PARAMS:
+        normalized[name] = unquote(params.get(name, ""))
+    for name in JOB_SALARY_PARAMS:
+        value = params.get(name, "").strip()
+        normalized[name] = str(int(value)) if value.isdigit() else value
+    return normalized
+
+
+def job_catalog_cache_key(prefix, normalized):
+    """职位目录缓存 key：规范化参数的哈希加上目录版本号，职位或公司写入后自动失效"""
+    digest = hashlib.sha1(json.dumps(normalized, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+    return "{}:{}:{}".format(prefix, caches.get_version(caches.CATALOG_VERSION_KEY), digest)
+
+
+class JobFacetView(APIView):
+    """
+    职位筛选项计数视图，返回当前关键词和筛选条件下学历、工作经验、城市和薪资区间各取值的职位数量。
+
+    所有计数来自一条按 (学历, 工作经验, 城市, 薪资区间) 分组的查询，再在内存中汇总：
+    每个筛选项的计数不应用该筛选项自身的条件，切换到同一筛选项的其他取值前就能看到结果数量；
+    关键词和薪资范围（salary_gte / salary_lte）对所有筛选项都生效。
+    结果按职位目录版本号缓存，与职位列表同时失效。
+    """
+    use_read_replica = True  # 只读接口，读取从库，见 apps.api.replicas
+    facets = JOB_FILTER_PARAMS + ("salary",)
+
+    def get(self, request):
+        normalized = normalize_job_filters(request.query_params)
+        content = caches.get_or_build(job_catalog_cache_key("jobs:facets", normalized),
+                                      lambda: self.build_facets(normalized), settings.JOB_LIST_CACHE_TTL)
+        return Response(content, status=status.HTTP_200_OK)
+
+    def build_facets(self, normalized):
+        # 缓存的数据从主库读取
+        with read_from_primary():
+            return self.count_facets(normalized)
+
+    def count_facets(self, normalized):
+        filterset = JobListFilter(data={name: normalized[name] for name in ("q",) + JOB_SALARY_PARAMS},
+                                  queryset=Job.objects.filter(status=Job.STATUS_PUBLISH))
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        queryset = filterset.qs
+        salary = Case(When(salary_max=0, then=Value(SALARY_NEGOTIABLE)),
+                      *[When(salary_min__gte=low, **({"salary_min__lt": high} if high else {}), then=Value(index))
+                        for index, (low, high) in enumerate(SALARY_BUCKETS)], output_field=IntegerField())
+        rows = queryset.order_by().values(*JOB_FILTER_PARAMS, salary=salary).annotate(count=Count("id"))
+
+        selected = {name: normalized[name] for name in JOB_FILTER_PARAMS if normalized[name]}
+        counts = {facet: Counter() for facet in self.facets}
+        total = 0
+        for row in rows:
+            unmatched = {name for name, value in selected.items() if row[name] != value}
+            if not unmatched:
+                total += row["count"]
+            for facet in self.facets:
+                if not unmatched - {facet}:
+                    counts[facet][row[facet]] += row["count"]
+
+        content = {"count": total}
+        for facet in self.facets[:-1]:
+            items = [(value, count) for value, count in counts[facet].items() if value]
+            content[facet] = [{"value": value, "count": count}
+                              for value, count in sorted(items, key=lambda item: (-item[1], item[0]))]
+        content["salary"] = [{"value": "面议", "min": None, "max": None,
+                              "count": counts["salary"][SALARY_NEGOTIABLE]}] + [
+            {"value": "{}-{}".format(low, high or ""), "min": low, "max": high, "count": counts["salary"][index]}
+            for index, (low, high) in enumerate(SALARY_BUCKETS)]
+        return content
+
+
+def job_stamp(request, id):
+    """
+    职位详情的版本号：职位和所属公司的 update_time。
+    求职者看到的 applied 字段因人而异，登录的求职者再加上用户 ID 和是否已投递该职位。
+    """
+    if not id.isdigit():
+        return None
+    user = request.user
+    personalized = user and user.is_authenticated and not user.is_staff
+    queryset = Job.objects.filter(id=id, status=Job.STATUS_PUBLISH)
+    fields = ["update_time", "company__update_time"]
+    if personalized:
+        queryset = queryset.annotate(applied_time=Subquery(Interview.objects.filter(
+            job=OuterRef("pk"), candidate_id=user.uid).values("publish_time")[:1]))
+        fields.append("applied_time")
+    row = queryset.values(*fields).first()
+    if row is None:
+        return None
+    stamps = [row[field] for field in fields if row[field] is not None]
+    etag = "job-{}-{}".format(id, "-".join("{:x}".format(int(stamp.timestamp() * 1000000)) for stamp in stamps))
+    if personalized:
+        etag += "-{}-{:d}".format(user.uid, row["applied_time"] is not None)
+    return etag, max(stamps)
 
 
+@conditional_get(job_stamp, vary_on_auth=True)
 class JobDetailView(generics.RetrieveAPIView):
     queryset = Job.objects.filter(status=Job.STATUS_PUBLISH)
     serializer_class = JobSerializer
     authentication_classes = [PassGetAuthentication]
     permission_classes = [IsGetForAll]
     lookup_field = "id"
+    use_read_replica = True
 
 
 class InvitationDetailView(generics.UpdateAPIView):
     queryset = Invitation.objects.all()
     serializer_class = InterviewInvitationSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [PeekpaJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
@@ -144,18 +340,24 @@ class ApplyJobView(APIView):
             return Response(data=data, status=status.HTTP_401_UNAUTHORIZED)
         else:
             user = request.user
-            job = get_object_or_404(Job.objects.all(), id=id)
-            poster = PublishJob.objects.get(job__id=id).user
-            if job.status != Job.STATUS_PUBLISH:
+            # 一条查询同时取出职位发布者和求职者当前使用的简历，职位不存在或未发布时返回 404
+            row = PublishJob.objects.filter(job_id=id, job__status=Job.STATUS_PUBLISH).annotate(
+                resume_id=Subquery(Resume.objects.filter(user=user, is_active=True).values("id")[:1])
+            ).values_list("user_id", "resume_id").first()
+            if row is None:
                 return Response(status=status.HTTP_404_NOT_FOUND)
             if user.is_staff:
                 data["message"] = "您不可以通过此账号投递简历。"
                 return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
-            resumes = user.resume.filter(is_active=True)
-            if resumes.count() == 0:
+            poster_id, resume_id = row
+            if resume_id is None:
                 data["message"] = "您还未上传简历，请上传简历之后再投递。"
                 return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                resume = resumes.all().first()
-                Interview.objects.create(job=job, interviewer=poster, candidate=user, resume=resume)
-                return Response(data=data, status=status.HTTP_200_OK)
+            try:
+                # Interview.save() 在事务中插入面试并更新计数器，重复投递违反 (job, candidate) 唯一约束时整体回滚
+                Interview(job_id=id, interviewer_id=poster_id, candidate=user, resume_id=resume_id).save()
+            except IntegrityError:
+                # 重复点击或重试的投递请求违反唯一约束，已经投递成功，按成功返回；其他完整性错误继续抛出
+                if not Interview.objects.filter(job_id=id, candidate=user).exists():
+                    raise
+            return Response(data=data, status=status.HTTP_200_OK)
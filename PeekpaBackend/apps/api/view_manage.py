@@ -1,5 +1,6 @@
-from datetime import datetime
-from django.db.models import Sum
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum, Count, Q, F, Prefetch
 from django_filters import rest_framework as filters
 from apps.api.serializers import JobListSerializer, JobSerializer, InterviewSerializer, InvitationSerializer, \
     InterviewInvitationSerializer
@@ -7,11 +8,14 @@ from django_filters.rest_framework import DjangoFilterBackend
 from apps.company.models import Company
 from apps.job.models import Job, PublishJob, Interview, Invitation
 from rest_framework import generics, permissions, status
-from apps.api.authentications import JWTAuthentication
+from apps.api.authentications import PeekpaJWTAuthentication
+from apps.api.paginations import KeysetPagination
+from apps.api import caches
 from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.utils import timezone
 
 from apps.peekpauser.models import User
 
@@ -32,13 +36,13 @@ class ManageJobListView(generics.ListCreateAPIView):
     serializer_class = JobListSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = JobListFilter
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [PeekpaJWTAuthentication]
     permission_classes = [permissions.IsAdminUser]
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        is_manager = self.request.user.details.get("is_manager", False)
-        company_id = self.request.user.details.get("company_id", -1)
+        is_manager = self.request.user.is_manager
+        company_id = self.request.user.company_id or -1
         queryset = queryset.filter(company__id=company_id)
         if not is_manager:
             job_ids = PublishJob.objects.filter(user__uid=self.request.user.uid).values_list("job_id", flat=True)
@@ -46,11 +50,11 @@ class ManageJobListView(generics.ListCreateAPIView):
         return queryset
 
     def perform_create(self, serializer):
-        company = self.request.user.details.get("company_id")
+        company = self.request.user.company_id
         if company:
-            job = serializer.save()
             company_obj = Company.objects.get(id=company)
-            company_obj.jobs.add(job)
+            # 创建时直接关联公司，保证职位检索文本中包含公司名称
+            job = serializer.save(company=company_obj)
             publish_job_obj = PublishJob(user=self.request.user, job=job)
             publish_job_obj.save()
         else:
@@ -58,12 +62,12 @@ class ManageJobListView(generics.ListCreateAPIView):
 
 
 class ManageJobNameListView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [PeekpaJWTAuthentication]
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request):
-        is_manager = self.request.user.details.get("is_manager", False)
-        company = self.request.user.details.get("company_id")
+        is_manager = self.request.user.is_manager
+        company = self.request.user.company_id
         job_list = Job.objects.filter(company__id=company)
         if not is_manager:
             jobs = PublishJob.objects.filter(user__uid=self.request.user.uid)
@@ -80,13 +84,13 @@ class ManageJobNameListView(APIView):
 class ManageJobDetailView(generics.RetrieveUpdateAPIView):
     queryset = Job.objects.all()
     serializer_class = JobSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [PeekpaJWTAuthentication]
     permission_classes = [permissions.IsAdminUser]
     lookup_field = "id"
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        company_id = self.request.user.details.get("company_id", -1)
+        company_id = self.request.user.company_id or -1
         queryset = queryset.filter(company__id=company_id)
         return queryset
 
@@ -97,18 +101,20 @@ class ManageJobDetailView(generics.RetrieveUpdateAPIView):
 class ManageInterviewListView(generics.ListAPIView):
     queryset = Interview.objects.all()
     serializer_class = InterviewSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [PeekpaJWTAuthentication]
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = KeysetPagination
+    cursor_ordering = ("-id",)  # 游标分页模式下，最新收到的简历排在最前
     lookup_field = "id"
 
     def get_queryset(self):
         queryset = super().get_queryset()
         job_id = self.kwargs["id"]
-        is_manager = self.request.user.details.get("is_manager", False)
-        company_id = self.request.user.details.get("company_id", -1)
+        is_manager = self.request.user.is_manager
+        company_id = self.request.user.company_id or -1
         if job_id == "all":
             # 获取全部的面试信息
-            jobs_id = PublishJob.objects.filter(user__details__contains={"company_id": company_id}).values_list(
+            jobs_id = PublishJob.objects.filter(user__company_id=company_id).values_list(
                 "job_id", flat=True)
             queryset = queryset.filter(job__id__in=jobs_id)
         else:
@@ -117,13 +123,24 @@ class ManageInterviewListView(generics.ListAPIView):
         # 获取当前公司职员所管理的面试信息
         if not is_manager:
             queryset = queryset.filter(interviewer__uid=self.request.user.uid)
-        return queryset
+        return self.with_related(queryset)
+
+    @staticmethod
+    def with_related(queryset):
+        """
+        一次性加载序列化面试列表所需的关联数据：职位、求职者、招聘者和简历通过 JOIN 读取，
+        与面试状态一致的面试邀请通过一次 Prefetch 查询读取，职位的通过人数使用职位上的计数器。
+        每页的查询数量与面试数量无关。
+        """
+        return queryset.select_related("job", "candidate", "interviewer", "resume").prefetch_related(
+            Prefetch("invitations", queryset=Invitation.objects.filter(status=F("interview__status")).order_by("id"),
+                     to_attr="matched_invitations"))
 
 
 class ManageInterviewDetailView(generics.RetrieveUpdateAPIView):
     queryset = Interview.objects.all()
     serializer_class = InterviewSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [PeekpaJWTAuthentication]
     permission_classes = [permissions.IsAdminUser]
     lookup_field = "id"
 
@@ -131,9 +148,9 @@ class ManageInterviewDetailView(generics.RetrieveUpdateAPIView):
         job_id = self.kwargs["id"]
         interview_id = self.kwargs["iid"]
         queryset = self.get_queryset()
-        is_manager = self.request.user.details.get("is_manager", False)
-        company_id = self.request.user.details.get("company_id", -1)
-        jobs_id = PublishJob.objects.filter(user__details__contains={"company_id": company_id}).values_list(
+        is_manager = self.request.user.is_manager
+        company_id = self.request.user.company_id or -1
+        jobs_id = PublishJob.objects.filter(user__company_id=company_id).values_list(
             "job_id", flat=True)
         if is_manager:
             obj = get_object_or_404(queryset, job__id__in=jobs_id, job__id=job_id, id=interview_id)
@@ -163,7 +180,7 @@ class ManageInterviewDetailView(generics.RetrieveUpdateAPIView):
 class ManageInvitationView(generics.CreateAPIView):
     queryset = Invitation.objects.all()
     serializer_class = InvitationSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [PeekpaJWTAuthentication]
     permission_classes = [permissions.IsAdminUser]
     lookup_field = "id"
 
@@ -171,7 +188,7 @@ class ManageInvitationView(generics.CreateAPIView):
 class ManageInvitationDetailView(generics.UpdateAPIView):
     queryset = Invitation.objects.all()
     serializer_class = InterviewInvitationSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [PeekpaJWTAuthentication]
     permission_classes = [permissions.IsAdminUser]
     lookup_field = "ivid"
 
@@ -193,56 +210,55 @@ class ManageInvitationDetailView(generics.UpdateAPIView):
 
 
 class DashboardView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [PeekpaJWTAuthentication]
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request):
-        content = dict()
         # 获取公司 ID
-        company_id = self.request.user.details.get("company_id")
-        # 获取公司下的所有职位 ID
-        job_ids = Job.objects.filter(company__id=company_id).values_list("id", flat=True)
-        # 获取公司下的所有面试 ID
-        interview_id = Interview.objects.filter(job__id__in=job_ids).values_list("id", flat=True)
-        # 职位总数
-        content["jobs_total"] = Job.objects.filter(company__id=company_id).count()
-        # 正在招聘的职位数
-        content["jobs_open"] = Job.objects.filter(status=Job.STATUS_PUBLISH, company__id=company_id).count()
-        # 招聘结束的职位数
-        content["jobs_finish"] = Job.objects.filter(status=Job.STATUS_FINISH, company__id=company_id).count()
-        # 已关闭的职位数
-        content["jobs_close"] = Job.objects.filter(status=Job.STATUS_CLOSE, company__id=company_id).count()
-        # 正在进行的面试数目
-        content["interviewing"] = Interview.objects.filter(status__in=[0, 1, 2, 3], job__id__in=job_ids).count()
-        # 收到的简历数目
-        content["resumes"] = Interview.objects.filter(job__id__in=job_ids).count()
+        company_id = self.request.user.company_id
+        # 看板统计数据按公司缓存，公司的职位、面试、面试邀请和员工变更时通过递增版本号使缓存失效；
+        # 新增简历数按当天统计，key 中包含日期，跨天后不会读到前一天的缓存
+        today = timezone.localdate()
+        cache_key = "dashboard:{}:{}:{}".format(company_id, today.isoformat(),
+                                                caches.get_version(caches.dashboard_version_key(company_id)))
+        content = cache.get(cache_key)
+        if content is None:
+            content = self.get_statistics(company_id, today)
+            cache.set(cache_key, content, settings.DASHBOARD_CACHE_TTL)
+        return Response(data=content, status=status.HTTP_200_OK)
+
+    def get_statistics(self, company_id, today):
+        content = dict()
+        # 职位统计：职位总数、正在招聘、招聘结束、已关闭的职位数，以及计划招聘人员数量
+        content.update(Job.objects.filter(company__id=company_id).aggregate(
+            jobs_total=Count("id"),
+            jobs_open=Count("id", filter=Q(status=Job.STATUS_PUBLISH)),
+            jobs_finish=Count("id", filter=Q(status=Job.STATUS_FINISH)),
+            jobs_close=Count("id", filter=Q(status=Job.STATUS_CLOSE)),
+            hired_number=Sum("hire_number"),
+        ))
+        # 面试统计：正在进行的面试数目、收到的简历数目、新增简历数目、已经招聘人员数量
+        content.update(Interview.objects.filter(job__company__id=company_id).aggregate(
+            interviewing=Count("id", filter=Q(status__in=Interview.STATUS_ACTIVE)),
+            resumes=Count("id"),
+            resumes_new=Count("id", filter=Q(publish_time__date=today)),
+            pass_number=Count("id", filter=Q(status=Interview.STATUS_PASS)),
+        ))
         # 发出的面试邀请数目
-        content["invitation_number"] = Invitation.objects.filter(interview__id__in=interview_id).count()
-        # 新增简历数目
-        content["resumes_new"] = Interview.objects.filter(job__id__in=job_ids,
-                                                          publish_time__date=datetime.now().date()).count()
+        content["invitation_number"] = Invitation.objects.filter(interview__job__company__id=company_id).count()
         # 公司用户数目
-        content["users_number"] = User.objects.filter(is_active=True,
-                                                      details__contains={"company_id": company_id}).count()
-        # 计划招聘人员数量
-        content["hired_number"] = \
-            Job.objects.filter(company__id=company_id).aggregate(total_hire_number=Sum("hire_number"))[
-                "total_hire_number"]
-        # 已经招聘人员数量
-        content["pass_number"] = Interview.objects.filter(job__id__in=job_ids, status=4).count()
+        content["users_number"] = User.objects.filter(is_active=True, company_id=company_id).count()
         # 新发布的职位列表
-        content["new_jobs"] = [{
-            "id": item.id,
-            "title": item.title,
-            "publish_time": item.publish_time,
-        } for item in
-            Job.objects.filter(company__id=company_id, status=Job.STATUS_PUBLISH).order_by("-publish_time")[:5]]
+        content["new_jobs"] = list(
+            Job.objects.filter(company__id=company_id, status=Job.STATUS_PUBLISH).order_by("-publish_time").values(
+                "id", "title", "publish_time")[:5])
         # 新收到的简历列表
         content["new_interviews"] = [
             {
                 "id": item.job.id,
                 "title": item.job.title,
                 "publish_time": item.publish_time
-            } for item in Interview.objects.filter(job__id__in=job_ids).order_by("-publish_time")[:5]
+            } for item in Interview.objects.filter(job__company__id=company_id).select_related("job").only(
+                "publish_time", "job__id", "job__title").order_by("-publish_time")[:5]
         ]
-        return Response(data=content, status=status.HTTP_200_OK)
+        return content
@@ -0,0 +1,242 @@
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags, content_disposition_header
+from rest_framework import permissions, status
+from rest_framework.exceptions import NotFound, NotAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.api.authentications import MediaAuthentication, PeekpaJWTAuthentication
+from apps.job.models import Resume
+from apps.peekpauser.models import Blob
+
+BLOB_PATH_RE = re.compile(r"^blobs/[0-9a-f]{2}/(?P<hash>[0-9a-f]{64})(\.\w+)?$")
+THUMBNAIL_PATH_RE = re.compile(r"^thumbs/[0-9a-f]{2}/(?P<hash>[0-9a-f]{64})_(?P<size>\d+)\.(?P<extension>\w+)$")
+RANGE_RE = re.compile(r"^bytes=(?P<start>\d*)-(?P<end>\d*)$")
+CHUNK_SIZE = 64 * 1024
+SIGNATURE_SALT = "apps.api.view_media"
+SIGNATURE_QUERY_PARAM = "signature"
+
+
+def normalize_media_path(path):
+    """与 django.views.static.serve 一致地规范化文件路径（去掉多余的 `/`、`.` 和开头的 `/`），包含 `..` 的路径返回 None"""
+    if ".." in path.replace("\\", "/").split("/"):
+        return None
+    return posixpath.normpath(path).lstrip("/")
+
+
+def sign_media_path(path):
+    """为单个文件生成签名，签名中包含文件路径（按内容保存的文件路径即内容哈希），只能用于访问该文件"""
+    return signing.dumps(path, salt=SIGNATURE_SALT)
+
+
+def signed_media_url(path):
+    """返回带签名的文件访问 URL，在 MEDIA_SIGNED_URL_MAX_AGE 秒内有效"""
+    return "{}{}?{}={}".format(settings.MEDIA_URL, quote(path), SIGNATURE_QUERY_PARAM, sign_media_path(path))
+
+
+def check_media_signature(signature, path):
+    """签名有效、未过期并且属于该文件时返回 True"""
+    if not signature:
+        return False
+    try:
+        return signing.loads(signature, salt=SIGNATURE_SALT, max_age=settings.MEDIA_SIGNED_URL_MAX_AGE) == path
+    except signing.BadSignature:
+        return False
+
+
+def parse_range(header, size):
+    """
+    解析 Range 请求头中的单个字节范围，返回 (起始位置, 结束位置)，结束位置包含在内。
+
+    没有 Range 请求头、格式不支持（例如多个范围）时返回 None，按完整文件返回；范围超出文件大小时抛出 ValueError。
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None or not (match["start"] or match["end"]):
+        return None
+    if not match["start"]:
+        # bytes=-500 表示最后 500 个字节
+        length = int(match["end"])
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(match["start"])
+    end = min(int(match["end"]), size - 1) if match["end"] else size - 1
+    if start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def read_range(file, start, length):
+    """从 start 开始按块读取 length 个字节，读取完毕后关闭文件"""
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+class MediaView(APIView):
+    """
+    上传文件访问视图。
+
+    头像及其缩略图公开访问；简历只有上传的求职者本人、收到该简历的公司人员和超级管理员可以访问，
+    或者使用 MediaSignView 签发的短期签名 URL 访问（用于下载链接等无法设置请求头的场景）。
+    配置 MEDIA_X_ACCEL_REDIRECT 或 MEDIA_X_SENDFILE 时 Django 只检查权限，文件由前端代理（Nginx / Apache）发送；
+    否则由 Django 发送，支持 Range 请求、ETag / If-None-Match 和长期缓存。
+    """
+    authentication_classes = [MediaAuthentication]
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, path):
+        # 拒绝包含 `..` 的路径，避免借公开目录访问其他目录下的文件；结尾的 `/` 等按规范路径处理
+        path = normalize_media_path(path)
+        if path is None:
+            raise NotFound()
+        public, resumes, etag, max_age = self.resolve(path)
+        signed = not public and check_media_signature(request.query_params.get(SIGNATURE_QUERY_PARAM), path)
+        if not public and not signed:
+            self.check_resume_access(request.user, resumes)
+
+        cache_control = "{}, {}".format("public" if public else "private", max_age)
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if if_none_match and (if_none_match.strip() == "*" or etag in parse_etags(if_none_match)):
+            response = HttpResponseNotModified()
+        elif settings.MEDIA_X_ACCEL_REDIRECT:
+            response = HttpResponse()
+            response["X-Accel-Redirect"] = settings.MEDIA_X_ACCEL_REDIRECT.rstrip("/") + "/" + quote(path)
+        elif settings.MEDIA_X_SENDFILE:
+            response = HttpResponse()
+            response["X-Sendfile"] = default_storage.path(path)
+        else:
+            response = self.file_response(request, path, etag)
+        if status.is_success(response.status_code):
+            response["Content-Type"] = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            if signed:
+                # 签名 URL 用于下载链接，直接下载文件，不离开当前页面
+                response["Content-Disposition"] = content_disposition_header(True, posixpath.basename(path))
+        response["ETag"] = etag
+        response["Cache-Control"] = cache_control
+        if not public:
+            response["Vary"] = "Authorization"
+        return response
+
+    @staticmethod
+    def resolve(path):
+        """根据文件路径返回 (是否公开, 引用该文件的简历查询集, ETag, 缓存时间)，文件不存在时返回 404"""
+        resumes = Resume.objects.none()
+        match = BLOB_PATH_RE.match(path)
+        thumbnail_match = THUMBNAIL_PATH_RE.match(path)
+        if thumbnail_match:
+            # 缩略图只为头像生成，公开访问，内容永不变化
+            if not Blob.objects.filter(hash=thumbnail_match["hash"]).exclude(variants={}).exists():
+                raise NotFound()
+            public = True
+            etag = '"{}-{}-{}"'.format(thumbnail_match["hash"], thumbnail_match["size"],
+                                       thumbnail_match["extension"])
+            max_age = "max-age={}, immutable".format(settings.MEDIA_CACHE_MAX_AGE)
+        elif match:
+            # 按内容保存的文件：哈希即 ETag，内容永不变化
+            blob = Blob.objects.filter(hash=match["hash"], path=path).first()
+            if blob is None:
+                raise NotFound()
+            public = blob.avatars.exists()
+            resumes = Resume.objects.filter(blob=blob)
+            etag = '"{}"'.format(blob.hash)
+            max_age = "max-age={}, immutable".format(settings.MEDIA_CACHE_MAX_AGE)
+        else:
+            # 引入 Blob 之前上传的文件，头像保存在 avatar/ 目录，简历保存在 resume/ 目录
+            if path.startswith("avatar/"):
+                public = True
+            elif path.startswith("resume/"):
+                public = False
+            else:
+                raise NotFound()
+            resumes = Resume.objects.filter(url="media/{}".format(path))
+            try:
+                stat = os.stat(default_storage.path(path))
+            except (FileNotFoundError, NotImplementedError, ValueError):
+                raise NotFound()
+            etag = '"{:x}-{:x}"'.format(int(stat.st_mtime), stat.st_size)
+            max_age = "no-cache"
+        return public, resumes, etag, max_age
+
+    @staticmethod
+    def check_resume_access(user, resumes):
+        """检查当前用户是否可以访问简历文件，无权访问时返回 404，不暴露文件是否存在"""
+        if not user or not user.is_authenticated:
+            if resumes.exists():
+                raise NotAuthenticated()
+            raise NotFound()
+        if not user.is_superuser:
+            allowed = Q(user_id=user.uid)
+            if user.company_id:
+                allowed |= Q(interviews__job__company_id=user.company_id)
+            resumes = resumes.filter(allowed)
+        if not resumes.exists():
+            raise NotFound()
+
+    @staticmethod
+    def file_response(request, path, etag):
+        """由 Django 发送文件，支持单个字节范围的 Range 请求"""
+        try:
+            file = default_storage.open(path, "rb")
+        except FileNotFoundError:
+            raise NotFound()
+        size = file.size
+        # If-Range 与当前 ETag 不一致时说明文件已变化，忽略 Range 返回完整文件
+        if_range = request.META.get("HTTP_IF_RANGE")
+        try:
+            byte_range = parse_range(request.META.get("HTTP_RANGE"), size) if if_range in (None, etag) else None
+        except ValueError:
+            file.close()
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response["Content-Range"] = "bytes */{}".format(size)
+            return response
+        if byte_range is None:
+            response = FileResponse(file)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(read_range(file, start, end - start + 1),
+                                             status=status.HTTP_206_PARTIAL_CONTENT)
+            response["Content-Length"] = end - start + 1
+            response["Content-Range"] = "bytes {}-{}/{}".format(start, end, size)
+        response["Accept-Ranges"] = "bytes"
+        return response
+
+
+class MediaSignView(APIView):
+    """
+    签发上传文件的短期签名 URL。
+
+    下载链接无法携带 Authorization 请求头，前端先带着 Token 请求该接口，检查访问权限后返回只能访问该文件、
+    MEDIA_SIGNED_URL_MAX_AGE 秒内有效的 URL，避免把长期有效的 Token 放进 URL、访问日志和 Referer 中。
+    """
+    authentication_classes = [PeekpaJWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # 参数为简历、头像的 url 字段，例如 media/blobs/ab/<哈希>.pdf
+        url = request.query_params.get("url", "")
+        prefix = settings.MEDIA_URL.lstrip("/")
+        path = normalize_media_path(url.lstrip("/")[len(prefix):]) if url.lstrip("/").startswith(prefix) else None
+        if not path:
+            raise NotFound()
+        public, resumes, _, _ = MediaView.resolve(path)
+        if not public:
+            MediaView.check_resume_access(request.user, resumes)
+        return Response({"url": signed_media_url(path)}, status=status.HTTP_200_OK)
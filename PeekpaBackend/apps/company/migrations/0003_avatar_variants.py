@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='avatar_variants',
+            field=models.JSONField(default=dict),
+        ),
+    ]
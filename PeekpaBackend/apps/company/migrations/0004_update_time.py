@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0003_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='update_time',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
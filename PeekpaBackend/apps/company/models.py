@@ -5,9 +5,26 @@ from django.db import models
 class Company(models.Model):
     id = models.AutoField(primary_key=True)  # 公司 ID，主键
     avatar = models.URLField()  # 公司 Logo
+    avatar_variants = models.JSONField(default=dict)  # 公司 Logo 缩略图 URL，与 Blob.variants 格式相同
     name = models.CharField(max_length=100)  # 公司名称
     slogan = models.CharField(max_length=100)  # 公司口号
     tags = models.CharField(max_length=100)  # 公司标签
     size = models.CharField(max_length=100)  # 公司规模
     website = models.URLField()  # 公司网站
     description = models.CharField(max_length=1000)  # 公司描述
+    # 以下计数器由 apps.job.signals 在职位、面试、面试邀请变更时在同一事务中增量维护，
+    # 可通过 `python manage.py rebuild_counters` 校验和修复
+    job_count = models.PositiveIntegerField(default=0)  # 职位总数
+    open_job_count = models.PositiveIntegerField(default=0)  # 正在招聘的职位数
+    interview_count = models.PositiveIntegerField(default=0)  # 正在进行的面试数
+    application_count = models.PositiveIntegerField(default=0)  # 收到的简历总数
+    invitation_count = models.PositiveIntegerField(default=0)  # 发出的面试邀请数
+    # 公司信息或其职位最后更新的时间，职位变更时由 apps.job.signals 同步更新，用作公司详情接口的版本号
+    update_time = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # 按职位数量、收到简历数量排序，id 作为决胜字段
+            models.Index(fields=["job_count", "id"], name="company_job_count_idx"),
+            models.Index(fields=["application_count", "id"], name="company_application_count_idx"),
+        ]
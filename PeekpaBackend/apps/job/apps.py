@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class JobConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.job'
+
+    def ready(self):
+        from apps.job import signals  # noqa: F401  注册信号处理函数
+        # apps.api 没有注册为应用，它的系统检查（读写分离配置）在这里注册
+        from apps.api import checks  # noqa: F401
@@ -0,0 +1,240 @@
+import json
+import logging
+import statistics
+import tempfile
+import time
+from urllib.parse import urlencode
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.api import urls as api_urls
+from apps.api.authentications import PeekpaAccessToken
+from apps.company.models import Company
+from apps.job.management.commands.bench_job_search import percentile
+from apps.job.management.commands.generate_dataset import DATASET_PASSWORD
+from apps.job.models import Job, Resume, Interview, Invitation
+from apps.peekpauser.models import User
+
+ANONYMOUS, CANDIDATE, STAFF, MANAGER, SUPERUSER = "anonymous", "candidate", "staff", "manager", "superuser"
+
+
+class Fixture:
+    """压测使用的样本数据：从现有数据中选取一个有面试邀请的求职者和对应公司的员工"""
+
+    def __init__(self):
+        invitation = Invitation.objects.select_related("interview__job__company", "candidate").filter(
+            interview__job__status=Job.STATUS_PUBLISH, candidate__resume__is_active=True).order_by("id").first()
+        if invitation is None:
+            raise CommandError("数据库中没有可用的面试邀请数据，请先运行 `python manage.py generate_dataset`")
+        self.invitation = invitation
+        self.interview = invitation.interview
+        self.job = self.interview.job
+        self.company = self.job.company
+        self.candidate = invitation.candidate
+        self.manager = User.objects.filter(company=self.company, is_manager=True).order_by("uid").first()
+        self.staff = User.objects.filter(company=self.company, is_manager=False).order_by("uid").first() \
+            or self.manager
+        if self.manager is None:
+            raise CommandError("公司 {} 没有管理员".format(self.company.id))
+        self.apply_job = Job.objects.filter(status=Job.STATUS_PUBLISH, publishjob__isnull=False).exclude(
+            interviews__candidate=self.candidate).order_by("id").first()
+        # 超级管理员只在压测事务中创建，压测结束后回滚
+        self.superuser = User.objects.create_superuser("bench-superuser@peekpa.test", DATASET_PASSWORD)
+        # 统一设置登录密码，保证登录接口可以压测
+        for user in (self.candidate, self.manager):
+            user.set_password(DATASET_PASSWORD)
+            user.save(update_fields=["password"])
+        self.tokens = {role: str(PeekpaAccessToken.for_user(user)) for role, user in (
+            (CANDIDATE, self.candidate), (STAFF, self.staff), (MANAGER, self.manager), (SUPERUSER, self.superuser))}
+
+
+class Endpoint:
+    """一个压测用例：路由名称、请求方法、请求身份、URL 参数、查询参数和请求数据"""
+
+    def __init__(self, name, method, role, kwargs=None, query="", data=None, multipart=False, label=None):
+        self.name = name
+        self.method = method
+        self.role = role
+        self.kwargs = kwargs or (lambda f: {})
+        self.query = query
+        self.data = data
+        self.multipart = multipart
+        self.label = label or "{} {}{}".format(method.upper(), name, "?" + query if query else "")
+
+    def path(self, fixture):
+        url = reverse("api:{}".format(self.name), kwargs=self.kwargs(fixture))
+        # 查询参数可以是依赖样本数据的函数，此时需要显式指定 label
+        query = self.query(fixture) if callable(self.query) else self.query
+        return "{}?{}".format(url, query) if query else url
+
+
+def job_kwargs(f):
+    return {"id": f.job.id}
+
+
+def interview_kwargs(f):
+    return {"id": f.job.id, "iid": f.interview.id}
+
+
+ENDPOINTS = [
+    Endpoint("signin_view", "post", ANONYMOUS, data=lambda f: {"email": f.candidate.email, "password": DATASET_PASSWORD}),
+    Endpoint("signup_view", "post", ANONYMOUS, data=lambda f: {
+        "email": "bench-signup@peekpa.test", "password": DATASET_PASSWORD, "first_name": "压测", "last_name": "用户"}),
+    Endpoint("login_admin", "post", ANONYMOUS, data=lambda f: {"email": f.manager.email, "password": DATASET_PASSWORD}),
+    Endpoint("user_admin", "get", MANAGER),
+    Endpoint("user_admin", "post", MANAGER, data=lambda f: {
+        "email": "bench-staff@peekpa.test", "password": DATASET_PASSWORD, "first_name": "压测", "last_name": "员工"}),
+    Endpoint("resume_upload", "post", CANDIDATE, multipart=True, data=lambda f: {
+        "resume": SimpleUploadedFile("bench.pdf", b"%PDF-1.4 bench", content_type="application/pdf")}),
+    Endpoint("avatar_upload", "post", CANDIDATE, multipart=True, data=lambda f: {
+        "avatar": SimpleUploadedFile("bench.png", b"\x89PNG bench", content_type="image/png")}),
+    Endpoint("user_admin_detail", "patch", MANAGER, kwargs=lambda f: {"uid": f.staff.uid},
+             data=lambda f: {"first_name": "压测"}),
+    Endpoint("company_admin", "get", SUPERUSER),
+    Endpoint("company_admin", "post", SUPERUSER, data=lambda f: {
+        "name": "压测公司", "website": "https://bench.peekpa.test", "email": "bench-manager@peekpa.test",
+        "first_name": "压测", "last_name": "经理", "password": DATASET_PASSWORD}),
+    Endpoint("manage_job_list_view", "get", MANAGER),
+    Endpoint("manage_job_list_view", "get", STAFF, label="GET manage_job_list_view (staff)"),
+    Endpoint("manage_job_list_view", "post", MANAGER, data=lambda f: {
+        "title": "压测职位", "city": "北京", "location": "压测路 1 号", "experience": "1-3年", "education": "本科",
+        "benefit": "五险一金", "description": "压测职位描述"}),
+    Endpoint("manage_job_name_list_view", "get", MANAGER),
+    Endpoint("manage_job_detail_view", "get", MANAGER, kwargs=job_kwargs),
+    Endpoint("manage_job_detail_view", "patch", MANAGER, kwargs=job_kwargs, data=lambda f: {"hire_number": 3}),
+    Endpoint("manage_job_interview_list_view", "get", MANAGER, kwargs=lambda f: {"id": "all"},
+             label="GET manage_job_interview_list_view (all)"),
+    Endpoint("manage_job_interview_list_view", "get", MANAGER, kwargs=job_kwargs),
+    Endpoint("manage_job_interview_detail_view", "get", MANAGER, kwargs=interview_kwargs),
+    Endpoint("manage_job_interview_detail_view", "patch", MANAGER, kwargs=interview_kwargs,
+             data=lambda f: {"feedback": {"result": "压测"}}),
+    Endpoint("manage_job_interview_invitation_view", "post", MANAGER, kwargs=interview_kwargs, data=lambda f: {
+        "message": "压测面试邀请", "user_uid": f.candidate.uid, "status": f.interview.status}),
+    Endpoint("manage_job_interview_invitation_detail_view", "patch", MANAGER,
+             kwargs=lambda f: {"id": f.job.id, "iid": f.interview.id, "ivid": f.invitation.id},
+             data=lambda f: {"message": "压测修改面试邀请"}),
+    Endpoint("dashboard_view", "get", MANAGER),
+    Endpoint("job_list_view", "get", ANONYMOUS),
+    Endpoint("job_list_view", "get", ANONYMOUS, query="q=java"),
+    Endpoint("job_list_view", "get", ANONYMOUS, query="order=newest"),
+    Endpoint("job_list_view", "get", ANONYMOUS, query="offset=1000"),
+    Endpoint("job_list_view", "get", ANONYMOUS, query="cursor="),
+    Endpoint("job_list_view", "get", ANONYMOUS, query="city=%E6%B7%B1%E5%9C%B3&salary_gte=20000&salary_lte=30000"),
+    Endpoint("job_facet_view", "get", ANONYMOUS),
+    Endpoint("job_facet_view", "get", ANONYMOUS, query="q=java&education=%E6%9C%AC%E7%A7%91"),
+    Endpoint("job_detail_view", "get", ANONYMOUS, kwargs=job_kwargs),
+    Endpoint("job_detail_view", "get", CANDIDATE, kwargs=job_kwargs, label="GET job_detail_view (candidate)"),
+    Endpoint("invitation_detail_view", "patch", CANDIDATE, kwargs=lambda f: {"iid": f.invitation.id},
+             data=lambda f: {"response": Invitation.RESPONSE_YES}),
+    Endpoint("apply_job_view", "post", CANDIDATE, kwargs=lambda f: {"id": f.apply_job.id}),
+    Endpoint("company_list_view", "get", ANONYMOUS),
+    Endpoint("company_list_view", "get", ANONYMOUS, query="order=job"),
+    Endpoint("company_detail_view", "get", ANONYMOUS, kwargs=lambda f: {"id": f.company.id}),
+    Endpoint("index_view", "get", ANONYMOUS),
+    Endpoint("profile_user_view", "get", CANDIDATE),
+    Endpoint("profile_user_view", "patch", CANDIDATE, data=lambda f: {"first_name": "压测"}),
+    Endpoint("media_sign_view", "get", STAFF, query=lambda f: urlencode({"url": f.interview.resume.url}),
+             label="GET media_sign_view (resume)"),
+    Endpoint("profile_application_list_view", "get", CANDIDATE),
+    Endpoint("profile_application_list_view", "get", CANDIDATE, query="cursor=&updated_since=2020-01-01T00:00:00Z"),
+    Endpoint("company_profile_user_view", "get", MANAGER),
+    Endpoint("company_profile_user_view", "patch", MANAGER, data=lambda f: {"slogan": "压测口号"}),
+    Endpoint("logout_view", "post", CANDIDATE),
+]
+
+
+class Command(BaseCommand):
+    help = "用 Django 测试客户端压测 apps/api/urls.py 中的全部接口，输出每个接口的延迟分位数和查询数量的 JSON 报告"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20, help="每个接口的请求次数")
+        parser.add_argument("--warmup", type=int, default=2, help="每个接口正式计时前的预热请求次数")
+        parser.add_argument("--only", nargs="+", default=[], help="只压测名称中包含这些关键词的接口")
+        parser.add_argument("--output", default="bench_report.json", help="JSON 报告的输出路径，`-` 表示输出到标准输出")
+
+    def handle(self, *args, **options):
+        self.check_coverage()
+        endpoints = [endpoint for endpoint in ENDPOINTS
+                     if not options["only"] or any(keyword in endpoint.label for keyword in options["only"])]
+        # 接口返回 5xx 时只记录状态码，不输出异常日志
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+        # 整个压测在一个事务中进行并最终回滚；写接口的每次请求再单独回滚，保证每次请求面对相同的数据。
+        # 上传的文件写入临时目录；压测数据只存在于主库的事务中，所有请求都读取主库。
+        with transaction.atomic(), tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root, REPLICA_DATABASES=[]):
+            fixture = Fixture()
+            report = {
+                "generated_at": timezone.now().isoformat(),
+                "repeat": options["repeat"],
+                "dataset": {model.__name__: model.objects.count()
+                            for model in (Company, User, Job, Resume, Interview, Invitation)},
+                "endpoints": {},
+            }
+            for endpoint in endpoints:
+                result = self.run_endpoint(endpoint, fixture, options["repeat"], options["warmup"])
+                report["endpoints"][endpoint.label] = result
+                self.stdout.write("{:<60} {} queries={:<4} p50={:>8.2f}ms p95={:>8.2f}ms p99={:>8.2f}ms".format(
+                    endpoint.label, result["status"], result["queries"], result["p50_ms"], result["p95_ms"],
+                    result["p99_ms"]))
+            transaction.set_rollback(True)
+
+        content = json.dumps(report, ensure_ascii=False, indent=2, sort_keys=True)
+        if options["output"] == "-":
+            self.stdout.write(content)
+        else:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(content + "\n")
+            self.stdout.write(self.style.SUCCESS("压测报告已写入 {}".format(options["output"])))
+
+    def check_coverage(self):
+        """提示没有压测用例的路由，新增接口时需要同步补充 ENDPOINTS"""
+        covered = {endpoint.name for endpoint in ENDPOINTS}
+        for pattern in api_urls.urlpatterns:
+            if pattern.name not in covered:
+                self.stderr.write("路由 {} 没有压测用例".format(pattern.name))
+
+    def run_endpoint(self, endpoint, fixture, repeat, warmup):
+        client = Client(raise_request_exception=False)
+        headers = {}
+        if endpoint.role != ANONYMOUS:
+            headers["Authorization"] = "Bearer {}".format(fixture.tokens[endpoint.role])
+        path = endpoint.path(fixture)
+        samples, queries, status = [], [], None
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        for i in range(warmup + repeat):
+            data = endpoint.data(fixture) if endpoint.data else None
+            kwargs = {"headers": headers}
+            if data is not None:
+                kwargs["data"] = data if endpoint.multipart else json.dumps(data)
+                if not endpoint.multipart:
+                    kwargs["content_type"] = "application/json"
+            queries.clear()
+            with transaction.atomic(), connection.execute_wrapper(count_query):
+                start = time.perf_counter()
+                response = getattr(client, endpoint.method)(path, **kwargs)
+                elapsed = (time.perf_counter() - start) * 1000
+                if endpoint.method != "get":
+                    transaction.set_rollback(True)
+            if i >= warmup:
+                samples.append(elapsed)
+            status = response.status_code
+        return {
+            "method": endpoint.method.upper(),
+            "path": path,
+            "role": endpoint.role,
+            "status": status,
+            "queries": len(queries),
+            "mean_ms": round(statistics.mean(samples), 3),
+            "p50_ms": round(percentile(samples, 50), 3),
+            "p95_ms": round(percentile(samples, 95), 3),
+            "p99_ms": round(percentile(samples, 99), 3),
+        }
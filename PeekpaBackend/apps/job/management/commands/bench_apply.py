@@ -0,0 +1,93 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from apps.api.authentications import PeekpaAccessToken
+from apps.company.models import Company
+from apps.job.management.commands.bench_job_search import percentile
+from apps.job.models import Job, Resume, Interview, PublishJob
+from apps.peekpauser.models import User
+
+
+def apply_worker(url, tokens, start_event, results):
+    """子进程：等待所有进程就绪后依次发送投递请求，把 (延迟, 状态码) 列表放入结果队列"""
+    client = Client()
+    samples = []
+    start_event.wait()
+    for token in tokens:
+        start = time.perf_counter()
+        response = client.post(url, headers={"Authorization": "Bearer {}".format(token)})
+        samples.append(((time.perf_counter() - start) * 1000, response.status_code))
+    connections.close_all()
+    results.put(samples)
+
+
+class Command(BaseCommand):
+    help = "多个进程同时向同一个热门职位投递简历（每个求职者重复提交多次），校验没有重复的面试记录并统计投递接口延迟"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--candidates", type=int, default=300, help="求职者数量")
+        parser.add_argument("--repeat", type=int, default=3, help="每个求职者同时重复提交的次数，模拟重复点击和重试")
+        parser.add_argument("--concurrency", type=int, default=32, help="并发进程数（每个进程占用一个数据库连接）")
+
+    def handle(self, *args, **options):
+        # 请求由多个进程通过各自的数据库连接发送，测试数据无法放在一个事务中回滚，结束后删除
+        company, job, manager, candidates = self.seed(options["candidates"])
+        try:
+            tokens = [str(PeekpaAccessToken.for_user(user)) for user in candidates]
+            url = reverse("api:apply_job_view", kwargs={"id": job.id})
+            # 同一求职者的多次提交分到不同的进程中，几乎同时到达
+            requests = [token for token in tokens for _ in range(options["repeat"])]
+            concurrency = min(options["concurrency"], len(requests))
+            context = multiprocessing.get_context("fork")
+            start_event, results = context.Event(), context.Queue()
+            # 子进程不能共用父进程的数据库连接
+            connections.close_all()
+            workers = [context.Process(target=apply_worker,
+                                       args=(url, requests[i::concurrency], start_event, results))
+                       for i in range(concurrency)]
+            for worker in workers:
+                worker.start()
+            begin = time.perf_counter()
+            start_event.set()
+            samples = [sample for _ in workers for sample in results.get()]
+            elapsed = time.perf_counter() - begin
+            for worker in workers:
+                worker.join()
+
+            latencies = [latency for latency, _ in samples]
+            interviews = Interview.objects.filter(job=job)
+            duplicates = interviews.count() - interviews.values("candidate").distinct().count()
+            job.refresh_from_db()
+            self.stdout.write("{} requests from {} candidates, {} processes, {:.1f}s ({:.0f} req/s) statuses={}".format(
+                len(samples), len(candidates), concurrency, elapsed, len(samples) / elapsed,
+                sorted({code for _, code in samples})))
+            self.stdout.write("latency p50={:.1f}ms p95={:.1f}ms p99={:.1f}ms max={:.1f}ms".format(
+                percentile(latencies, 50), percentile(latencies, 95), percentile(latencies, 99), max(latencies)))
+            self.stdout.write("interviews={} duplicates={} job.application_count={}".format(
+                interviews.count(), duplicates, job.application_count))
+            if duplicates or interviews.count() != len(candidates) or job.application_count != len(candidates):
+                self.stderr.write(self.style.ERROR("存在重复投递或计数器偏差"))
+        finally:
+            User.objects.filter(uid__in=[manager.uid] + [user.uid for user in candidates]).delete()
+            company.delete()
+
+    def seed(self, size):
+        company = Company.objects.create(name="热门公司", avatar="", slogan="", tags="", size="", website="",
+                                         description="")
+        manager = User.objects.create(email="bench-apply-manager@peekpa.test", first_name="测试", last_name="经理",
+                                      company=company, is_manager=True, is_staff=True)
+        job = Job.objects.create(title="热门职位", city="北京", location="", benefit="", description="",
+                                 experience="1-3年", education="本科", company=company)
+        PublishJob.objects.create(user=manager, job=job)
+        candidates = User.objects.bulk_create(
+            [User(email="bench-apply{}@peekpa.test".format(i), first_name="求职者", last_name=str(i))
+             for i in range(size)])
+        Resume.objects.bulk_create([Resume(name="简历{}".format(i), user=user,
+                                           url="https://peekpa.test/resume/{}.pdf".format(i))
+                                    for i, user in enumerate(candidates)])
+        return company, job, manager, candidates
@@ -0,0 +1,80 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.api.serializers import InterviewSerializer
+from apps.api.view_manage import ManageInterviewListView
+from apps.company.models import Company
+from apps.job.management.commands.bench_job_search import percentile
+from apps.job.models import Job, Resume, Interview, Invitation
+from apps.peekpauser.models import User
+
+
+class Command(BaseCommand):
+    help = "对比招聘者面试列表（/api/manage/job/all/interviews/）逐行懒加载和预加载关联数据时每页的查询数量和 p50/p99 延迟"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-sizes", nargs="+", type=int, default=[50, 500], help="每页面试数量")
+        parser.add_argument("--jobs", type=int, default=20, help="职位数量")
+        parser.add_argument("--repeat", type=int, default=20, help="每种页面大小的请求次数")
+        parser.add_argument("--seed", type=int, default=42, help="随机数种子")
+
+    def handle(self, *args, **options):
+        # 测试数据在事务中生成，测试结束后回滚，不污染数据库
+        with transaction.atomic():
+            company = self.seed(max(options["page_sizes"]), options["jobs"], random.Random(options["seed"]))
+            queryset = Interview.objects.filter(job__company=company).order_by("-id")
+            for page_size in options["page_sizes"]:
+                legacy_queries, legacy = self.measure(queryset, page_size, options["repeat"])
+                prefetch_queries, prefetched = self.measure(
+                    ManageInterviewListView.with_related(queryset), page_size, options["repeat"])
+                self.stdout.write(
+                    "page={:<4} legacy queries={:<5} p50={:.2f}ms p99={:.2f}ms | "
+                    "prefetch queries={:<3} p50={:.2f}ms p99={:.2f}ms".format(
+                        page_size, legacy_queries, percentile(legacy, 50), percentile(legacy, 99),
+                        prefetch_queries, percentile(prefetched, 50), percentile(prefetched, 99)))
+            transaction.set_rollback(True)
+
+    def seed(self, size, job_count, rng):
+        company = Company.objects.create(name="测试公司", avatar="", slogan="", tags="", size="", website="",
+                                         description="")
+        manager = User.objects.create(email="bench-manager@peekpa.test", first_name="测试", last_name="经理",
+                                      company=company, is_manager=True, is_staff=True)
+        jobs = [Job.objects.create(title="测试职位{}".format(i), city="北京", location="", benefit="", description="",
+                                   experience="1-3年", education="本科", company=company) for i in range(job_count)]
+        candidates = User.objects.bulk_create(
+            [User(email="bench-candidate{}@peekpa.test".format(i), first_name="求职者", last_name=str(i))
+             for i in range(size)])
+        resumes = Resume.objects.bulk_create(
+            [Resume(name="简历{}".format(i), user=user, url="https://peekpa.test/resume/{}.pdf".format(i))
+             for i, user in enumerate(candidates)])
+        interviews = Interview.objects.bulk_create(
+            [Interview(job=rng.choice(jobs), interviewer=manager, candidate=user, resume=resume,
+                       status=rng.randint(0, Interview.STATUS_PASS))
+             for user, resume in zip(candidates, resumes)])
+        # 每个面试在各个阶段都可能发出过面试邀请
+        Invitation.objects.bulk_create(
+            [Invitation(interview=interview, status=status, message="面试邀请", interviewer=manager,
+                        candidate=interview.candidate, due_time=timezone.now())
+             for interview in interviews for status in range(interview.status + 1) if rng.random() < 0.7])
+        return company
+
+    def measure(self, queryset, page_size, repeat):
+        """模拟列表接口的一页：取出一页面试并序列化，返回 (每页查询数量, 每次请求的耗时列表（毫秒）)"""
+        samples = []
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        for _ in range(repeat):
+            queries.clear()
+            start = time.perf_counter()
+            with connection.execute_wrapper(count_query):
+                InterviewSerializer(queryset[:page_size], many=True).data
+            samples.append((time.perf_counter() - start) * 1000)
+        return len(queries), samples
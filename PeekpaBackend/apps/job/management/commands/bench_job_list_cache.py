@@ -0,0 +1,66 @@
+import random
+import time
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from apps.api import caches
+from apps.api.view_index import CATEGORY
+from apps.api.view_job import JOB_LIST_CACHE_STATS
+from apps.job.management.commands.bench_job_search import percentile
+
+
+class Command(BaseCommand):
+    help = "按首页分类标签的热门组合回放职位列表请求，统计职位列表结果缓存的命中率和 p50/p99 延迟"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="每种场景的请求次数")
+        parser.add_argument("--write-every", type=int, default=200,
+                            help="“有写入”场景中每隔多少个请求模拟一次职位写入（递增目录版本号）")
+        parser.add_argument("--seed", type=int, default=42, help="随机数种子")
+
+    def handle(self, *args, **options):
+        workload = self.build_workload()
+        scenarios = (
+            ("no cache", 1),  # 每个请求前都递增版本号，相当于不使用缓存
+            ("cached", 0),
+            ("cached+writes", options["write_every"]),
+        )
+        for label, write_every in scenarios:
+            rng = random.Random(options["seed"])
+            result = self.replay(workload, rng, options["requests"], write_every)
+            self.stdout.write("{:<14} hit_rate={:>6.1%} p50={:>7.2f}ms p99={:>7.2f}ms statuses={}".format(
+                label, result["hit_rate"], percentile(result["samples"], 50), percentile(result["samples"], 99),
+                result["statuses"]))
+
+    def build_workload(self):
+        """生成 (查询参数, 权重) 列表：分类标签 × 排序 × 前三页，越靠前的组合越热门（Zipf 分布）"""
+        keywords = [item["param"] for group in CATEGORY for item in group["filters"]] + [""]
+        combinations = []
+        for page in range(3):
+            for order in ("", "newest"):
+                for keyword in keywords:
+                    params = {key: value for key, value in (("q", keyword), ("order", order)) if value}
+                    if page:
+                        params["offset"] = page * 10
+                    combinations.append(urlencode(params))
+        return [(query, 1 / (rank + 1)) for rank, query in enumerate(combinations)]
+
+    def replay(self, workload, rng, requests, write_every):
+        client = Client()
+        queries = rng.choices([query for query, _ in workload], weights=[weight for _, weight in workload],
+                              k=requests)
+        JOB_LIST_CACHE_STATS.clear()
+        caches.bump_version(caches.CATALOG_VERSION_KEY)
+        samples, statuses = [], set()
+        for index, query in enumerate(queries):
+            if write_every and index % write_every == 0:
+                caches.bump_version(caches.CATALOG_VERSION_KEY)
+            start = time.perf_counter()
+            response = client.get("/api/job/?" + query)
+            samples.append((time.perf_counter() - start) * 1000)
+            statuses.add(response.status_code)
+        total = JOB_LIST_CACHE_STATS["hit"] + JOB_LIST_CACHE_STATS["miss"]
+        return {"hit_rate": JOB_LIST_CACHE_STATS["hit"] / max(total, 1), "samples": samples,
+                "statuses": sorted(statuses)}
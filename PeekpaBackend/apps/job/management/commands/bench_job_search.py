@@ -0,0 +1,87 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from apps.company.models import Company
+from apps.job.models import Job
+
+TITLES = ["Java 开发工程师", "PHP 工程师", "C++ 工程师", "区块链工程师", "Android 开发", "iOS 开发", "产品经理",
+          "数据产品经理", "产品总监", "UI设计师", "交互设计", "新媒体运营", "数据运营", "市场营销", "销售经理",
+          "HR", "财务", "游戏策划", "U3D 开发", "前端工程师"]
+CITIES = ["北京", "上海", "广州", "深圳", "杭州", "成都", "南京", "武汉"]
+BENEFITS = ["五险一金", "带薪年假", "弹性工作", "股票期权", "免费三餐", "年终奖"]
+
+
+def percentile(samples, p):
+    """返回样本的第 p 百分位数"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = "对比职位搜索 `q` 过滤器的旧实现（多列 LIKE 扫描）和检索文本三元组索引实现的 p50/p99 延迟"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10000, 100000, 1000000], help="职位数据规模")
+        parser.add_argument("--keywords", nargs="+", default=["java", "区块链", "产品经理", "深圳"], help="搜索关键词")
+        parser.add_argument("--repeat", type=int, default=50, help="每个关键词的请求次数")
+        parser.add_argument("--seed", type=int, default=42, help="随机数种子")
+
+    def handle(self, *args, **options):
+        for size in options["sizes"]:
+            # 每个规模的数据都在事务中生成，测试结束后回滚，不污染数据库
+            with transaction.atomic():
+                self.seed_jobs(size, random.Random(options["seed"]))
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE {}".format(Job._meta.db_table))
+                for keyword in options["keywords"]:
+                    legacy = self.measure(self.legacy_queryset(keyword), options["repeat"])
+                    indexed = self.measure(self.indexed_queryset(keyword), options["repeat"])
+                    self.stdout.write(
+                        "jobs={:<8} q={:<6} legacy p50={:.2f}ms p99={:.2f}ms | indexed p50={:.2f}ms p99={:.2f}ms".format(
+                            size, keyword, percentile(legacy, 50), percentile(legacy, 99),
+                            percentile(indexed, 50), percentile(indexed, 99)))
+                transaction.set_rollback(True)
+
+    def seed_jobs(self, size, rng):
+        companies = Company.objects.bulk_create(
+            [Company(name="测试公司{}".format(i), avatar="", slogan="", tags="", size="", website="", description="")
+             for i in range(max(1, size // 1000))])
+        batch = []
+        for i in range(size):
+            company = rng.choice(companies)
+            salary_min = rng.randrange(3, 40) * 1000
+            job = Job(title=rng.choice(TITLES), city=rng.choice(CITIES), location="{}路{}号".format(i % 500, i % 97),
+                      salary_min=salary_min, salary_max=salary_min + rng.randrange(1, 20) * 1000,
+                      benefit=" ".join(rng.sample(BENEFITS, 2)), description="职位描述 {}".format(i),
+                      experience="1-3年", education="本科", company=company)
+            job.search_text = job.build_search_text(company_name=company.name)
+            batch.append(job)
+            if len(batch) >= 5000:
+                Job.objects.bulk_create(batch)
+                batch = []
+        Job.objects.bulk_create(batch)
+
+    def legacy_queryset(self, keyword):
+        """重构前 `JobListFilter.my_custom_filter` 的查询"""
+        return Job.objects.filter(status=Job.STATUS_PUBLISH).filter(
+            Q(title__contains=keyword) | Q(city__contains=keyword) | Q(location__contains=keyword) | Q(
+                company__name__contains=keyword)
+        ).order_by("title")
+
+    def indexed_queryset(self, keyword):
+        return Job.objects.filter(status=Job.STATUS_PUBLISH, search_text__contains=keyword.lower()).order_by("title")
+
+    def measure(self, queryset, repeat):
+        """模拟列表接口的一次请求：统计总数并取第一页，返回每次请求的耗时（毫秒）"""
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            queryset.count()
+            list(queryset[:10])
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
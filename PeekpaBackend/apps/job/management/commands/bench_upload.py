@@ -0,0 +1,88 @@
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.test.client import RequestFactory, encode_multipart, BOUNDARY, MULTIPART_CONTENT
+from rest_framework.test import force_authenticate
+
+from apps.api import uploads, view_job
+from apps.api.view_job import ResumeView
+from apps.peekpauser.models import User
+
+
+def legacy_save_upload(file):
+    """重构前的保存方式：把整个上传文件读入内存后再写入存储"""
+    return uploads.save_upload(ContentFile(file.read(), name=file.name))
+
+
+class Command(BaseCommand):
+    help = "并发上传简历，对比整体读入内存和按块流式保存两种方式的单次上传内存峰值和吞吐量"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=20, help="每个简历文件的大小（MB）")
+        parser.add_argument("--concurrency", type=int, default=50, help="并发上传数量")
+
+    def handle(self, *args, **options):
+        size = options["size"] * 1024 * 1024
+        concurrency = options["concurrency"]
+        users = [User.objects.create_user("bench-upload{}@peekpa.test".format(i), "peekpa123")
+                 for i in range(concurrency)]
+        try:
+            with tempfile.TemporaryDirectory() as workdir, override_settings(MEDIA_ROOT=os.path.join(workdir, "media")):
+                # 请求体只生成一次并写入磁盘，每个上传请求从磁盘按块读取，模拟真实的网络输入
+                body_path = os.path.join(workdir, "body")
+                with open(body_path, "wb") as f:
+                    f.write(encode_multipart(BOUNDARY, {"resume": ContentFile(b"%PDF-1.4\n" + b"0" * (size - 9),
+                                                                              name="resume.pdf")}))
+                for mode, save_upload in (("legacy", legacy_save_upload), ("streamed", view_job.save_upload)):
+                    with mock.patch.object(view_job, "save_upload", save_upload):
+                        single = self.run_uploads(body_path, users[:1])
+                        concurrent = self.run_uploads(body_path, users)
+                    self.stdout.write(
+                        "{:<8} single upload peak={:.1f}MB | {} concurrent uploads peak={:.1f}MB "
+                        "throughput={:.1f}MB/s statuses={}".format(
+                            mode, single["peak"] / 1024 / 1024, concurrency, concurrent["peak"] / 1024 / 1024,
+                            size * concurrency / 1024 / 1024 / concurrent["elapsed"], sorted(set(concurrent["statuses"]))))
+        finally:
+            User.objects.filter(uid__in=[user.uid for user in users]).delete()
+
+    def run_uploads(self, body_path, users):
+        """每个用户一个线程同时上传，返回 Python 内存分配峰值、总耗时和响应状态码"""
+        view = ResumeView.as_view()
+        statuses = []
+        start_barrier = threading.Barrier(len(users))
+
+        def upload(user):
+            try:
+                with open(body_path, "rb") as body:
+                    environ = RequestFactory()._base_environ(
+                        PATH_INFO="/api/resume/upload/", REQUEST_METHOD="POST", CONTENT_TYPE=MULTIPART_CONTENT,
+                        CONTENT_LENGTH=str(os.path.getsize(body_path)), **{"wsgi.input": body})
+                    request = WSGIRequest(environ)
+                    force_authenticate(request, user=user)
+                    start_barrier.wait()
+                    statuses.append(view(request).status_code)
+                    # 与 Django 请求处理流程一致，请求结束后关闭上传的临时文件
+                    request.close()
+            finally:
+                connection.close()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        threads = [threading.Thread(target=upload, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {"peak": peak, "elapsed": elapsed, "statuses": statuses}
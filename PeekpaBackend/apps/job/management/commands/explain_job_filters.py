@@ -0,0 +1,70 @@
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import QueryDict
+
+from apps.api.view_job import JobListFilter, JobListView
+from apps.job.management.commands.bench_job_search import Command as BenchJobSearchCommand, percentile
+from apps.job.models import Job
+
+# 城市、薪资范围筛选的典型查询，每个查询使用的索引由 apps.job.tests.JobFilterPlanTests 检查
+QUERIES = [
+    "city=深圳",
+    "city=深圳&order=newest",
+    "salary_gte=50000",
+    "salary_lte=3000",
+    "salary_gte=55000&salary_lte=60000&order=newest",
+    "city=深圳&salary_lte=3000",
+    "city=深圳&salary_gte=50000&order=newest",
+]
+INDEX_RE = re.compile(r"(?:Bitmap Index|Index Only|Index) Scan(?: Backward)? (?:using|on) (\w+)")
+
+
+class Command(BaseCommand):
+    help = "在大规模职位数据上统计城市、薪资范围筛选的第一页和分页总数的查询延迟，并列出执行计划使用的索引"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=1000000, help="职位数据规模")
+        parser.add_argument("--repeat", type=int, default=20, help="每个查询的执行次数")
+        parser.add_argument("--seed", type=int, default=42, help="随机数种子")
+
+    def handle(self, *args, **options):
+        # 数据在事务中生成，统计结束后回滚，不污染数据库
+        with transaction.atomic():
+            BenchJobSearchCommand().seed_jobs(options["size"], random.Random(options["seed"]))
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE {}".format(Job._meta.db_table))
+            for query in QUERIES:
+                queryset = filter_queryset(query)
+                for kind, target in (("page", queryset[:10]), ("count", queryset.order_by())):
+                    plan = target.explain() if kind == "page" else explain_count(target)
+                    samples = []
+                    for _ in range(options["repeat"]):
+                        start = time.perf_counter()
+                        list(target.all()) if kind == "page" else target.count()
+                        samples.append((time.perf_counter() - start) * 1000)
+                    self.stdout.write("{:<5} {:<50} p50={:>7.2f}ms p99={:>7.2f}ms indexes={}".format(
+                        kind, query, percentile(samples, 50), percentile(samples, 99),
+                        ",".join(sorted(set(INDEX_RE.findall(plan)))) or "-"))
+                    if options["verbosity"] > 1:
+                        self.stdout.write(plan)
+            transaction.set_rollback(True)
+
+
+def filter_queryset(query):
+    """与 JobListView 使用相同的基础查询集和过滤器"""
+    filterset = JobListFilter(data=QueryDict(query), queryset=JobListView.queryset.all())
+    if not filterset.is_valid():
+        raise ValueError(filterset.errors)
+    return filterset.qs
+
+
+def explain_count(queryset):
+    """分页总数查询 `SELECT COUNT(*)` 的执行计划"""
+    sql, params = queryset.values("pk").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN SELECT COUNT(*) FROM ({}) subquery".format(sql), params)
+        return "\n".join(row[0] for row in cursor.fetchall())
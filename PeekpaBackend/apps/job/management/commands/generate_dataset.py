@@ -0,0 +1,212 @@
+import csv
+import datetime
+import io
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import DurationField, ExpressionWrapper, F, Value
+from django.db.models.functions import Mod, Now
+
+from apps.company.models import Company
+from apps.job.management.commands.bench_job_search import TITLES, CITIES, BENEFITS
+from apps.job.models import Job, PublishJob, Resume, Interview, Invitation
+from apps.peekpauser.models import User
+
+DATASET_DOMAIN = "dataset.peekpa.test"  # 生成数据的邮箱域名和网站域名，用于识别生成的数据
+DATASET_PASSWORD = "peekpa123"  # 所有生成用户的登录密码
+EXPERIENCES = ["不限", "应届生", "1年以下", "1-3年", "3-5年", "5-10年", "10年以上"]
+EDUCATIONS = ["不限", "大专", "本科", "硕士", "博士"]
+SIZES = ["0-20人", "20-99人", "100-499人", "500-999人", "1000-9999人", "10000人以上"]
+TAGS = ["移动互联网", "电子商务", "金融", "企业服务", "教育", "文化娱乐", "游戏", "医疗健康"]
+INTERVIEW_STATUS_WEIGHTS = [50, 20, 12, 8, 10]  # 面试状态 0~4 的分布，大部分面试停留在初始阶段
+
+
+def staff_email(company_index, staff_index):
+    """公司员工的邮箱，每个公司的第 0 个员工是公司管理员"""
+    return "staff{}-{}@{}".format(company_index, staff_index, DATASET_DOMAIN)
+
+
+def candidate_email(candidate_index):
+    return "candidate{}@{}".format(candidate_index, DATASET_DOMAIN)
+
+
+class Command(BaseCommand):
+    help = "按给定规模和随机数种子批量生成公司、职位、用户、简历、面试和面试邀请数据，用于压测和性能对比"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--companies", type=int, default=1000, help="公司数量")
+        parser.add_argument("--staff-per-company", type=int, default=3, help="每个公司的员工数量（第一个为公司管理员）")
+        parser.add_argument("--jobs", type=int, default=100000, help="职位数量")
+        parser.add_argument("--candidates", type=int, default=50000, help="求职者数量（每人一份简历）")
+        parser.add_argument("--interviews", type=int, default=500000, help="面试（投递）数量")
+        parser.add_argument("--batch-size", type=int, default=5000, help="每批插入的行数")
+        parser.add_argument("--seed", type=int, default=42, help="随机数种子，相同的种子和规模生成相同的数据")
+
+    def handle(self, *args, **options):
+        if User.objects.filter(email__endswith="@" + DATASET_DOMAIN).exists():
+            raise CommandError("数据库中已经存在生成的数据，请在新的数据库中运行")
+        if options["interviews"] > options["jobs"] * options["candidates"]:
+            raise CommandError("面试数量不能超过职位数量和求职者数量的乘积")
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.password = make_password(DATASET_PASSWORD)  # 密码哈希的计算很慢，所有用户共用同一个哈希值
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            companies = self.step("公司", self.create_companies, options["companies"])
+            staff = self.step("公司员工", self.create_staff, companies, options["staff_per_company"])
+            jobs = self.step("职位", self.create_jobs, companies, staff, options["jobs"])
+            candidates = self.step("求职者和简历", self.create_candidates, options["candidates"])
+            self.step("面试和面试邀请", self.create_interviews, jobs, candidates, options["interviews"])
+            # 批量插入不会触发信号，最后统一重建计数器
+            self.step("计数器", call_command, "rebuild_counters", stdout=io.StringIO())
+        self.stdout.write(self.style.SUCCESS("数据生成完成，共耗时 {:.1f}s，用户密码：{}".format(
+            time.perf_counter() - started, DATASET_PASSWORD)))
+
+    def step(self, name, func, *args, **kwargs):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.stdout.write("{}：{:.1f}s".format(name, time.perf_counter() - started))
+        return result
+
+    def bulk_create(self, model, rows, after_batch=None):
+        """
+        按批插入可迭代对象中的模型实例，返回插入后的 (第一个主键, 最后一个主键)。
+        after_batch 接收每批插入后的实例（包含主键），用于生成依赖这些行的数据，避免把所有实例保留在内存中。
+        """
+        first_pk = last_pk = None
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                first_pk, last_pk = self.insert_batch(model, batch, after_batch, first_pk, last_pk)
+                batch = []
+        if batch:
+            first_pk, last_pk = self.insert_batch(model, batch, after_batch, first_pk, last_pk)
+        return first_pk, last_pk
+
+    def insert_batch(self, model, batch, after_batch, first_pk, last_pk):
+        created = model.objects.bulk_create(batch)
+        if after_batch is not None:
+            after_batch(created)
+        return first_pk if first_pk is not None else created[0].pk, created[-1].pk
+
+    def copy_rows(self, model, rows):
+        """
+        PostgreSQL（psycopg2）下用 COPY 写入不需要返回主键的行，比 bulk_create 快数倍；其他数据库退回 bulk_create。
+        只支持整数、字符串和时间等简单类型的字段。
+        """
+        with connection.cursor() as cursor:
+            if connection.vendor != "postgresql" or not hasattr(cursor, "copy_expert"):
+                model.objects.bulk_create(rows, batch_size=self.batch_size)
+                return
+            fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow([field.pre_save(row, add=True) for field in fields])
+            buffer.seek(0)
+            cursor.copy_expert("COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+                connection.ops.quote_name(model._meta.db_table),
+                ", ".join(connection.ops.quote_name(field.column) for field in fields)), buffer)
+
+    def spread_publish_time(self, model, pk_range, days=365):
+        """批量插入时 publish_time 都是当前时间，按 id 把发布时间分散到最近 days 天内"""
+        model.objects.filter(pk__range=pk_range).update(publish_time=ExpressionWrapper(
+            Now() - Mod(F("id") * 7919, days * 24) * Value(datetime.timedelta(hours=1)), output_field=DurationField()))
+
+    def create_companies(self, count):
+        rng = self.rng
+        companies = []
+        self.bulk_create(Company, (
+            Company(name="{}科技{}".format(rng.choice(TAGS), i), avatar="https://{}/logo/{}.png".format(DATASET_DOMAIN, i),
+                    slogan="公司口号 {}".format(i), tags=" ".join(rng.sample(TAGS, 2)), size=rng.choice(SIZES),
+                    website="https://{}/company/{}".format(DATASET_DOMAIN, i), description="公司介绍 {}".format(i))
+            for i in range(count)), after_batch=companies.extend)
+        return companies
+
+    def create_staff(self, companies, staff_per_company):
+        """返回每个公司的员工 uid 列表，列表第一个员工是公司管理员"""
+        users = []
+        self.bulk_create(User, (
+            User(email=staff_email(c, s), first_name="员工", last_name="{}-{}".format(c, s), password=self.password,
+                 company=company, is_manager=s == 0, is_staff=True,
+                 details={"company_id": company.id, "is_manager": s == 0})
+            for c, company in enumerate(companies) for s in range(staff_per_company)),
+            after_batch=lambda batch: users.extend(user.uid for user in batch))
+        return [users[c * staff_per_company:(c + 1) * staff_per_company] for c in range(len(companies))]
+
+    def create_jobs(self, companies, staff, count):
+        """返回 (职位 id, 发布人 uid) 列表"""
+        rng = self.rng
+        owners = [rng.randrange(len(companies)) for _ in range(count)]
+        posters = [rng.choice(staff[c]) for c in owners]
+
+        def build():
+            for i, c in enumerate(owners):
+                company = companies[c]
+                salary_min = rng.randrange(3, 40) * 1000
+                job = Job(title=rng.choice(TITLES), status=rng.choices([0, 1, 2], [80, 10, 10])[0],
+                          city=rng.choice(CITIES), location="{}路{}号".format(i % 500, i % 97),
+                          salary_min=salary_min, salary_max=salary_min + rng.randrange(1, 20) * 1000,
+                          salary_count=rng.choice([12, 13, 14, 15, 16]), hire_number=rng.randint(1, 10),
+                          experience=rng.choice(EXPERIENCES), education=rng.choice(EDUCATIONS),
+                          benefit=" ".join(rng.sample(BENEFITS, 3)), description="职位描述 {}".format(i),
+                          company=company)
+                job.search_text = job.build_search_text(company_name=company.name)
+                yield job
+
+        job_ids = []
+        self.spread_publish_time(Job, self.bulk_create(
+            Job, build(), after_batch=lambda batch: job_ids.extend(job.id for job in batch)))
+        jobs = list(zip(job_ids, posters))
+        self.bulk_create(PublishJob, (PublishJob(user_id=poster, job_id=job) for job, poster in jobs))
+        return jobs
+
+    def create_candidates(self, count):
+        """返回 (求职者 uid, 简历 id) 列表"""
+        rng = self.rng
+        candidates = []
+
+        def create_resumes(users):
+            resumes = Resume.objects.bulk_create(
+                [Resume(name="简历{}.pdf".format(len(candidates) + i), user=user,
+                        url="media/resume/dataset_{}.pdf".format(len(candidates) + i)) for i, user in enumerate(users)])
+            candidates.extend((user.uid, resume.id) for user, resume in zip(users, resumes))
+
+        self.bulk_create(User, (
+            User(email=candidate_email(i), first_name="求职者", last_name=str(i), password=self.password,
+                 gender=rng.choice([0, 1, 2])) for i in range(count)), after_batch=create_resumes)
+        return candidates
+
+    def create_interviews(self, jobs, candidates, count):
+        rng = self.rng
+        per_candidate, extra = divmod(count, len(candidates))
+
+        def build():
+            for i, (candidate, resume) in enumerate(candidates):
+                # 每个求职者投递若干个不同的职位
+                for j in rng.sample(range(len(jobs)), per_candidate + (i < extra)):
+                    job, poster = jobs[j]
+                    status = rng.choices(range(len(INTERVIEW_STATUS_WEIGHTS)), INTERVIEW_STATUS_WEIGHTS)[0]
+                    yield Interview(job_id=job, interviewer_id=poster, candidate_id=candidate, resume_id=resume,
+                                    status=status)
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        # 面试邀请使用独立的随机数序列，生成结果与 --batch-size 无关
+        invitation_rng = random.Random(rng.random())
+
+        def create_invitations(interviews):
+            # 面试每推进一个阶段，大概率发出过一次面试邀请
+            self.copy_rows(Invitation, [
+                Invitation(interview_id=interview.id, status=stage, message="第 {} 轮面试邀请".format(stage + 1),
+                           interviewer_id=interview.interviewer_id, candidate_id=interview.candidate_id,
+                           response=invitation_rng.choice([0, 1, 1, 2]),
+                           due_time=now + datetime.timedelta(days=invitation_rng.randint(1, 14)))
+                for interview in interviews for stage in range(interview.status + 1) if invitation_rng.random() < 0.7])
+
+        self.spread_publish_time(Interview, self.bulk_create(Interview, build(), after_batch=create_invitations))
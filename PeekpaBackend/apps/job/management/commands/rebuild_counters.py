@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from apps.company.models import Company
+from apps.job.models import Job, Interview, Invitation
+
+
+def grouped(queryset, field):
+    """相关子查询：统计与外层行关联的行数，没有关联行时为 0"""
+    counts = queryset.filter(**{field: OuterRef("pk")}).order_by().values(field).annotate(n=Count("*")).values("n")
+    return Coalesce(Subquery(counts), 0)
+
+
+def company_counters():
+    return {
+        "job_count": grouped(Job.objects.all(), "company"),
+        "open_job_count": grouped(Job.objects.filter(status=Job.STATUS_PUBLISH), "company"),
+        "interview_count": grouped(Interview.objects.filter(status__in=Interview.STATUS_ACTIVE), "job__company"),
+        "application_count": grouped(Interview.objects.all(), "job__company"),
+        "invitation_count": grouped(Invitation.objects.all(), "interview__job__company"),
+    }
+
+
+def job_counters():
+    return {
+        "application_count": grouped(Interview.objects.all(), "job"),
+        "pass_count": grouped(Interview.objects.filter(status=Interview.STATUS_PASS), "job"),
+    }
+
+
+class Command(BaseCommand):
+    help = "根据职位、面试和面试邀请重新计算公司和职位上的计数器，校验并修复计数偏差"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="只校验不修复，存在偏差时返回非零退出码")
+        parser.add_argument("--batch-size", type=int, default=1000, help="每批修复的行数")
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for model, counters in ((Company, company_counters()), (Job, job_counters())):
+            drifted += self.rebuild(model, counters, options["check"], options["batch_size"], options["verbosity"])
+        if options["check"] and drifted:
+            raise CommandError("{} 行计数器存在偏差".format(drifted))
+        self.stdout.write(self.style.SUCCESS("计数器校验完成，偏差行数：{}".format(drifted)))
+
+    def rebuild(self, model, counters, check, batch_size, verbosity):
+        expected = {"expected_{}".format(field): expression for field, expression in counters.items()}
+        rows = model.objects.annotate(**expected).values("pk", *counters.keys(), *expected.keys())
+        drifted_ids = []
+        for row in rows.iterator(chunk_size=batch_size):
+            if any(row[field] != row["expected_{}".format(field)] for field in counters):
+                drifted_ids.append(row["pk"])
+                if check or verbosity > 1:
+                    self.stdout.write("{} {}: {}".format(model.__name__, row["pk"], {
+                        field: (row[field], row["expected_{}".format(field)]) for field in counters}))
+        if not check:
+            # 在一条 UPDATE 语句中用子查询重新计算，避免读取和写入之间的并发写入造成新的偏差
+            for start in range(0, len(drifted_ids), batch_size):
+                model.objects.filter(pk__in=drifted_ids[start:start + batch_size]).update(**counters)
+        self.stdout.write("{}: {} 行计数器存在偏差".format(model.__name__, len(drifted_ids)))
+        return len(drifted_ids)
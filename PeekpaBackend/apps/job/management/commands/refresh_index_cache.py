@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.api.view_index import refresh_blocks
+
+
+class Command(BaseCommand):
+    help = "重建首页推荐区块的缓存（需要配置共享缓存），可在部署后或定时任务中执行以预热缓存"
+
+    def handle(self, *args, **options):
+        refresh_blocks()
+        self.stdout.write(self.style.SUCCESS("首页缓存已刷新"))
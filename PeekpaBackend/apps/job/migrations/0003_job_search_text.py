@@ -0,0 +1,42 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:11
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def fill_search_text(apps, schema_editor):
+    """为已有职位生成检索文本"""
+    Job = apps.get_model("job", "Job")
+    jobs = []
+    for job in Job.objects.select_related("company").iterator(chunk_size=500):
+        company_name = job.company.name if job.company_id else ""
+        parts = [job.title, job.city, job.location, company_name, job.benefit, job.description]
+        job.search_text = " ".join(part for part in parts if part).lower()
+        jobs.append(job)
+        if len(jobs) >= 500:
+            Job.objects.bulk_update(jobs, ["search_text"])
+            jobs = []
+    Job.objects.bulk_update(jobs, ["search_text"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0001_initial'),
+        ('job', '0002_interview_invitation'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='job',
+            name='search_text',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='job',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_text'], name='job_search_text_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:17
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def grouped(queryset, field):
+    counts = queryset.filter(**{field: OuterRef("pk")}).order_by().values(field).annotate(n=Count("*")).values("n")
+    return Coalesce(Subquery(counts), 0)
+
+
+def fill_counters(apps, schema_editor):
+    """根据已有数据初始化公司和职位上的计数器"""
+    Company = apps.get_model("company", "Company")
+    Job = apps.get_model("job", "Job")
+    Interview = apps.get_model("job", "Interview")
+    Invitation = apps.get_model("job", "Invitation")
+    Company.objects.update(
+        job_count=grouped(Job.objects.all(), "company"),
+        open_job_count=grouped(Job.objects.filter(status=0), "company"),
+        interview_count=grouped(Interview.objects.filter(status__in=[0, 1, 2, 3]), "job__company"),
+        application_count=grouped(Interview.objects.all(), "job__company"),
+        invitation_count=grouped(Invitation.objects.all(), "interview__job__company"),
+    )
+    Job.objects.update(
+        application_count=grouped(Interview.objects.all(), "job"),
+        pass_count=grouped(Interview.objects.filter(status=4), "job"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0002_counters'),
+        ('job', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='application_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='pass_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
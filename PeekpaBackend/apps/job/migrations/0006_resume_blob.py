@@ -0,0 +1,20 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('job', '0005_counters'),
+        ('peekpauser', '0004_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='resumes', to='peekpauser.blob'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('job', '0006_resume_blob'),
+        ('peekpauser', '0004_blob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='resume',
+            index=models.Index(fields=['url'], name='resume_url_idx'),
+        ),
+    ]
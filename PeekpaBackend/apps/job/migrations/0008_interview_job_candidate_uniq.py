@@ -0,0 +1,61 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:44
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def grouped(queryset, field):
+    counts = queryset.filter(**{field: OuterRef("pk")}).order_by().values(field).annotate(n=Count("*")).values("n")
+    return Coalesce(Subquery(counts), 0)
+
+
+def remove_duplicate_interviews(apps, schema_editor):
+    """
+    同一求职者对同一职位的重复投递只保留最早的一条，其余面试的面试邀请合并到保留的面试上。
+
+    迁移中不会触发计数器信号，删除后重新计算受影响的职位和公司上与面试相关的计数器
+    （面试邀请只在同一职位的面试之间合并，面试邀请数不变）。
+    """
+    Company = apps.get_model("company", "Company")
+    Job = apps.get_model("job", "Job")
+    Interview = apps.get_model("job", "Interview")
+    Invitation = apps.get_model("job", "Invitation")
+    duplicates = Interview.objects.values("job_id", "candidate_id").annotate(
+        keep_id=Min("id"), total=Count("id")).filter(total__gt=1).order_by()
+    job_ids = set()
+    for row in duplicates.iterator():
+        others = Interview.objects.filter(job_id=row["job_id"], candidate_id=row["candidate_id"]).exclude(
+            id=row["keep_id"])
+        Invitation.objects.filter(interview__in=others).update(interview_id=row["keep_id"])
+        others.delete()
+        job_ids.add(row["job_id"])
+    if job_ids:
+        Job.objects.filter(id__in=job_ids).update(
+            application_count=grouped(Interview.objects.all(), "job"),
+            pass_count=grouped(Interview.objects.filter(status=4), "job"),
+        )
+        Company.objects.filter(id__in=Job.objects.filter(id__in=job_ids).values("company_id")).update(
+            application_count=grouped(Interview.objects.all(), "job__company"),
+            interview_count=grouped(Interview.objects.filter(status__in=[0, 1, 2, 3]), "job__company"),
+        )
+    # 立即检查延迟的外键约束，否则同一事务中无法继续执行 ALTER TABLE
+    schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0002_counters'),
+        ('job', '0007_resume_url_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_interviews, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='interview',
+            constraint=models.UniqueConstraint(fields=('job', 'candidate'), name='interview_job_candidate_uniq'),
+        ),
+    ]
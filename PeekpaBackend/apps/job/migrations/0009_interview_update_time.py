@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:49
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill_update_time(apps, schema_editor):
+    """已有面试的 update_time 取创建时间和其面试邀请最后更新时间中较晚的一个"""
+    Interview = apps.get_model("job", "Interview")
+    Invitation = apps.get_model("job", "Invitation")
+    last_invitation = Invitation.objects.filter(interview=OuterRef("pk")).order_by().values(
+        "interview").annotate(last=Max("update_time")).values("last")
+    Interview.objects.update(update_time=Greatest(
+        "publish_time", Coalesce(Subquery(last_invitation), "publish_time")))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('job', '0008_interview_job_candidate_uniq'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='interview',
+            name='update_time',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_update_time, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='interview',
+            index=models.Index(fields=['candidate', 'update_time', 'id'], name='interview_candidate_update_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0004_update_time'),
+        ('job', '0010_update_time'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'city', 'title', 'id'], name='job_status_city_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'city', 'publish_time', 'id'], name='job_status_city_publish_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'salary_max', 'salary_min'], name='job_status_salary_max_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'salary_min', 'salary_max'], name='job_status_salary_min_idx'),
+        ),
+    ]
@@ -1,9 +1,10 @@
 from datetime import timedelta
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models, transaction
 from django.db.models import F
 from django.utils import timezone
 from apps.company.models import Company
-from apps.peekpauser.models import User
+from apps.peekpauser.models import User, Blob
 
 
 # Create your models here.
@@ -13,8 +14,16 @@ class Resume(models.Model):
     name = models.CharField(max_length=200)  # 简历名称
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="resume")  # 简历所属用户，外键，和系统用户关联
     url = models.URLField()  # 简历文件 URL
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True,
+                             related_name="resumes")  # 简历文件内容，旧数据为空
     is_active = models.BooleanField(default=True)  # 当前简历是否是使用中的简历
 
+    class Meta:
+        indexes = [
+            # 访问上传文件时按 URL 查找引入 Blob 之前上传的简历
+            models.Index(fields=["url"], name="resume_url_idx"),
+        ]
+
 
 class Job(models.Model):
     """职位模型类"""
@@ -27,6 +36,8 @@ class Job(models.Model):
         (STATUS_CLOSE, "已下线"),
         (STATUS_FINISH, "已结束"),
     )
+    # 拼接检索文本时需要加载的字段
+    SEARCH_TEXT_FIELDS = ("id", "title", "city", "location", "benefit", "description", "company_id", "search_text")
 
     id = models.AutoField(primary_key=True)  # 职位 ID，主键
     title = models.CharField(max_length=100)  # 职位名称
@@ -44,6 +55,43 @@ class Job(models.Model):
     publish_time = models.DateTimeField(auto_now_add=True)  # 职位发布时间
     resumes = models.ManyToManyField(Resume)  # 职位收到的简历
     company = models.ForeignKey(Company, on_delete=models.CASCADE, null=True, related_name="jobs")  # 职位所属公司，外键，和公司关联
+    search_text = models.TextField(default="", editable=False)  # 职位检索文本，由 build_search_text() 维护
+    application_count = models.PositiveIntegerField(default=0)  # 收到的简历数，由 apps.job.signals 维护
+    pass_count = models.PositiveIntegerField(default=0)  # 面试通过人数，由 apps.job.signals 维护
+    # 职位最后更新的时间，面试通过人数变化时由 apps.job.signals 同步更新，用作职位详情接口的版本号
+    update_time = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # pg_trgm 三元组 GIN 索引，支持 `LIKE '%关键词%'` 形式的中英文子串检索
+            GinIndex(fields=["search_text"], name="job_search_text_trgm", opclasses=["gin_trgm_ops"]),
+            # 职位列表按 title / -publish_time 排序的游标分页索引，id 作为决胜字段
+            models.Index(fields=["status", "title", "id"], name="job_status_title_idx"),
+            models.Index(fields=["status", "publish_time", "id"], name="job_status_publish_idx"),
+            # 按城市筛选后按 title / -publish_time 排序分页
+            models.Index(fields=["status", "city", "title", "id"], name="job_status_city_title_idx"),
+            models.Index(fields=["status", "city", "publish_time", "id"], name="job_status_city_publish_idx"),
+            # 薪资范围筛选：salary_gte 对应 salary_max 的范围扫描，salary_lte 对应 salary_min 的范围扫描，
+            # 另一个薪资字段放在索引中，无需回表即可过滤
+            models.Index(fields=["status", "salary_max", "salary_min"], name="job_status_salary_max_idx"),
+            models.Index(fields=["status", "salary_min", "salary_max"], name="job_status_salary_min_idx"),
+        ]
+
+    def build_search_text(self, company_name=None):
+        """拼接职位的检索文本：职位名称、城市、地址、公司名称、福利待遇和职位描述，统一转为小写"""
+        if company_name is None:
+            company_name = self.company.name if self.company_id else ""
+        parts = [self.title, self.city, self.location, company_name, self.benefit, self.description]
+        return " ".join(part for part in parts if part).lower()
+
+    def save(self, *args, **kwargs):
+        self.search_text = self.build_search_text()  # 在保存模型时同步更新检索文本
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "search_text", "update_time"}
+        # pre_save 信号中锁定行读取旧值，与 post_save 信号中的计数器更新处于同一事务
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
 
 class PublishJob(models.Model):
@@ -54,6 +102,9 @@ class PublishJob(models.Model):
 
 class Interview(models.Model):
     """面试模型类"""
+    STATUS_ACTIVE = (0, 1, 2, 3)  # 面试状态：正在进行中
+    STATUS_PASS = 4  # 面试状态：面试通过
+
     id = models.AutoField(primary_key=True)  # 面试 ID，主键
     job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name="interviews")  # 面试职位，外键，和职位关联
     interviewer = models.ForeignKey(User, on_delete=models.CASCADE, related_name="interviews")  # 面试者（招聘者）
@@ -61,8 +112,27 @@ class Interview(models.Model):
     resume = models.ForeignKey(Resume, on_delete=models.CASCADE, related_name="interviews")  # 面试简历，外键，和简历关联
     status = models.PositiveIntegerField(default=0)  # 当前面试状态
     publish_time = models.DateTimeField(auto_now_add=True)  # 创建面试的时间
+    # 面试或其面试邀请最后更新的时间，面试邀请变更时由 apps.job.signals 同步更新
+    update_time = models.DateTimeField(auto_now=True)
     feedback = models.JSONField(default=dict)  # 面试反馈，JSON 格式，包含面试结果和面试评价
 
+    class Meta:
+        indexes = [
+            # 单个职位的面试列表按 -id 游标分页
+            models.Index(fields=["job", "id"], name="interview_job_id_idx"),
+            # 求职者的投递记录按更新时间增量同步、游标分页
+            models.Index(fields=["candidate", "update_time", "id"], name="interview_candidate_update_idx"),
+        ]
+        constraints = [
+            # 每个求职者对同一职位只能投递一次，重复提交的投递请求不会产生多条面试记录
+            models.UniqueConstraint(fields=["job", "candidate"], name="interview_job_candidate_uniq"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # pre_save 信号中锁定行读取旧值，与 post_save 信号中的计数器更新处于同一事务
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Invitation(models.Model):
     """面试邀请模型类"""
@@ -90,4 +160,5 @@ class Invitation(models.Model):
 
     def save(self, *args, **kwargs):
         self.update_time = timezone.now()  # 在保存模型时更新 update_time 字段
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
@@ -0,0 +1,210 @@
+from collections import Counter
+
+from django.db.models import F
+from django.db.models.signals import post_save, pre_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.api.caches import invalidate_dashboard, invalidate_catalog
+from apps.company.models import Company
+from apps.job.models import Job, Interview, Invitation, Resume
+from apps.peekpauser.tasks import enqueue_release_file
+
+
+@receiver(post_save, sender=Company)
+def refresh_company_jobs_search_text(sender, instance, created, **kwargs):
+    """公司信息变更后，同步刷新该公司下所有职位的检索文本（检索文本中包含公司名称）"""
+    if created:
+        return
+    jobs = []
+    for job in Job.objects.filter(company=instance).only(*Job.SEARCH_TEXT_FIELDS).iterator(chunk_size=500):
+        search_text = job.build_search_text(company_name=instance.name)
+        if search_text != job.search_text:
+            job.search_text = search_text
+            jobs.append(job)
+    Job.objects.bulk_update(jobs, ["search_text"], batch_size=500)
+
+
+# ---------------------------------------------------------------------------
+# 计数器维护
+#
+# 每个职位、面试对计数器的“贡献”由下面的 *_contribution() 函数给出，
+# 保存时先减去旧状态的贡献再加上新状态的贡献，删除时减去贡献。更新语句使用 F() 表达式，
+# 和触发它的 save()/delete() 处于同一事务中。
+# 旧状态在 pre_save 中用 SELECT ... FOR UPDATE 重新读取，并发修改同一行时后一个事务等待前一个提交后
+# 再读取，不会基于过期的旧状态重复计数；计数器不做下限截断，出现负数说明计数有偏差，应当暴露出来。
+# ---------------------------------------------------------------------------
+
+def update_counters(queryset, deltas, **extra):
+    """对查询集中的行执行 `计数器 = 计数器 + 增量`；extra 为同时更新的其他字段"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if deltas:
+        queryset.update(**{field: F(field) + delta for field, delta in deltas.items()}, **extra)
+
+
+def add_delta(deltas, key, contribution, sign):
+    """把一份贡献按正负号累加到 deltas[key] 中"""
+    deltas.setdefault(key, Counter()).update({field: sign * count for field, count in contribution.items()})
+
+
+def load_old_values(sender, instance, fields):
+    """
+    锁定实例对应的行并返回保存前在数据库中的字段值，新建的实例返回 None。
+    需要在事务中调用，Job.save() 和 Interview.save() 已经开启了事务，行锁持续到计数器更新提交。
+    """
+    if instance._state.adding:
+        return None
+    return sender.objects.select_for_update().filter(pk=instance.pk).values(*fields).first()
+
+
+def job_contribution(status):
+    """职位对所属公司计数器的贡献"""
+    return {"job_count": 1, "open_job_count": int(status == Job.STATUS_PUBLISH)}
+
+
+def interview_job_contribution(status):
+    """面试对所属职位计数器的贡献"""
+    return {"application_count": 1, "pass_count": int(status == Interview.STATUS_PASS)}
+
+
+def interview_company_contribution(status):
+    """面试对职位所属公司计数器的贡献"""
+    return {"application_count": 1, "interview_count": int(status in Interview.STATUS_ACTIVE)}
+
+
+def job_version_update(delta):
+    """面试计数器的增量影响职位详情的内容时，返回更新职位版本号的字段"""
+    return {"update_time": timezone.now()} if delta.get("pass_count") else {}
+
+
+JOB_TRACKED_FIELDS = ("company_id", "status")
+INTERVIEW_TRACKED_FIELDS = ("job_id", "status")
+
+
+@receiver(pre_save, sender=Job)
+def remember_job_state(sender, instance, **kwargs):
+    instance._old_counter_values = load_old_values(sender, instance, JOB_TRACKED_FIELDS)
+
+
+@receiver(post_save, sender=Job)
+def update_job_counters(sender, instance, created, **kwargs):
+    old = instance._old_counter_values
+    deltas = {}
+    if old is not None and old["company_id"] is not None:
+        add_delta(deltas, old["company_id"], job_contribution(old["status"]), -1)
+    if instance.company_id is not None:
+        add_delta(deltas, instance.company_id, job_contribution(instance.status), 1)
+    for company_id, delta in deltas.items():
+        update_counters(Company.objects.filter(pk=company_id), delta)
+
+
+@receiver(post_delete, sender=Job)
+def update_job_counters_on_delete(sender, instance, **kwargs):
+    if instance.company_id is not None:
+        deltas = {}
+        add_delta(deltas, instance.company_id, job_contribution(instance.status), -1)
+        update_counters(Company.objects.filter(pk=instance.company_id), deltas[instance.company_id])
+
+
+@receiver(pre_save, sender=Interview)
+def remember_interview_state(sender, instance, **kwargs):
+    instance._old_counter_values = load_old_values(sender, instance, INTERVIEW_TRACKED_FIELDS)
+
+
+@receiver(post_save, sender=Interview)
+def update_interview_counters(sender, instance, created, **kwargs):
+    old = instance._old_counter_values
+    job_deltas, company_deltas = {}, {}
+    if old is not None:
+        add_delta(job_deltas, old["job_id"], interview_job_contribution(old["status"]), -1)
+        add_delta(company_deltas, old["job_id"], interview_company_contribution(old["status"]), -1)
+    add_delta(job_deltas, instance.job_id, interview_job_contribution(instance.status), 1)
+    add_delta(company_deltas, instance.job_id, interview_company_contribution(instance.status), 1)
+    for job_id, delta in job_deltas.items():
+        # 职位详情中展示面试通过人数，通过人数变化时同时更新职位的版本号
+        update_counters(Job.objects.filter(pk=job_id), delta, **job_version_update(delta))
+    for job_id, delta in company_deltas.items():
+        # 面试计数器记在职位所属的公司上
+        update_counters(Company.objects.filter(jobs__id=job_id), delta)
+
+
+@receiver(post_delete, sender=Interview)
+def update_interview_counters_on_delete(sender, instance, **kwargs):
+    job_deltas, company_deltas = {}, {}
+    add_delta(job_deltas, instance.job_id, interview_job_contribution(instance.status), -1)
+    add_delta(company_deltas, instance.job_id, interview_company_contribution(instance.status), -1)
+    update_counters(Job.objects.filter(pk=instance.job_id), job_deltas[instance.job_id],
+                    **job_version_update(job_deltas[instance.job_id]))
+    update_counters(Company.objects.filter(jobs__id=instance.job_id), company_deltas[instance.job_id])
+
+
+@receiver(post_save, sender=Invitation)
+def update_invitation_counters(sender, instance, created, **kwargs):
+    if created:
+        update_counters(Company.objects.filter(jobs__interviews__id=instance.interview_id), {"invitation_count": 1})
+
+
+@receiver(post_delete, sender=Invitation)
+def update_invitation_counters_on_delete(sender, instance, **kwargs):
+    update_counters(Company.objects.filter(jobs__interviews__id=instance.interview_id), {"invitation_count": -1})
+
+
+# ---------------------------------------------------------------------------
+# 公司版本号：公司详情中包含其发布的职位，职位变更时同步更新公司的 update_time
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def touch_job_company(sender, instance, **kwargs):
+    old = getattr(instance, "_old_counter_values", None)
+    company_ids = {instance.company_id, old["company_id"] if old else None} - {None}
+    if company_ids:
+        Company.objects.filter(pk__in=company_ids).update(update_time=timezone.now())
+
+
+# ---------------------------------------------------------------------------
+# 职位目录缓存失效：职位列表中包含公司名称、标签和 Logo，职位或公司写入时都需要失效
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def invalidate_job_catalog(sender, instance, **kwargs):
+    invalidate_catalog()
+
+
+# ---------------------------------------------------------------------------
+# 公司看板统计缓存失效
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def invalidate_job_dashboard(sender, instance, **kwargs):
+    invalidate_dashboard(instance.company_id)
+
+
+@receiver(post_save, sender=Interview)
+@receiver(post_delete, sender=Interview)
+def invalidate_interview_dashboard(sender, instance, **kwargs):
+    invalidate_dashboard(Job.objects.filter(pk=instance.job_id).values_list("company_id", flat=True).first())
+
+
+@receiver(post_save, sender=Invitation)
+@receiver(post_delete, sender=Invitation)
+def touch_interview(sender, instance, **kwargs):
+    """面试邀请变更后更新面试的 update_time，求职者的投递记录接口据此增量同步"""
+    Interview.objects.filter(pk=instance.interview_id).update(update_time=timezone.now())
+
+
+@receiver(post_save, sender=Invitation)
+@receiver(post_delete, sender=Invitation)
+def invalidate_invitation_dashboard(sender, instance, **kwargs):
+    invalidate_dashboard(
+        Job.objects.filter(interviews__id=instance.interview_id).values_list("company_id", flat=True).first())
+
+
+@receiver(post_delete, sender=Resume)
+def release_resume_file(sender, instance, **kwargs):
+    """删除简历后在后台释放其引用的文件"""
+    enqueue_release_file(instance)
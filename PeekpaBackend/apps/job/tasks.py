@@ -0,0 +1,8 @@
+from apps.job.models import Resume
+from apps.task.queue import task
+
+
+@task
+def delete_unused_resumes(user_id):
+    """删除用户已停用并且没有投递记录的简历，简历文件由 post_delete 信号加入队列释放"""
+    Resume.objects.filter(user_id=user_id, is_active=False, interviews=None).delete()
@@ -1,3 +1,152 @@
+from importlib import import_module
+from types import SimpleNamespace
+from unittest import skipUnless
+
+from django.apps import apps
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.api.tests import create_company, create_staff, create_candidate, create_job, create_interview, \
+    create_invitation
+from apps.company.models import Company
+from apps.job.management.commands.bench_job_search import TITLES, CITIES
+from apps.job.management.commands.explain_job_filters import INDEX_RE, filter_queryset, explain_count
+from apps.job.models import Job, Interview, Invitation
+
+duplicate_migration = import_module("apps.job.migrations.0008_interview_job_candidate_uniq")
+
+
+class CounterTests(TestCase):
+    """职位、公司上由信号维护的计数器"""
+
+    def setUp(self):
+        self.company = create_company()
+        self.staff = create_staff(self.company, "staff@peekpa.test")
+        self.candidate = create_candidate("candidate@peekpa.test")
+        self.job = create_job(self.company, self.staff)
+
+    def assert_counters(self, job=None, company=None):
+        if job:
+            self.assertEqual(Job.objects.values(*job).get(pk=self.job.pk), job)
+        if company:
+            self.assertEqual(Company.objects.values(*company).get(pk=self.company.pk), company)
+
+    def test_interview_status_changes(self):
+        interview = create_interview(self.job, self.candidate, self.staff, status=3)
+        self.assert_counters(job={"application_count": 1, "pass_count": 0},
+                             company={"application_count": 1, "interview_count": 1})
+        interview.status = Interview.STATUS_PASS
+        interview.save()
+        self.assert_counters(job={"application_count": 1, "pass_count": 1},
+                             company={"application_count": 1, "interview_count": 0})
+        interview.delete()
+        self.assert_counters(job={"application_count": 0, "pass_count": 0},
+                             company={"application_count": 0, "interview_count": 0})
+
+    def test_stale_instances_do_not_double_count(self):
+        # 两个请求各自加载了同一个状态为 3 的面试，先后把它改为通过
+        interview = create_interview(self.job, self.candidate, self.staff, status=3)
+        first, second = Interview.objects.get(pk=interview.pk), Interview.objects.get(pk=interview.pk)
+        for instance in (first, second):
+            instance.status = Interview.STATUS_PASS
+            instance.save()
+        self.assert_counters(job={"pass_count": 1}, company={"interview_count": 0})
+
+    def test_old_status_is_read_with_row_lock(self):
+        interview = create_interview(self.job, self.candidate, self.staff, status=3)
+        interview.status = Interview.STATUS_PASS
+        with CaptureQueriesContext(connection) as queries:
+            interview.save()
+        self.assertTrue(any("FOR UPDATE" in query["sql"] for query in queries))
+
+    def test_job_status_and_company_changes(self):
+        self.assert_counters(company={"job_count": 1, "open_job_count": 1})
+        other_company = create_company("其他公司")
+        job = Job.objects.get(pk=self.job.pk)
+        job.status = Job.STATUS_CLOSE
+        job.company = other_company
+        job.save()
+        self.assert_counters(company={"job_count": 0, "open_job_count": 0})
+        self.assertEqual(Company.objects.values("job_count", "open_job_count").get(pk=other_company.pk),
+                         {"job_count": 1, "open_job_count": 0})
+
+
+class DuplicateInterviewMigrationTests(TestCase):
+    """迁移 0008 合并重复投递，并重新计算受影响的职位和公司计数器"""
+
+    def test_remove_duplicate_interviews(self):
+        company = create_company()
+        staff = create_staff(company, "staff@peekpa.test")
+        candidate = create_candidate("candidate@peekpa.test")
+        job = create_job(company, staff)
+        other_job = create_job(company, staff, title="Python 开发工程师")
+        with connection.cursor() as cursor:
+            # 在测试事务中临时去掉唯一约束，构造迁移前的重复数据
+            cursor.execute("ALTER TABLE job_interview DROP CONSTRAINT interview_job_candidate_uniq")
+        kept = create_interview(job, candidate, staff, status=1)
+        duplicate = create_interview(job, candidate, staff, status=Interview.STATUS_PASS)
+        create_invitation(duplicate)
+        create_interview(other_job, candidate, staff)
+        self.assertEqual(Job.objects.get(pk=job.pk).application_count, 2)
+
+        schema_editor = SimpleNamespace(execute=lambda sql: connection.cursor().execute(sql))
+        duplicate_migration.remove_duplicate_interviews(apps, schema_editor)
+
+        self.assertEqual(list(Interview.objects.filter(job=job).values_list("id", flat=True)), [kept.id])
+        self.assertEqual(Invitation.objects.get().interview_id, kept.id)
+        self.assertEqual(Job.objects.values("application_count", "pass_count").get(pk=job.pk),
+                         {"application_count": 1, "pass_count": 0})
+        self.assertEqual(Company.objects.values("application_count", "interview_count", "invitation_count").get(
+            pk=company.pk), {"application_count": 2, "interview_count": 2, "invitation_count": 1})
+
+
+@skipUnless(connection.vendor == "postgresql", "执行计划检查依赖 PostgreSQL")
+class JobFilterPlanTests(TestCase):
+    """城市、薪资范围筛选的第一页和分页总数查询使用对应的复合索引"""
+
+    # 生成的职位数量，数据太少时规划器会直接选择顺序扫描
+    SIZE = 200000
+    # (查询参数, 第一页查询应当使用的索引之一, 分页总数查询应当使用的索引之一)，None 表示不检查。
+    # 薪资筛选的选择性不足以改变排序时，第一页沿排序索引（title / publish_time）扫描并过滤更快，只检查总数查询；
+    # 城市筛选命中约 1/8 的职位，总数查询可能使用顺序扫描，只检查第一页查询
+    SCENARIOS = [
+        ("city=深圳", {"job_status_city_title_idx"}, None),
+        ("city=深圳&order=newest", {"job_status_city_publish_idx"}, None),
+        ("salary_gte=50000", None, {"job_status_salary_max_idx"}),
+        ("salary_lte=3000", None, {"job_status_salary_min_idx"}),
+        ("salary_gte=55000&salary_lte=60000&order=newest", None, {"job_status_salary_max_idx"}),
+        ("city=深圳&salary_lte=3000", {"job_status_city_title_idx"},
+         {"job_status_city_title_idx", "job_status_city_publish_idx", "job_status_salary_min_idx"}),
+        ("city=深圳&salary_gte=50000&order=newest", {"job_status_city_publish_idx"},
+         {"job_status_city_title_idx", "job_status_city_publish_idx", "job_status_salary_max_idx"}),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        company = create_company()
+        with connection.cursor() as cursor:
+            # 直接在数据库中批量生成职位，薪资分布与 bench_job_search 的测试数据一致
+            cursor.execute("SELECT setseed(0.42)")
+            cursor.execute("""
+                INSERT INTO job_job (title, status, city, location, salary_min, salary_max, salary_count,
+                                     hire_number, experience, benefit, education, description, publish_time,
+                                     company_id, search_text, application_count, pass_count, update_time)
+                SELECT titles[1 + mod(i, cardinality(titles))], %s, cities[1 + floor(random() * cardinality(cities))::int],
+                       '', salary_min, salary_min + (1 + floor(random() * 19))::int * 1000, 0, 1, '1-3年', '',
+                       '本科', '', now() - i * interval '1 minute', %s, '', 0, 0, now()
+                FROM (SELECT i, (3 + floor(random() * 37))::int * 1000 AS salary_min, %s::varchar[] AS titles,
+                             %s::varchar[] AS cities
+                      FROM generate_series(1, %s) i) seed
+            """, [Job.STATUS_PUBLISH, company.id, TITLES, CITIES, cls.SIZE])
+            cursor.execute("ANALYZE {}".format(Job._meta.db_table))
 
-# Create your tests here.
+    def test_filters_use_composite_indexes(self):
+        for query, page_expected, count_expected in self.SCENARIOS:
+            queryset = filter_queryset(query)
+            for kind, plan, expected in (("page", queryset[:10].explain(), page_expected),
+                                         ("count", explain_count(queryset.order_by()), count_expected)):
+                if expected is None:
+                    continue
+                with self.subTest(query=query, kind=kind):
+                    self.assertTrue(set(INDEX_RE.findall(plan)) & expected, plan)
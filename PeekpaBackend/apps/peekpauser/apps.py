@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PeekpauserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.peekpauser'
+
+    def ready(self):
+        from apps.peekpauser import signals  # noqa: F401  注册信号处理函数
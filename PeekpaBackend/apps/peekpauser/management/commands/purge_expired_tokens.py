@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
+
+
+class Command(BaseCommand):
+    help = "分批删除已过期的 OutstandingToken 及其 BlacklistedToken 记录，避免一次删除长时间锁表"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="每批删除的 Token 数量")
+        parser.add_argument("--sleep", type=float, default=0, help="每批之间的间隔（秒），降低对线上数据库的压力")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        total = 0
+        while True:
+            ids = list(OutstandingToken.objects.filter(expires_at__lte=now).order_by("id").values_list(
+                "id", flat=True)[:options["batch_size"]])
+            if not ids:
+                break
+            # 过期的 Token 已经无法通过校验，黑名单记录可以和 Token 一起删除
+            with transaction.atomic():
+                BlacklistedToken.objects.filter(token_id__in=ids).delete()
+                OutstandingToken.objects.filter(id__in=ids).delete()
+            total += len(ids)
+            if options["verbosity"] > 1:
+                self.stdout.write("已删除 {} 个过期 Token".format(total))
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+        self.stdout.write(self.style.SUCCESS("共删除 {} 个过期 Token".format(total)))
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_company_membership(apps, schema_editor):
+    """把 details 中的 company_id 和 is_manager 迁移到 company 和 is_manager 字段"""
+    User = apps.get_model("peekpauser", "User")
+    Company = apps.get_model("company", "Company")
+    company_ids = set(Company.objects.values_list("id", flat=True))
+    users = []
+    for user in User.objects.filter(details__has_key="company_id").only("uid", "details").iterator(chunk_size=1000):
+        company_id = user.details.get("company_id")
+        user.company_id = company_id if company_id in company_ids else None
+        user.is_manager = bool(user.details.get("is_manager", False))
+        users.append(user)
+        if len(users) >= 1000:
+            User.objects.bulk_update(users, ["company", "is_manager"])
+            users = []
+    User.objects.bulk_update(users, ["company", "is_manager"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('company', '0002_counters'),
+        ('peekpauser', '0002_avatar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='company',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='staff', to='company.company'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='is_manager',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(copy_company_membership, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['company', 'is_manager'], name='user_company_manager_idx'),
+        ),
+    ]
@@ -72,6 +72,8 @@ class User(AbstractBaseUser, PermissionsMixin):
         - last_name (CharField): 用户的名
         - gender (PositiveIntegerField): 用户的性别，默认值为 GENDER_UNKNOWN
         - details (JSONField): 用户的详细信息，默认为空字典
+        - company (ForeignKey): 公司人员所属的公司，求职者为空
+        - is_manager (BooleanField): 是否是公司管理员，默认值为 False
         - is_active (BooleanField): 用户是否可以登录，默认值为 True
         - is_staff (BooleanField): 用户是否是公司人员，默认值为 False
         - is_superuser (BooleanField): 用户是否是系统超级管理员，默认值为 False
@@ -101,6 +103,9 @@ class User(AbstractBaseUser, PermissionsMixin):
     last_name = models.CharField(max_length=30)  # 用户的名
     gender = models.PositiveIntegerField(default=GENDER_UNKNOWN, choices=GENDER_ITEMS)  # 用户的性别
     details = models.JSONField(default=dict)  # 用户的详细信息
+    company = models.ForeignKey("company.Company", on_delete=models.SET_NULL, null=True, blank=True, db_index=False,
+                                related_name="staff")  # 公司人员所属的公司
+    is_manager = models.BooleanField(default=False)  # 是否是公司管理员
     is_active = models.BooleanField(default=True)  # 用户是否可以登录
     is_staff = models.BooleanField(default=False)  # 用户是否是公司人员
     is_superuser = models.BooleanField(default=False)  # 用户是否是系统超级管理员
@@ -114,11 +119,26 @@ class User(AbstractBaseUser, PermissionsMixin):
     # 定义创建用户时必须填写的字段，这里我们填空
     REQUIRED_FIELDS = []
 
+    class Meta:
+        indexes = [
+            # 按公司查询员工、查询公司管理员
+            models.Index(fields=["company", "is_manager"], name="user_company_manager_idx"),
+        ]
+
     @property
     def name(self):
         """返回用户的全名"""
         return "{} {}".format(self.first_name, self.last_name)
 
+    def save(self, *args, **kwargs):
+        # 公司归属以 company 和 is_manager 字段为准，同时写回 details，兼容读取 details 的旧代码和前端
+        if self.company_id is not None:
+            self.details = {**self.details, "company_id": self.company_id, "is_manager": self.is_manager}
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and {"company", "company_id", "is_manager"} & set(update_fields):
+                kwargs["update_fields"] = {*update_fields, "details"}
+        super().save(*args, **kwargs)
+
     @property
     def token(self):
         """返回用户的访问 Token"""
@@ -126,9 +146,33 @@ class User(AbstractBaseUser, PermissionsMixin):
         return str(refresh)
 
 
+class Blob(models.Model):
+    """
+    上传文件内容模型类，按内容的 SHA-256 哈希存储，相同内容的文件只保存一份。
+
+    简历和头像通过 blob 外键引用文件内容，ref_count 记录引用数量，引用数量降为 0 时删除记录和文件，
+    见 apps.api.uploads 中的 save_upload() 和 release_blob()。
+    """
+    id = models.AutoField(primary_key=True)  # 文件内容 ID，主键
+    hash = models.CharField(max_length=64, unique=True)  # 文件内容的 SHA-256 哈希
+    path = models.CharField(max_length=255)  # 文件在存储中的路径
+    size = models.PositiveBigIntegerField()  # 文件大小（字节）
+    ref_count = models.PositiveIntegerField(default=0)  # 引用该文件内容的简历和头像数量
+    # 头像缩略图 URL：{尺寸: {"webp": URL, "fallback": URL}}，由后台任务生成，见 apps.api.thumbnails
+    variants = models.JSONField(default=dict)
+    create_time = models.DateTimeField(auto_now_add=True)  # 文件内容首次上传的时间
+
+    @property
+    def url(self):
+        """返回文件的 URL，格式与简历、头像的 url 字段一致"""
+        return "media/{}".format(self.path)
+
+
 class Avatar(models.Model):
     """用户头像模型类"""
     id = models.AutoField(primary_key=True)  # 头像 ID，主键
     name = models.CharField(max_length=200)  # 头像名称
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='avatar')  # 头像所属用户，外键，和用户关联
     url = models.URLField()  # 头像文件 URL
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True,
+                             related_name="avatars")  # 头像文件内容，旧数据为空
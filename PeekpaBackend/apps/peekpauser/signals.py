@@ -0,0 +1,50 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from apps.api.authentications import invalidate_user
+from apps.api.caches import invalidate_dashboard
+from apps.peekpauser.models import User, Avatar
+from apps.peekpauser.tasks import enqueue_release_file
+
+
+# 影响公司看板统计（公司用户数）的用户字段
+DASHBOARD_TRACKED_FIELDS = ("company_id", "is_active", "is_manager")
+
+
+@receiver(pre_save, sender=User)
+def remember_user_dashboard_state(sender, instance, update_fields=None, **kwargs):
+    """记录保存前的看板相关字段；登录时只更新 last_login，不需要查询"""
+    instance._old_dashboard_values = None
+    if instance._state.adding or (update_fields is not None and
+                                  not {"company", "company_id", "is_active", "is_manager"} & set(update_fields)):
+        return
+    instance._old_dashboard_values = sender.objects.filter(pk=instance.pk).values(*DASHBOARD_TRACKED_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_dashboard(sender, instance, created, **kwargs):
+    """公司员工加入、离开、停用或变更管理员身份后使相关公司的看板统计缓存失效"""
+    old = getattr(instance, "_old_dashboard_values", None)
+    if created:
+        invalidate_dashboard(instance.company_id)
+    elif old and any(old[field] != getattr(instance, field) for field in DASHBOARD_TRACKED_FIELDS):
+        for company_id in {old["company_id"], instance.company_id}:
+            invalidate_dashboard(company_id)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user_dashboard(sender, instance, **kwargs):
+    invalidate_dashboard(instance.company_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """用户信息变更、停用或删除后清除 JWT 认证的用户缓存"""
+    invalidate_user(instance.uid)
+
+
+@receiver(post_delete, sender=Avatar)
+def release_avatar_file(sender, instance, **kwargs):
+    """删除头像后在后台释放其引用的文件"""
+    enqueue_release_file(instance)
@@ -0,0 +1,46 @@
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from apps.api.caches import invalidate_catalog
+from apps.api.thumbnails import make_thumbnails
+from apps.api.uploads import release_blob
+from apps.company.models import Company
+from apps.peekpauser.models import Blob
+from apps.task.queue import task, enqueue
+
+
+@task
+def release_file(blob_id=None, path=None):
+    """释放简历或头像引用的文件，引入 Blob 之前上传的文件没有 blob，直接按路径删除"""
+    if blob_id is not None:
+        release_blob(blob_id)
+    elif path:
+        default_storage.delete(path)
+
+
+@task
+def generate_thumbnails(blob_id):
+    """生成头像缩略图，同步到使用该头像作为 Logo 的公司"""
+    blob = Blob.objects.filter(id=blob_id).first()
+    if blob is None or blob.variants:
+        return
+    variants = make_thumbnails(blob)
+    if variants:
+        Blob.objects.filter(id=blob.id).update(variants=variants)
+        if Company.objects.filter(avatar=blob.url).update(avatar_variants=variants, update_time=timezone.now()):
+            invalidate_catalog()
+
+
+def enqueue_thumbnails(blob):
+    """头像还没有缩略图时，把生成缩略图的任务加入队列"""
+    if not blob.variants:
+        enqueue(generate_thumbnails, idempotency_key="generate_thumbnails:{}".format(blob.id), blob_id=blob.id)
+
+
+def enqueue_release_file(instance):
+    """删除简历或头像后，把释放其文件的任务加入队列"""
+    path = instance.url[6:] if instance.blob_id is None and instance.url.startswith("media/") else None
+    if instance.blob_id is None and path is None:
+        return
+    enqueue(release_file, idempotency_key="release_file:{}:{}".format(instance._meta.label_lower, instance.pk),
+            blob_id=instance.blob_id, path=path)
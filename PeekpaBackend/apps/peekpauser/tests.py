@@ -1,3 +1,147 @@
+import io
+import os
+from importlib import import_module
+from unittest import skipUnless
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
 
-# Create your tests here.
+from apps.api.tests import PASSWORD, create_company, use_temp_media_root
+from apps.api.thumbnails import Image, make_thumbnails
+from apps.api.uploads import save_upload, release_blob
+from apps.job.models import Resume
+from apps.company.models import Company
+from apps.peekpauser.models import User, Avatar, Blob
+from apps.peekpauser.tasks import generate_thumbnails
+from apps.task.queue import run_next_task
+
+membership_migration = import_module("apps.peekpauser.migrations.0003_company_membership")
+
+
+class CompanyMembershipMigrationTests(TestCase):
+    """迁移 0003 把 details 中的公司归属回填到 company / is_manager 字段"""
+
+    def create_user(self, email, details):
+        user = User.objects.create_user(email, PASSWORD)
+        User.objects.filter(pk=user.pk).update(details=details)
+        return user
+
+    def test_copy_company_membership(self):
+        company = create_company()
+        manager = self.create_user("manager@peekpa.test", {"company_id": company.id, "is_manager": True})
+        staff = self.create_user("staff@peekpa.test", {"company_id": company.id})
+        orphan = self.create_user("orphan@peekpa.test", {"company_id": company.id + 1000, "is_manager": True})
+        candidate = self.create_user("candidate@peekpa.test", {})
+
+        membership_migration.copy_company_membership(apps, None)
+
+        memberships = {uid: (company_id, is_manager) for uid, company_id, is_manager in
+                       User.objects.values_list("uid", "company_id", "is_manager")}
+        self.assertEqual(memberships[manager.uid], (company.id, True))
+        self.assertEqual(memberships[staff.uid], (company.id, False))
+        # 公司已不存在的用户不关联公司
+        self.assertEqual(memberships[orphan.uid], (None, True))
+        self.assertEqual(memberships[candidate.uid], (None, False))
+
+
+class BlobTests(TestCase):
+    """上传文件按内容去重保存，简历、头像删除后在后台释放引用"""
+
+    def setUp(self):
+        use_temp_media_root(self)
+        self.user = User.objects.create_user("candidate@peekpa.test", PASSWORD)
+        self.content = b"%PDF-1.4 " + os.urandom(16)
+
+    def upload(self, content=None, name="resume.pdf"):
+        return save_upload(SimpleUploadedFile(name, content or self.content))
+
+    def run_tasks(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            while run_next_task():
+                pass
+
+    def test_same_content_is_stored_once(self):
+        first, second = self.upload(), self.upload(name="copy.pdf")
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(Blob.objects.get(pk=first.pk).ref_count, 2)
+        self.assertEqual(len(default_storage.listdir(os.path.dirname(first.path))[1]), 1)
+        self.assertNotEqual(self.upload(b"other content").id, first.id)
+
+    def test_release_on_delete(self):
+        blob = self.upload()
+        resume = Resume.objects.create(name="简历", user=self.user, url=blob.url, blob=self.upload())
+        avatar = Avatar.objects.create(name="头像", user=self.user, url=blob.url, blob=blob)
+
+        resume.delete()
+        self.run_tasks()
+        self.assertEqual(Blob.objects.get(pk=blob.pk).ref_count, 1)
+        self.assertTrue(default_storage.exists(blob.path))
+
+        avatar.delete()
+        self.run_tasks()
+        self.assertFalse(Blob.objects.filter(pk=blob.pk).exists())
+        self.assertFalse(default_storage.exists(blob.path))
+
+    def test_release_legacy_file_by_path(self):
+        path = default_storage.save("resume/legacy.pdf", SimpleUploadedFile("legacy.pdf", self.content))
+        Resume.objects.create(name="简历", user=self.user, url="media/" + path).delete()
+        self.run_tasks()
+        self.assertFalse(default_storage.exists(path))
+
+
+def image_file(name, mode, size, image_format):
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 10, 10, 128) if mode == "RGBA" else (200, 10, 10)).save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@skipUnless(Image, "未安装 Pillow")
+class ThumbnailTests(TestCase):
+    """头像缩略图：按尺寸生成 WebP 和 JPEG/PNG 两种格式，由后台任务写入 Blob 和公司 Logo"""
+
+    def setUp(self):
+        use_temp_media_root(self)
+
+    def open_image(self, url):
+        with default_storage.open(url[len("media/"):], "rb") as file:
+            image = Image.open(file)
+            image.load()
+        return image
+
+    def test_jpeg_thumbnails(self):
+        blob = save_upload(image_file("avatar.jpg", "RGB", (800, 400), "JPEG"))
+        variants = make_thumbnails(blob)
+        self.assertEqual(set(variants), {"64", "128", "256"})
+        webp, fallback = self.open_image(variants["256"]["webp"]), self.open_image(variants["256"]["fallback"])
+        self.assertEqual((webp.format, webp.size), ("WEBP", (256, 128)))
+        self.assertEqual((fallback.format, fallback.size), ("JPEG", (256, 128)))
+
+    def test_transparent_image_falls_back_to_png(self):
+        blob = save_upload(image_file("avatar.png", "RGBA", (100, 100), "PNG"))
+        fallback = self.open_image(make_thumbnails(blob)["64"]["fallback"])
+        self.assertEqual((fallback.format, fallback.mode), ("PNG", "RGBA"))
+
+    def test_invalid_image_is_skipped(self):
+        blob = save_upload(SimpleUploadedFile("avatar.png", b"not an image " + os.urandom(8)))
+        with self.assertLogs("apps.api.thumbnails", "WARNING"):
+            self.assertEqual(make_thumbnails(blob), {})
+
+    def test_task_updates_blob_and_company(self):
+        blob = save_upload(image_file("avatar.jpg", "RGB", (300, 300), "JPEG"))
+        company = create_company(avatar=blob.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_thumbnails(blob.id)
+        variants = Blob.objects.get(pk=blob.pk).variants
+        self.assertEqual(set(variants), {"64", "128", "256"})
+        self.assertEqual(Company.objects.get(pk=company.pk).avatar_variants, variants)
+
+    def test_release_deletes_thumbnails(self):
+        blob = save_upload(image_file("avatar.jpg", "RGB", (300, 300), "JPEG"))
+        generate_thumbnails(blob.id)
+        blob.refresh_from_db()
+        paths = [url[len("media/"):] for variant in blob.variants.values() for url in variant.values()]
+        with self.captureOnCommitCallbacks(execute=True):
+            release_blob(blob.id)
+        self.assertFalse(any(default_storage.exists(path) for path in [blob.path] + paths))
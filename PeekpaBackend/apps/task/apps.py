@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class TaskConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.task'
+
+    def ready(self):
+        autodiscover_modules("tasks")  # 导入各应用的 tasks 模块，注册任务处理函数
@@ -0,0 +1,44 @@
+import signal
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.task.models import Task
+from apps.task.queue import run_next_task
+
+
+class Command(BaseCommand):
+    help = "启动后台任务工作进程，循环取出并执行数据库任务队列中到期的任务，可以同时启动多个"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="执行完当前所有到期的任务后退出")
+        parser.add_argument("--sleep", type=float, default=settings.TASK_POLL_INTERVAL,
+                            help="队列为空时的轮询间隔（秒）")
+        parser.add_argument("--purge", action="store_true",
+                            help="删除超过 TASK_RETENTION_DAYS 天的已完成任务后退出")
+
+    def handle(self, *args, **options):
+        if options["purge"]:
+            deleted, _ = Task.objects.filter(
+                status=Task.STATUS_DONE,
+                update_time__lt=timezone.now() - timedelta(days=settings.TASK_RETENTION_DAYS)).delete()
+            self.stdout.write(self.style.SUCCESS("共删除 {} 个已完成的任务".format(deleted)))
+            return
+        # 收到 SIGTERM 时执行完当前任务再退出
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        total = 0
+        while not self.stopping:
+            if run_next_task():
+                total += 1
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["sleep"])
+        self.stdout.write(self.style.SUCCESS("共执行 {} 个任务".format(total)))
+
+    def stop(self, signum, frame):
+        self.stopping = True
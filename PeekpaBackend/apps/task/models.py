@@ -0,0 +1,41 @@
+from django.db import models
+from django.utils import timezone
+
+
+# Create your models here.
+class Task(models.Model):
+    """
+    后台任务模型类，任务队列保存在数据库中，不依赖额外的消息中间件。
+
+    任务由 apps.task.queue.enqueue() 在业务事务中写入，和业务数据一起提交或回滚；
+    由 `python manage.py run_tasks` 启动的工作进程取出执行，失败后按指数退避重试。
+    """
+
+    STATUS_PENDING = 0
+    STATUS_DONE = 1
+    STATUS_FAILED = 2
+
+    STATUS_ITEMS = (
+        (STATUS_PENDING, "等待执行"),
+        (STATUS_DONE, "执行成功"),
+        (STATUS_FAILED, "执行失败"),
+    )
+
+    id = models.BigAutoField(primary_key=True)  # 任务 ID，主键
+    name = models.CharField(max_length=200)  # 任务处理函数名称
+    payload = models.JSONField(default=dict)  # 任务参数
+    # 幂等键，相同幂等键的任务只会写入和执行一次
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.PositiveIntegerField(default=STATUS_PENDING, choices=STATUS_ITEMS)  # 任务状态
+    attempts = models.PositiveIntegerField(default=0)  # 已失败的次数
+    run_at = models.DateTimeField(default=timezone.now)  # 最早执行时间，重试时推后
+    last_error = models.TextField(blank=True)  # 最近一次失败的错误信息
+    create_time = models.DateTimeField(auto_now_add=True)  # 任务创建时间
+    update_time = models.DateTimeField(auto_now=True)  # 任务最后更新时间
+
+    class Meta:
+        indexes = [
+            # 工作进程按执行时间取出等待执行的任务
+            models.Index(fields=["run_at", "id"], name="task_pending_idx",
+                         condition=models.Q(status=0)),
+        ]
@@ -0,0 +1,76 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.task.models import Task
+
+logger = logging.getLogger(__name__)
+
+# 任务名称 -> 任务处理函数，由 @task 装饰器注册
+registry = {}
+
+
+def task(func):
+    """
+    注册任务处理函数，任务名称为函数所在模块和函数名。
+
+    处理函数的参数必须可以序列化为 JSON，并且应当是幂等的：任务失败重试、或者工作进程在提交前退出时，
+    同一个任务可能被执行多次。
+    """
+    func.task_name = "{}.{}".format(func.__module__, func.__qualname__)
+    registry[func.task_name] = func
+    return func
+
+
+def enqueue(func, idempotency_key=None, delay=0, **payload):
+    """
+    把任务加入队列，幂等键已经存在时忽略本次写入。
+
+    任务和调用方处于同一事务中，事务回滚时任务也不会被执行。设置 TASK_ALWAYS_EAGER 时不写入队列，
+    在事务提交后直接在当前进程中执行，用于本地开发和没有工作进程的环境。
+    """
+    if settings.TASK_ALWAYS_EAGER:
+        transaction.on_commit(lambda: func(**payload))
+        return
+    task = Task(name=func.task_name, payload=payload, idempotency_key=idempotency_key,
+                run_at=timezone.now() + timedelta(seconds=delay))
+    # INSERT ... ON CONFLICT DO NOTHING，幂等键重复时不报错，也不会中断调用方的事务
+    Task.objects.bulk_create([task], ignore_conflicts=True)
+
+
+def run_next_task():
+    """
+    取出并执行一个到期的任务，队列中没有到期任务时返回 False。
+
+    使用 SELECT ... FOR UPDATE SKIP LOCKED 锁住任务，多个工作进程可以同时执行不同的任务；
+    任务处理函数和任务状态的更新在同一事务中提交，工作进程异常退出时锁自动释放，任务会被重新执行。
+    """
+    with transaction.atomic():
+        task = Task.objects.select_for_update(skip_locked=True).filter(
+            status=Task.STATUS_PENDING, run_at__lte=timezone.now()).order_by("run_at", "id").first()
+        if task is None:
+            return False
+        try:
+            func = registry[task.name]
+            with transaction.atomic():
+                func(**task.payload)
+        except Exception:
+            task.attempts += 1
+            task.last_error = traceback.format_exc()
+            if task.attempts >= settings.TASK_MAX_ATTEMPTS:
+                task.status = Task.STATUS_FAILED
+                logger.error("任务 %s(%s) 执行失败，不再重试", task.name, task.id, exc_info=True)
+            else:
+                # 指数退避：TASK_RETRY_DELAY、2 * TASK_RETRY_DELAY、4 * TASK_RETRY_DELAY ...
+                task.run_at = timezone.now() + timedelta(
+                    seconds=settings.TASK_RETRY_DELAY * 2 ** (task.attempts - 1))
+                logger.warning("任务 %s(%s) 第 %s 次执行失败，稍后重试", task.name, task.id, task.attempts,
+                               exc_info=True)
+        else:
+            task.status = Task.STATUS_DONE
+        task.save(update_fields=["status", "attempts", "run_at", "last_error", "update_time"])
+    return True
@@ -0,0 +1,113 @@
+import threading
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from apps.task.models import Task
+from apps.task.queue import task, enqueue, run_next_task
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task
+def fail_after_write(value):
+    Task.objects.create(name="written-by-failed-task")
+    raise ValueError(value)
+
+
+@override_settings(TASK_ALWAYS_EAGER=False, TASK_RETRY_DELAY=30, TASK_MAX_ATTEMPTS=3)
+class TaskQueueTests(TestCase):
+    """数据库任务队列：幂等写入、失败重试和指数退避"""
+
+    def setUp(self):
+        calls.clear()
+
+    def make_due(self, task_id):
+        Task.objects.filter(pk=task_id).update(run_at=timezone.now())
+
+    def test_enqueue_is_idempotent(self):
+        enqueue(record, idempotency_key="record:1", value=1)
+        enqueue(record, idempotency_key="record:1", value=2)
+        self.assertEqual(Task.objects.count(), 1)
+        self.assertTrue(run_next_task())
+        self.assertFalse(run_next_task())
+        self.assertEqual(calls, [1])
+        self.assertEqual(Task.objects.get().status, Task.STATUS_DONE)
+
+    def test_delayed_task_is_not_due(self):
+        enqueue(record, delay=60, value=1)
+        self.assertFalse(run_next_task())
+        self.assertEqual(calls, [])
+
+    def test_retry_with_exponential_backoff(self):
+        enqueue(fail_after_write, value="boom")
+        task_id = Task.objects.get().id
+        with self.assertLogs("apps.task.queue", "WARNING"):
+            for attempt, delay in ((1, 30), (2, 60)):
+                before = timezone.now()
+                self.assertTrue(run_next_task())
+                failed = Task.objects.get(pk=task_id)
+                self.assertEqual((failed.status, failed.attempts), (Task.STATUS_PENDING, attempt))
+                self.assertIn("ValueError: boom", failed.last_error)
+                self.assertGreaterEqual(failed.run_at, before + timedelta(seconds=delay))
+                self.assertLess(failed.run_at, timezone.now() + timedelta(seconds=delay))
+                # 退避期间不会再次执行
+                self.assertFalse(run_next_task())
+                self.make_due(task_id)
+            self.assertTrue(run_next_task())
+            failed = Task.objects.get(pk=task_id)
+            self.assertEqual((failed.status, failed.attempts), (Task.STATUS_FAILED, 3))
+            self.assertFalse(run_next_task())
+        # 失败任务中的写入随任务一起回滚
+        self.assertFalse(Task.objects.filter(name="written-by-failed-task").exists())
+
+    @override_settings(TASK_ALWAYS_EAGER=True)
+    def test_eager_mode_runs_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue(record, value=1)
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, [1])
+        self.assertFalse(Task.objects.exists())
+
+
+@override_settings(TASK_ALWAYS_EAGER=False)
+class TaskClaimTests(TransactionTestCase):
+    """多个工作进程通过 SELECT ... FOR UPDATE SKIP LOCKED 同时取出不同的任务"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_locked_task_is_skipped(self):
+        enqueue(record, value=1)
+        enqueue(record, value=2)
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_first_task():
+            # 另一个工作进程正在执行第一个任务
+            try:
+                with transaction.atomic():
+                    Task.objects.select_for_update().order_by("run_at", "id").first()
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        worker = threading.Thread(target=hold_first_task)
+        worker.start()
+        try:
+            self.assertTrue(locked.wait(10))
+            self.assertTrue(run_next_task())
+            self.assertEqual(calls, [2])
+            self.assertFalse(run_next_task())
+        finally:
+            release.set()
+            worker.join()
+        self.assertTrue(run_next_task())
+        self.assertEqual(calls, [2, 1])
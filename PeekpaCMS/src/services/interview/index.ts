@@ -62,4 +62,20 @@ const createInvitation = (
     });
 };
 
-export { getAllJobName, getAllInterviews, searchInterview, updateInterview, createInvitation };
+// 简历下载签名 URL 接口，返回的 URL 在短时间内有效，只能下载该简历
+const getResumeSignedURL = (url: string): Promise<AxiosResponse<{ url: string }>> => {
+    return axiosInstance.get("/media/sign/", {
+        params: {
+            url,
+        },
+    });
+};
+
+export {
+    getAllJobName,
+    getAllInterviews,
+    searchInterview,
+    updateInterview,
+    createInvitation,
+    getResumeSignedURL,
+};